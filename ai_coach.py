@@ -23,7 +23,7 @@ Usage:
     notification = await coach.analyze_telemetry(telemetry_data, user_id="user123")
     
     # Record feedback for learning
-    coach.record_feedback("user123", "notification_id", {"effectiveness": 0.8})
+    coach.record_feedback("user123", notification['notification_id'], {"effectiveness": 0.8})
 
 Features:
     ✅ Machine Learning - Learns from user interactions
@@ -40,20 +40,35 @@ Version: 4.0 (Ultimate Consolidated)
 """
 
 import asyncio
+import heapq
 import json
 import logging
+import math
 import pickle
+import random
 import numpy as np
 import subprocess
 import time
+import warnings
 import psutil
 import signal
 import os
+import re
+import shutil
+import sys
+import threading
+import uuid
 import httpx
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any, Tuple
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Optional, Any, Tuple, Callable
 from pathlib import Path
-from collections import defaultdict, deque
+from urllib.parse import urlsplit
+from collections import defaultdict, deque, OrderedDict
+from functools import partial
+from itertools import chain, filterfalse, product, repeat
+from operator import itemgetter
 
 try:
     from pynput import mouse, keyboard
@@ -79,13 +94,262 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+class PromptEncoder:
+    """
+    Compact key=value encoding of the telemetry features the coach uses.
+
+    Features are emitted in priority order, rounded, and dropped once the
+    estimated token budget would be exceeded, so raw window titles, URLs,
+    activity breakdowns and metadata never reach the prompt.
+    """
+    
+    # (telemetry key, prompt key, decimals; None for text)
+    FEATURES = (
+        ('energy_level', 'energy', 2),
+        ('stress_level', 'stress', 2),
+        ('focus_quality', 'focus', 2),
+        ('break_needed', 'break_need', 2),
+        ('cognitive_load', 'cognitive_load', 2),
+        ('productivity_score', 'productivity', 2),
+        ('minutes_since_break', 'min_since_break', 0),
+        ('current_activity_type', 'activity', None),
+        ('app_switches_per_hour', 'switches_per_h', 0),
+        ('keystrokes_per_min', 'keys_per_min', 0),
+        ('error_rate', 'error_rate', 2),
+        ('deep_focus_minutes', 'deep_focus_min', 0),
+        ('session_duration_hours', 'session_h', 1),
+        ('idle_seconds', 'idle_s', 0),
+        ('tasks_completed_last_hour', 'tasks_h', 0),
+        ('notifications_last_hour', 'notifications_h', 0),
+        ('current_app', 'app', None)
+    )
+    ANALYSIS_FIELDS = ('nudge_type', 'priority', 'confidence', 'nudge_text', 'reasoning')
+    
+    def __init__(self, token_budget: int = 96, chars_per_token: float = 4.0, max_text_length: int = 80):
+        self.token_budget = token_budget
+        self.chars_per_token = chars_per_token
+        self.max_text_length = max_text_length
+    
+    def estimate_tokens(self, text: str) -> int:
+        """Rough token count (about four characters per token for English and JSON)"""
+        return int(np.ceil(len(text) / self.chars_per_token))
+    
+    def encode_telemetry(self, telemetry: Dict[str, Any], token_budget: Optional[int] = None) -> str:
+        """Highest-priority features as `key=value` pairs within the token budget"""
+        values = dict(telemetry)
+        if 'minutes_since_break' not in values and telemetry.get('last_break_time'):
+            try:
+                last_break = datetime.fromisoformat(str(telemetry['last_break_time']))
+                values['minutes_since_break'] = (datetime.now() - last_break).total_seconds() / 60
+            except (TypeError, ValueError):
+                pass
+        
+        budget_chars = (self.token_budget if token_budget is None else token_budget) * self.chars_per_token
+        pairs = []
+        length = 0
+        for key, name, decimals in self.FEATURES:
+            value = values.get(key)
+            if value is None or value == '':
+                continue
+            pair = f"{name}={self._format(value, decimals, 24)}"
+            if length + len(pair) + 1 > budget_chars:
+                break
+            pairs.append(pair)
+            length += len(pair) + 1
+        return ' '.join(pairs)
+    
+    def encode_analysis(self, analysis: Dict[str, Any]) -> str:
+        """One coaching analysis as `key=value` pairs (text fields quoted and truncated)"""
+        return ' '.join(
+            f"{field}={self._format(analysis[field], 2, self.max_text_length)}"
+            for field in self.ANALYSIS_FIELDS if analysis.get(field) is not None
+        )
+    
+    def _format(self, value: Any, decimals: Optional[int], max_length: int) -> str:
+        if isinstance(value, bool) or decimals is None or not isinstance(value, (int, float)):
+            text = ' '.join(str(value).split())[:max_length]
+            return json.dumps(text) if ' ' in text or '=' in text else text
+        return str(round(value)) if decimals == 0 else f"{value:.{decimals}f}"
+
+
+class StreamingNudgeParser:
+    """
+    Incremental parser for the top-level fields of a streamed JSON coaching answer.
+
+    Text chunks are appended as they arrive and complete `"key": value` pairs
+    are decoded from where the previous call stopped. `feed` returns the
+    nudge as soon as nudge_text, nudge_type and priority are complete (or
+    immediately when nudge_text is null).
+    """
+    
+    REQUIRED = ('nudge_text', 'nudge_type', 'priority')
+    
+    def __init__(self):
+        self.chunks = []
+        self.buffer = ''
+        self.pos = -1  # Index after the last decoded pair; -1 until the opening brace is seen
+        self.fields = {}
+        self.decoder = json.JSONDecoder()
+    
+    @property
+    def text(self) -> str:
+        """Everything received so far"""
+        return ''.join(self.chunks)
+    
+    def feed(self, chunk: str) -> Optional[Dict]:
+        self.chunks.append(chunk)
+        self.buffer += chunk
+        if self.pos < 0:
+            start = self.buffer.find('{')
+            if start < 0:
+                return None
+            self.pos = start + 1
+        
+        while self._decode_pair():
+            pass
+        
+        if 'nudge_text' in self.fields and self.fields['nudge_text'] is None:
+            return {'nudge_text': None}
+        if all(field in self.fields for field in self.REQUIRED):
+            return dict(self.fields)
+        return None
+    
+    def _decode_pair(self) -> bool:
+        """Decode one complete `"key": value` pair at pos; False if more text is needed"""
+        buffer = self.buffer
+        pos = self._skip(buffer, self.pos, ' \t\r\n,')
+        if pos >= len(buffer) or buffer[pos] == '}':
+            return False
+        try:
+            key, pos = self.decoder.raw_decode(buffer, pos)
+            pos = self._skip(buffer, pos, ' \t\r\n')
+            if pos >= len(buffer) or buffer[pos] != ':':
+                return False
+            pos = self._skip(buffer, pos + 1, ' \t\r\n')
+            value, end = self.decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            return False
+        # A number is only complete once a delimiter follows it ("0" may become "0.85")
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            if end >= len(buffer) or buffer[end] not in ',} \t\r\n':
+                return False
+        self.fields[key] = value
+        self.pos = end
+        return True
+    
+    @staticmethod
+    def _skip(buffer: str, pos: int, characters: str) -> int:
+        while pos < len(buffer) and buffer[pos] in characters:
+            pos += 1
+        return pos
+
+
+class LLMCallMetrics:
+    """
+    Per-call accounting of LLM requests, aggregated per call type.
+    
+    Each finished call is a record with its latency (including retries and
+    backoff), attempts, status codes, input/output tokens (from the API's
+    usage when reported, otherwise estimated) and the prompt's estimated
+    input tokens, counted even for calls that never get an answer. Rolling
+    percentiles use the last `window_size` calls of each type. Records are
+    also passed to the optional `sink` callable (e.g. to forward them to a
+    metrics backend).
+    """
+    
+    def __init__(self, window_size: int = 1000, sink: Optional[Callable[[Dict], None]] = None):
+        self.window_size = window_size
+        self.sink = sink
+        self.by_type = {}  # call type -> aggregates
+    
+    def _aggregates(self, call_type: str) -> Dict[str, Any]:
+        if call_type not in self.by_type:
+            self.by_type[call_type] = {
+                'latencies': deque(maxlen=self.window_size), 'calls': 0, 'failures': 0,
+                'retried_calls': 0, 'retries': 0, 'status_codes': defaultdict(int),
+                'input_tokens': 0, 'output_tokens': 0, 'estimated_input_tokens': 0, 'nudges': 0
+            }
+        return self.by_type[call_type]
+    
+    def record(self, call: Dict[str, Any]):
+        """Fold in one finished call record"""
+        aggregates = self._aggregates(call['call_type'])
+        aggregates['calls'] += 1
+        aggregates['latencies'].append(call['latency'])
+        aggregates['failures'] += not call['success']
+        retries = max(0, call['attempts'] - 1)
+        aggregates['retries'] += retries
+        aggregates['retried_calls'] += retries > 0
+        for status in call['status_codes']:
+            aggregates['status_codes'][status] += 1
+        aggregates['input_tokens'] += call['input_tokens']
+        aggregates['output_tokens'] += call['output_tokens']
+        aggregates['estimated_input_tokens'] += call['estimated_input_tokens']
+        aggregates['nudges'] += call['nudges']
+        
+        if self.sink is not None:
+            try:
+                self.sink(call)
+            except Exception as e:
+                logger.warning(f"LLM metrics sink failed: {e}")
+    
+    def add_nudges(self, call_type: str, count: int):
+        """Credit nudges resolved after the call was recorded (e.g. entries of a batch answer)"""
+        self._aggregates(call_type)['nudges'] += count
+    
+    def stats(self) -> Dict[str, Any]:
+        """Per call type: rolling latency percentiles, retry rate, status codes and tokens per nudge"""
+        stats = {}
+        for call_type, aggregates in self.by_type.items():
+            latencies = np.fromiter(aggregates['latencies'], dtype=float)
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000 if len(latencies) else (0.0, 0.0, 0.0)
+            tokens = aggregates['input_tokens'] + aggregates['output_tokens']
+            stats[call_type] = {
+                'calls': aggregates['calls'],
+                'failures': aggregates['failures'],
+                'latency_ms': {'p50': round(float(p50), 1), 'p95': round(float(p95), 1), 'p99': round(float(p99), 1)},
+                'retry_rate': aggregates['retried_calls'] / aggregates['calls'],
+                'retries': aggregates['retries'],
+                'status_codes': dict(aggregates['status_codes']),
+                'input_tokens': aggregates['input_tokens'],
+                'output_tokens': aggregates['output_tokens'],
+                'estimated_input_tokens': aggregates['estimated_input_tokens'],
+                'tokens_per_nudge': tokens / aggregates['nudges'] if aggregates['nudges'] else None
+            }
+        
+        # Fusion spends tokens on nudges counted by the analysis, so the overall ratio covers every call type
+        total_tokens = sum(a['input_tokens'] + a['output_tokens'] for a in self.by_type.values())
+        total_nudges = sum(a['nudges'] for call_type, a in self.by_type.items() if call_type != 'fusion')
+        stats['overall'] = {
+            'calls': sum(a['calls'] for a in self.by_type.values()),
+            'tokens': total_tokens,
+            'tokens_per_nudge': total_tokens / total_nudges if total_nudges else None
+        }
+        return stats
+
+
 class ClaudeClient:
-    """Robust Anthropic Claude API client with retry logic"""
+    """
+    Robust Anthropic Claude API client with retry logic.
+
+    Requests share one long-lived pooled httpx client, so keep-alive
+    connections are reused across calls and retries. At most
+    `max_concurrency` requests are in flight at once (defaults to
+    `max_connections`). Call `aclose()` when done. Every call is accounted
+    in `call_metrics` (latency, retries, status codes, token usage).
+    """
+    
+    # Transient statuses worth retrying besides 5xx (timeout, conflict, rate limit)
+    RETRYABLE_STATUS = (408, 409, 429)
     
-    def __init__(self, api_key: str, model: str = "claude-sonnet-4-20250514"):
+    def __init__(self, api_key: str, model: str = "claude-sonnet-4-20250514",
+                 base_url: str = "https://api.anthropic.com/v1", max_connections: int = 20,
+                 max_concurrency: Optional[int] = None, timeout: float = 30.0,
+                 prompt_token_budget: int = 96, stream: bool = False,
+                 metrics_sink: Optional[Callable[[Dict], None]] = None):
         self.api_key = api_key
         self.model = model
-        self.base_url = "https://api.anthropic.com/v1"
+        self.base_url = base_url
         self.headers = {
             "x-api-key": api_key,
             "Content-Type": "application/json",
@@ -93,14 +357,44 @@ class ClaudeClient:
         }
         self.max_retries = 3
         self.retry_delay = 1.0
+        self.max_retry_after = 30.0  # Longer server-requested waits are left to the circuit breaker
+        self.timeout = timeout
+        self.stream = stream  # Server-sent events with early nudge extraction
+        self.limits = httpx.Limits(max_connections=max_connections,
+                                   max_keepalive_connections=max_connections)
+        self._semaphore = asyncio.Semaphore(max_concurrency or max_connections)
+        self._client: Optional[httpx.AsyncClient] = None
+        
+        # Telemetry goes into prompts as compact key=value pairs within this budget
+        self.prompt_encoder = PromptEncoder(prompt_token_budget)
+        self.call_metrics = LLMCallMetrics(sink=metrics_sink)
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        """Create the pooled client on first use (inside the running event loop)"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits)
+        return self._client
+    
+    async def aclose(self):
+        """Close pooled connections; the client reopens lazily if used again"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
         
     async def analyze_telemetry(self, telemetry_data: Dict, context: str = "") -> Optional[Dict]:
         """Analyze telemetry data and provide coaching insights"""
-        
-        prompt = f"""You are an AI productivity coach analyzing user telemetry data. 
+        try:
+            return await self._make_request(self.build_analysis_prompt(telemetry_data, context))
+        except Exception as e:
+            logger.error(f"Claude telemetry analysis failed: {e}")
+            return None
+    
+    def build_analysis_prompt(self, telemetry_data: Dict, context: str = "") -> str:
+        """Coaching analysis prompt with the telemetry compactly encoded"""
+        return f"""You are an AI productivity coach analyzing user telemetry data. 
 
 TELEMETRY DATA:
-{json.dumps(telemetry_data, indent=2)}
+{self.prompt_encoder.encode_telemetry(telemetry_data)}
 
 CONTEXT: {context}
 
@@ -122,15 +416,11 @@ Respond with a JSON object containing:
 
 Only provide a recommendation if there's a clear coaching opportunity. If no intervention is needed, respond with {{"nudge_text": null}}.
 """
-
-        try:
-            return await self._make_request(prompt)
-        except Exception as e:
-            logger.error(f"Claude telemetry analysis failed: {e}")
-            return None
     
-    async def _make_request(self, prompt: str, max_tokens: int = 300) -> Optional[Dict]:
-        """Make request to Claude API with retry logic"""
+    async def _make_request(self, prompt: str, max_tokens: int = 300,
+                            call_type: str = 'analysis', stream: Optional[bool] = None) -> Optional[Dict]:
+        """Make request to Claude API with retry logic (`stream` overrides the client default)"""
+        stream = self.stream if stream is None else stream
         
         request_data = {
             "model": self.model,
@@ -143,109 +433,933 @@ Only provide a recommendation if there's a clear coaching opportunity. If no int
             ]
         }
         
+        call = {
+            'call_type': call_type, 'attempts': 0, 'status_codes': [],
+            'input_tokens': 0, 'output_tokens': 0, 'estimated_input_tokens': self.prompt_encoder.estimate_tokens(prompt)
+        }
+        started = time.monotonic()
+        result = None
+        try:
+            result = await self._send_with_retries(request_data, stream, call)
+            return result
+        finally:
+            # Also runs when the caller cancels (latency budget), so abandoned calls are accounted too
+            call['latency'] = time.monotonic() - started
+            call['success'] = result is not None
+            call['nudges'] = int(isinstance(result, dict) and bool(result.get('nudge_text')))
+            self.call_metrics.record(call)
+    
+    async def _send_with_retries(self, request_data: Dict, stream: bool, call: Dict[str, Any]) -> Optional[Dict]:
+        """Attempts of one request, noting attempts, status codes and token usage in `call`"""
+        client = self._get_client()
         for attempt in range(self.max_retries):
+            call['attempts'] += 1
             try:
-                async with httpx.AsyncClient(timeout=30.0) as client:
-                    response = await client.post(
-                        f"{self.base_url}/messages",
-                        headers=self.headers,
-                        json=request_data
-                    )
-                    
-                    if response.status_code == 200:
-                        result = response.json()
-                        content = result.get("content", [{}])[0].get("text", "")
-                        
-                        # Try to parse as JSON if it looks like JSON
-                        if content.strip().startswith('{'):
-                            try:
-                                return json.loads(content)
-                            except json.JSONDecodeError:
-                                pass
-                        
-                        return {"content": content}
-                    
-                    elif response.status_code == 429:  # Rate limit
-                        wait_time = self.retry_delay * (2 ** attempt)
-                        logger.warning(f"Rate limited, waiting {wait_time}s before retry {attempt + 1}")
-                        await asyncio.sleep(wait_time)
-                        continue
-                    
+                # Hold a concurrency slot only while the request is in flight, not during backoff
+                async with self._semaphore:
+                    if stream:
+                        status_code, headers, body, usage = await self._post_streaming(client, request_data)
                     else:
-                        logger.error(f"Claude API error {response.status_code}: {response.text}")
-                        if attempt == self.max_retries - 1:
-                            return None
-                        await asyncio.sleep(self.retry_delay)
-                        
+                        status_code, headers, body, usage = await self._post(client, request_data)
+                
+                # Without reported usage, answered attempts are billed at the prompt estimate
+                call['status_codes'].append(status_code)
+                call['input_tokens'] += usage.get('input_tokens', call['estimated_input_tokens'] if status_code == 200 else 0)
+                call['output_tokens'] += usage.get('output_tokens', 0)
+                
+                if status_code == 200:
+                    return body
+                
+                elif status_code in self.RETRYABLE_STATUS or status_code >= 500:
+                    if attempt == self.max_retries - 1:
+                        logger.error(f"Claude API error {status_code}: {body}")
+                        return None
+                    wait_time = self._backoff(attempt, headers.get('retry-after'))
+                    if wait_time is None:
+                        logger.error(f"Claude API error {status_code}: Retry-After exceeds "
+                                     f"{self.max_retry_after}s, giving up")
+                        return None
+                    logger.warning(f"Claude API error {status_code}, waiting {wait_time:.1f}s "
+                                   f"before retry {attempt + 1}")
+                    await asyncio.sleep(wait_time)
+                
+                else:
+                    # Other client errors (bad request, auth) will not succeed on retry
+                    logger.error(f"Claude API error {status_code}: {body}")
+                    return None
+                    
             except Exception as e:
+                call['status_codes'].append('error')
                 logger.error(f"Claude request attempt {attempt + 1} failed: {e}")
                 if attempt == self.max_retries - 1:
                     return None
-                await asyncio.sleep(self.retry_delay)
+                await asyncio.sleep(self._backoff(attempt))
         
         return None
+    
+    async def _post(self, client: httpx.AsyncClient, request_data: Dict) -> Tuple[int, Any, Any, Dict]:
+        """One buffered attempt: (status code, headers, parsed result or error text, token usage)"""
+        response = await client.post(f"{self.base_url}/messages", headers=self.headers, json=request_data)
+        if response.status_code != 200:
+            return response.status_code, response.headers, response.text, {}
+        message = response.json()
+        content = message.get("content", [{}])[0].get("text", "")
+        usage = dict(message.get("usage") or {})
+        usage.setdefault('output_tokens', self.prompt_encoder.estimate_tokens(content))
+        return 200, response.headers, self._parse_content(content), usage
+    
+    async def _post_streaming(self, client: httpx.AsyncClient, request_data: Dict) -> Tuple[int, Any, Any, Dict]:
+        """
+        One server-sent-events attempt, resolved as soon as the nudge is known.
+        
+        Text deltas are fed to a StreamingNudgeParser; once nudge_text,
+        nudge_type and priority are complete the stream is closed, so the
+        model's trailing reasoning is neither awaited nor generated. Output
+        tokens of a stream closed early are estimated from the text received.
+        """
+        async with client.stream("POST", f"{self.base_url}/messages", headers=self.headers,
+                                 json={**request_data, "stream": True}) as response:
+            if response.status_code != 200:
+                await response.aread()
+                return response.status_code, response.headers, response.text, {}
+            
+            parser = StreamingNudgeParser()
+            usage = {}
+            async for line in response.aiter_lines():
+                if not line.startswith('data:'):
+                    continue
+                event = json.loads(line[5:])
+                event_type = event.get('type')
+                if event_type == 'content_block_delta' and event['delta'].get('type') == 'text_delta':
+                    nudge = parser.feed(event['delta']['text'])
+                    if nudge is not None:
+                        usage['output_tokens'] = self.prompt_encoder.estimate_tokens(parser.text)
+                        return 200, response.headers, nudge, usage
+                elif event_type == 'message_start':
+                    usage.update(event.get('message', {}).get('usage') or {})
+                elif event_type == 'message_delta':
+                    usage.update(event.get('usage') or {})
+                elif event_type == 'message_stop':
+                    break
+                elif event_type == 'error':
+                    raise RuntimeError(f"stream error: {event.get('error')}")
+            
+            usage.setdefault('output_tokens', self.prompt_encoder.estimate_tokens(parser.text))
+            return 200, response.headers, self._parse_content(parser.text), usage
+    
+    @staticmethod
+    def _parse_content(content: str) -> Dict:
+        """Parse the model's text as JSON if it looks like JSON"""
+        if content.strip().startswith('{'):
+            try:
+                return json.loads(content)
+            except json.JSONDecodeError:
+                pass
+        
+        return {"content": content}
+    
+    def _backoff(self, attempt: int, retry_after: Optional[str] = None) -> Optional[float]:
+        """
+        Seconds to wait before the next attempt.
+        
+        Honours a Retry-After header (delta-seconds or HTTP date) plus up to
+        one retry_delay of jitter, and returns None when the server asks for
+        longer than max_retry_after. Otherwise uses exponential backoff with
+        equal jitter, so concurrent clients do not retry in lockstep.
+        """
+        if retry_after:
+            try:
+                delay = float(retry_after)
+            except ValueError:
+                try:
+                    delay = (parsedate_to_datetime(retry_after) - datetime.now(timezone.utc)).total_seconds()
+                except (TypeError, ValueError):
+                    delay = None
+            if delay is not None:
+                if delay > self.max_retry_after:
+                    return None
+                return max(0.0, delay) + random.uniform(0, self.retry_delay)
+        
+        backoff = self.retry_delay * (2 ** attempt)
+        return backoff / 2 + random.uniform(0, backoff / 2)
+
+
+class ClaudeMicroBatcher:
+    """
+    Cross-user micro-batcher in front of a ClaudeClient.
+    
+    `analyze_telemetry` calls arriving within `max_wait_ms` of the first
+    queued one (or until `max_batch_size` users are waiting) share one
+    multi-user prompt that asks for a JSON array of per-user nudges; the
+    entries are fanned back out to the waiting callers. Users whose entry
+    is missing or unparseable fall back to single-user calls. Fusion and
+    other prompts go straight to the wrapped client.
+    """
+    
+    def __init__(self, client: ClaudeClient, max_batch_size: int = 16, max_wait_ms: float = 20.0,
+                 tokens_per_user: int = 120):
+        self.client = client
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.tokens_per_user = tokens_per_user
+        self._pending: List[Tuple[Dict, str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
+        self.batch_stats = {'batches': 0, 'batched_users': 0, 'single_calls': 0, 'fallbacks': 0}
+        
+        # Shared with the client so fusion prompts and call accounting see one provider
+        self.prompt_encoder = client.prompt_encoder
+        self.call_metrics = client.call_metrics
+    
+    async def analyze_telemetry(self, telemetry_data: Dict, context: str = "") -> Optional[Dict]:
+        """Queue one user's analysis and wait for its share of the next batch"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((telemetry_data, context, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._dispatch()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._dispatch)
+        return await future
+    
+    async def _make_request(self, prompt: str, max_tokens: int = 300,
+                            call_type: str = 'analysis', stream: Optional[bool] = None) -> Optional[Dict]:
+        return await self.client._make_request(prompt, max_tokens, call_type, stream)
+    
+    async def aclose(self):
+        if self._pending:
+            self._dispatch()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self.client.aclose()
+    
+    def _dispatch(self):
+        """Send everything queued so far as one batch"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        task = asyncio.ensure_future(self._run_batch(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _run_batch(self, batch: List[Tuple[Dict, str, asyncio.Future]]):
+        # Callers that gave up (e.g. latency budget) are dropped from the prompt
+        batch = [item for item in batch if not item[2].done()]
+        if not batch:
+            return
+        
+        try:
+            if len(batch) == 1:
+                self.batch_stats['single_calls'] += 1
+                results = [await self.client.analyze_telemetry(batch[0][0], batch[0][1])]
+            else:
+                results = await self._analyze_batch(batch)
+        except Exception as e:
+            logger.error(f"Claude batch analysis failed: {e}")
+            results = [None] * len(batch)
+        
+        for (_, _, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+    
+    async def _analyze_batch(self, batch: List[Tuple[Dict, str, asyncio.Future]]) -> List[Optional[Dict]]:
+        """One multi-user request; users missing from the answer are retried one by one"""
+        self.batch_stats['batches'] += 1
+        self.batch_stats['batched_users'] += len(batch)
+        
+        # Streaming would resolve on the first user's fields, so batches are always buffered
+        body = await self.client._make_request(
+            self.build_batch_prompt([(telemetry, context) for telemetry, context, _ in batch]),
+            max_tokens=self.tokens_per_user * len(batch), call_type='batch_analysis', stream=False
+        )
+        if body is None:
+            return [None] * len(batch)
+        
+        results = self._parse_batch(body, len(batch))
+        self.call_metrics.add_nudges('batch_analysis', sum(1 for result in results if result and result.get('nudge_text')))
+        missing = [index for index, result in enumerate(results) if result is None]
+        if missing:
+            logger.warning(f"Claude batch answer missing {len(missing)}/{len(batch)} users, using single calls")
+            self.batch_stats['fallbacks'] += len(missing)
+            singles = await asyncio.gather(*(self.client.analyze_telemetry(batch[index][0], batch[index][1])
+                                             for index in missing))
+            for index, result in zip(missing, singles):
+                results[index] = result
+        return results
+    
+    def build_batch_prompt(self, requests: List[Tuple[Dict, str]]) -> str:
+        """Multi-user analysis prompt: one compact telemetry line per numbered user"""
+        lines = []
+        for index, (telemetry, context) in enumerate(requests):
+            label = f"[{index}] {context} |" if context else f"[{index}]"
+            lines.append(f"{label} {self.prompt_encoder.encode_telemetry(telemetry)}")
+        users = '\n'.join(lines)
+        return f"""You are an AI productivity coach analyzing telemetry for {len(requests)} users. Judge each user independently.
+
+USERS:
+{users}
+
+For each user, provide a coaching recommendation only if there's a clear coaching opportunity (focus on productivity, stress, focus quality, break timing and energy).
+
+Respond with ONLY a JSON array holding exactly one object per user, in order:
+[
+    {{"user": 0, "nudge_text": "Clear, actionable coaching message or null", "nudge_type": "break_reminder|focus_boost|stress_reduction|productivity_tip", "confidence": 0.0-1.0, "priority": 1-3, "reasoning": "Brief explanation"}}
+]
+"""
+    
+    @staticmethod
+    def _parse_batch(body: Any, size: int) -> List[Optional[Dict]]:
+        """Per-user results from a batch answer; None for users that could not be parsed"""
+        results: List[Optional[Dict]] = [None] * size
+        entries = None
+        if isinstance(body, list):
+            entries = body
+        elif isinstance(body, dict) and isinstance(body.get('content'), str):
+            text = body['content']
+            start, end = text.find('['), text.rfind(']')
+            if 0 <= start < end:
+                try:
+                    entries = json.loads(text[start:end + 1])
+                except json.JSONDecodeError:
+                    entries = None
+        elif isinstance(body, dict):
+            # A single object wrapping the array, e.g. {"nudges": [...]}
+            entries = next((value for value in body.values() if isinstance(value, list)), None)
+        
+        if not isinstance(entries, list):
+            return results
+        
+        for position, entry in enumerate(entries):
+            if not isinstance(entry, dict):
+                continue
+            try:
+                index = int(entry.pop('user', position if len(entries) == size else -1))
+            except (TypeError, ValueError):
+                continue
+            if 0 <= index < size and results[index] is None:
+                results[index] = entry
+        return results
+
+
+class ResponseCache:
+    """
+    LRU + TTL cache of LLM coaching results keyed by a quantized context signature.
+
+    Steady-state ticks from the same user land in the same buckets and reuse
+    the previous answer instead of calling the LLM again. With scope 'user'
+    entries are per user; with 'global' users in the same situation share them.
+    Per-user caches grow with the number of active users (see reserve_users)
+    so a large fleet does not evict every entry before it is reused.
+    """
+    
+    SIGNATURE_FIELDS = ('energy_level', 'stress_level', 'focus_quality', 'break_needed', 'cognitive_load')
+    
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 300.0,
+                 scope: str = 'user', buckets: int = 5, entries_per_user: int = 4):
+        if scope not in ('user', 'global'):
+            raise ValueError("scope must be 'user' or 'global'")
+        self.max_entries = max_entries
+        self.entries_per_user = entries_per_user
+        self.ttl_seconds = ttl_seconds
+        self.scope = scope
+        self.buckets = buckets
+        self.entries = OrderedDict()  # Least recently used first
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def __len__(self) -> int:
+        return len(self.entries)
+    
+    def reserve_users(self, users: int):
+        """Make room for `entries_per_user` signatures per active user (no-op for the global scope)"""
+        if self.scope == 'user':
+            self.max_entries = max(self.max_entries, users * self.entries_per_user)
+    
+    def signature(self, context: Dict[str, Any], user_id: Optional[str] = None) -> Tuple:
+        """Bucketed scores plus activity type and time period (and user, when scoped per user)"""
+        buckets = tuple(
+            min(int(float(context.get(field, 0.5)) * self.buckets), self.buckets - 1)
+            for field in self.SIGNATURE_FIELDS
+        )
+        key = buckets + (context.get('current_activity_type'), context.get('time_period'))
+        return (user_id,) + key if self.scope == 'user' else key
+    
+    def get(self, key: Tuple) -> Tuple[bool, Optional[Dict]]:
+        """Return (hit, result); cached "no nudge" answers are hits with result None"""
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] > time.time():
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return True, dict(entry[1]) if entry[1] else entry[1]
+        if entry is not None:
+            del self.entries[key]
+            self.evictions += 1
+        self.misses += 1
+        return False, None
+    
+    def put(self, key: Tuple, result: Optional[Dict]):
+        """Store a result, evicting the least recently used entry when full"""
+        self.entries[key] = (time.time() + self.ttl_seconds, dict(result) if result else result)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+    
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'scope': self.scope,
+            'entries': len(self.entries),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+
+class CircuitBreaker:
+    """
+    Per-provider circuit breaker with closed, open and half-open states.
+
+    While closed, the outcomes of the last `window_size` calls are tracked;
+    calls slower than `latency_threshold` seconds count as failures. Once at
+    least `min_calls` outcomes are known and the failure rate reaches
+    `error_rate_threshold`, the breaker opens and rejects calls for a
+    cool-down. Afterwards one half-open probe is let through: success closes
+    the breaker, failure re-opens it with the cool-down doubled (up to
+    `max_cooldown`).
+    """
+    
+    def __init__(self, window_size: int = 20, min_calls: int = 5, error_rate_threshold: float = 0.5,
+                 latency_threshold: float = 20.0, base_cooldown: float = 30.0, max_cooldown: float = 600.0):
+        self.window_size = window_size
+        self.min_calls = min_calls
+        self.error_rate_threshold = error_rate_threshold
+        self.latency_threshold = latency_threshold
+        self.base_cooldown = base_cooldown
+        self.max_cooldown = max_cooldown
+        
+        self.outcomes = deque(maxlen=window_size)  # True for failures
+        self.cooldown = base_cooldown
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.times_opened = 0
+        self.rejected = 0
+        self._state = 'closed'
+    
+    @property
+    def state(self) -> str:
+        """'closed', 'open' or 'half_open' (open turns half-open once the cool-down has passed)"""
+        if self._state == 'open' and time.monotonic() - self.opened_at >= self.cooldown:
+            self._state = 'half_open'
+            self.probe_in_flight = False
+        return self._state
+    
+    def allow_request(self) -> bool:
+        """Whether a call may go out now; in half-open state only one probe at a time"""
+        state = self.state
+        if state == 'closed':
+            return True
+        if state == 'half_open' and not self.probe_in_flight:
+            self.probe_in_flight = True
+            return True
+        self.rejected += 1
+        return False
+    
+    def record_success(self, latency: float):
+        if latency > self.latency_threshold:
+            self.record_failure()
+        elif self._state == 'half_open':
+            # Probe succeeded: close and start over with the base cool-down
+            self._state = 'closed'
+            self.cooldown = self.base_cooldown
+            self.outcomes.clear()
+        else:
+            self.outcomes.append(False)
+    
+    def record_failure(self):
+        if self._state == 'half_open':
+            self._open(min(self.cooldown * 2, self.max_cooldown))
+            return
+        self.outcomes.append(True)
+        if len(self.outcomes) >= self.min_calls and sum(self.outcomes) / len(self.outcomes) >= self.error_rate_threshold:
+            self._open(self.base_cooldown)
+    
+    def record_cancelled(self, elapsed: float):
+        """A call abandoned by the caller (e.g. latency budget) only counts if it was already too slow"""
+        if elapsed > self.latency_threshold:
+            self.record_failure()
+        elif self._state == 'half_open':
+            self.probe_in_flight = False
+    
+    def _open(self, cooldown: float):
+        self._state = 'open'
+        self.cooldown = cooldown
+        self.opened_at = time.monotonic()
+        self.probe_in_flight = False
+        self.outcomes.clear()
+        self.times_opened += 1
+        logger.warning(f"Circuit opened for {cooldown:.0f}s after provider failures")
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'state': self.state,
+            'recent_error_rate': sum(self.outcomes) / len(self.outcomes) if self.outcomes else 0.0,
+            'cooldown_seconds': self.cooldown,
+            'times_opened': self.times_opened,
+            'rejected_calls': self.rejected
+        }
+
+
+class ProviderStats:
+    """EWMA latency and error rate of one provider, plus a latency window for its p90"""
+    
+    def __init__(self, alpha: float = 0.2, window_size: int = 100, min_samples: int = 10):
+        self.alpha = alpha
+        self.min_samples = min_samples
+        self.ewma_latency: Optional[float] = None
+        self.ewma_error_rate = 0.0
+        self.latencies = deque(maxlen=window_size)
+        self.calls = 0
+        self.last_used = 0.0
+    
+    def record(self, latency: Optional[float], failed: bool, lower_bound: bool = False):
+        """
+        Fold in one finished call; failures without a usable latency only move the error rate.
+        
+        With `lower_bound` the latency is the time until the call was abandoned
+        (deadline or cancellation), so it never lowers the latency estimate.
+        """
+        self.calls += 1
+        self.last_used = time.monotonic()
+        self.ewma_error_rate += self.alpha * (float(failed) - self.ewma_error_rate)
+        if latency is not None:
+            if lower_bound and self.ewma_latency is not None:
+                latency = max(latency, self.ewma_latency)
+            self.latencies.append(latency)
+            if self.ewma_latency is None:
+                self.ewma_latency = latency
+            else:
+                self.ewma_latency += self.alpha * (latency - self.ewma_latency)
+    
+    @property
+    def expected_latency(self) -> float:
+        """
+        Expected seconds to a successful answer.
+        
+        Untried providers count as instant so they get tried; providers that
+        were tried but never produced a latency sort last until re-measured.
+        """
+        if self.ewma_latency is None:
+            return 0.0 if self.calls == 0 else math.inf
+        return self.ewma_latency / max(1.0 - self.ewma_error_rate, 0.1)
+    
+    def p90(self) -> Optional[float]:
+        """90th percentile of recent latencies; None until enough calls were seen"""
+        if len(self.latencies) < self.min_samples:
+            return None
+        return float(np.percentile(self.latencies, 90))
+    
+    def stats(self) -> Dict[str, Any]:
+        p90 = self.p90()
+        return {
+            'calls': self.calls,
+            'ewma_latency_ms': round(self.ewma_latency * 1000, 1) if self.ewma_latency is not None else None,
+            'p90_latency_ms': round(p90 * 1000, 1) if p90 is not None else None,
+            'ewma_error_rate': round(self.ewma_error_rate, 3)
+        }
+
+
+class LocalCoachProvider:
+    """
+    In-process stand-in for an LLM provider.
+    
+    Answers in the LLM response format from simple telemetry heuristics, so
+    it can be routed to like any remote provider (offline use, tests, or as a
+    hedge). `latency` adds an artificial delay in seconds.
+    """
+    
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+    
+    async def analyze_telemetry(self, telemetry_data: Dict, context: str = "") -> Optional[Dict]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        
+        energy = telemetry_data.get('energy_level', 0.5)
+        stress = telemetry_data.get('stress_level', 0.5)
+        focus = telemetry_data.get('focus_quality', 0.5)
+        break_needed = telemetry_data.get('break_needed', 0.5)
+        productivity = telemetry_data.get('productivity_score', 0.5)
+        
+        if break_needed > 0.7 or energy < 0.25:
+            nudge = ("Step away for five minutes - a short break will recharge you.", 'break_reminder', 3)
+        elif stress > 0.65:
+            nudge = ("Pause for a few slow breaths before your next task.", 'stress_reduction', 2)
+        elif focus < 0.35:
+            nudge = ("Close extra tabs and pick one task for the next 25 minutes.", 'focus_boost', 2)
+        elif productivity < 0.35:
+            nudge = ("Break the current task into a small first step and start there.", 'productivity_tip', 1)
+        else:
+            return {'nudge_text': None, 'reasoning': 'No intervention needed'}
+        
+        text, nudge_type, priority = nudge
+        return {
+            'nudge_text': text,
+            'nudge_type': nudge_type,
+            'confidence': 0.6,
+            'priority': priority,
+            'reasoning': 'Local provider heuristics'
+        }
 
 
 class MultiProviderLLMClient:
-    """Intelligent multi-provider client with automatic failover"""
+    """
+    Intelligent multi-provider client with latency-aware routing and automatic failover
+    
+    Providers are any objects with an async `analyze_telemetry(telemetry,
+    context)`; those that also expose `_make_request(prompt, call_type=...)`
+    can run LLM fusion. Each call goes to the healthy provider with the lowest
+    expected latency (EWMA latency inflated by its EWMA error rate). With
+    `hedge_requests`, a second provider is started once the first exceeds its
+    own p90 latency and whichever answers first wins. Under a deadline, every
+    attempt that still has a failover target behind it gets only
+    1 - `failover_reserve` of the remaining budget.
+    """
     
-    def __init__(self, providers: Dict[str, Any]):
+    # Nudge types that recommend the same kind of intervention
+    COMPATIBLE_NUDGES = [
+        {'break_reminder', 'stress_reduction'},
+        {'focus_boost', 'productivity_tip'}
+    ]
+    
+    def __init__(self, providers: Dict[str, Any], cache: Optional[ResponseCache] = None,
+                 fusion_disagreement_threshold: float = 0.5,
+                 breakers: Optional[Dict[str, CircuitBreaker]] = None,
+                 hedge_requests: bool = False, explore_interval: int = 50,
+                 failover_reserve: float = 0.3):
         self.providers = providers
-        self.primary_provider = "claude"  # Prefer Claude
-        self.provider_health = {name: True for name in providers.keys()}
-        self.failover_attempts = {}
+        self.primary_provider = "claude" if "claude" in providers else next(iter(providers), None)  # Wins routing ties
+        self.breakers = {name: (breakers or {}).get(name) or CircuitBreaker() for name in providers.keys()}
+        self.failover_attempts = {name: 0 for name in providers.keys()}  # Calls skipped by an open circuit
+        self.cache = cache
+        
+        # Routing: per-provider latency/error tracking, hedging, and periodic re-measurement of idle providers
+        self.provider_stats = {name: ProviderStats() for name in providers.keys()}
+        self.hedge_requests = hedge_requests
+        self.explore_interval = explore_interval
+        self.failover_reserve = failover_reserve
+        self.routing_stats = {'routed': 0, 'hedged': 0, 'hedge_wins': 0, 'failovers': 0}
+        
+        # Claude and local analyses that disagree by more than this go to LLM fusion
+        self.fusion_disagreement_threshold = fusion_disagreement_threshold
+        self.fusion_stats = {'local': 0, 'forced_local': 0, 'llm': 0, 'llm_empty': 0, 'llm_failed': 0,
+                             'not_needed': 0}
+    
+    @property
+    def provider_health(self) -> Dict[str, bool]:
+        """Providers whose circuit is not open"""
+        return {name: breaker.state != 'open' for name, breaker in self.breakers.items()}
+    
+    def route(self, capability: Optional[str] = None) -> List[str]:
+        """
+        Healthy providers ordered by expected latency (fastest first).
         
-    async def analyze_telemetry(self, telemetry_data: Dict, context: str = "") -> Optional[Dict]:
-        """Analyze telemetry with dual AI analysis (Claude + Local ML + Fusion)"""
+        `capability` restricts the result to providers with that method.
+        Every `explore_interval` routings the least recently used provider is
+        moved to the front so a provider that recovered gets re-measured.
+        """
+        candidates = [name for name, provider in self.providers.items()
+                      if self.breakers[name].state != 'open'
+                      and (capability is None or hasattr(provider, capability))]
+        candidates.sort(key=lambda name: (self.provider_stats[name].expected_latency, name != self.primary_provider))
+        
+        self.routing_stats['routed'] += 1
+        if self.explore_interval and len(candidates) > 1 and self.routing_stats['routed'] % self.explore_interval == 0:
+            stale = min(candidates, key=lambda name: self.provider_stats[name].last_used)
+            candidates.remove(stale)
+            candidates.insert(0, stale)
+        return candidates
+    
+    async def aclose(self):
+        """Release network resources held by the providers"""
+        for provider in self.providers.values():
+            if hasattr(provider, 'aclose'):
+                await provider.aclose()
+    
+    async def _call_provider(self, name: str, coroutine, deadline: Optional[float] = None):
+        """Await a provider call through its circuit breaker; None when the circuit rejects it"""
+        breaker = self.breakers[name]
+        if not breaker.allow_request():
+            coroutine.close()
+            self.failover_attempts[name] += 1
+            return None
         
-        # Get Claude analysis
-        claude_result = None
-        if self.primary_provider in self.providers and self.provider_health.get(self.primary_provider, False):
-            try:
-                claude_result = await self.providers[self.primary_provider].analyze_telemetry(telemetry_data, context)
-                if claude_result:
-                    self.provider_health[self.primary_provider] = True
-                else:
-                    self.provider_health[self.primary_provider] = False
-                    
-            except Exception as e:
-                logger.warning(f"Claude analysis failed: {e}")
-                self.provider_health[self.primary_provider] = False
+        stats = self.provider_stats[name]
+        started = time.monotonic()
+        try:
+            result = await self._within_deadline(coroutine, deadline)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            # Abandoned calls only bound the latency from below, but a provider that keeps
+            # overrunning the budget must stop routing first
+            elapsed = time.monotonic() - started
+            breaker.record_cancelled(elapsed)
+            stats.record(elapsed, failed=True, lower_bound=True)
+            raise
+        except Exception:
+            breaker.record_failure()
+            stats.record(None, failed=True)
+            raise
+        
+        latency = time.monotonic() - started
+        if result:
+            breaker.record_success(latency)
+            stats.record(latency, failed=False)
+        else:
+            breaker.record_failure()
+            stats.record(None, failed=True)
+        return result
+    
+    async def _routed_analysis(self, telemetry_data: Dict, context: str,
+                               deadline: Optional[float] = None) -> Tuple[Optional[Dict], Optional[str]]:
+        """
+        Analyze with the fastest healthy provider, failing over to the next one.
+        
+        Returns the first successful result and the provider that produced it.
+        """
+        remaining = self.route('analyze_telemetry')
+        tasks: Dict[asyncio.Future, str] = {}
+        hedges = set()
+        hedge_delay = None
+        
+        def start(name: str):
+            # While a failover target is left, hold back part of the budget for it
+            attempt_deadline = deadline
+            if deadline is not None and remaining:
+                attempt_deadline = deadline - self.failover_reserve * max(deadline - time.monotonic(), 0.0)
+            tasks[asyncio.ensure_future(self._call_provider(
+                name, self.providers[name].analyze_telemetry(telemetry_data, context), attempt_deadline
+            ))] = name
+        
+        try:
+            while remaining or tasks:
+                if not tasks:
+                    name = remaining.pop(0)
+                    start(name)
+                    hedge_delay = self.provider_stats[name].p90() if self.hedge_requests and remaining else None
+                
+                done, _ = await asyncio.wait(set(tasks), timeout=hedge_delay, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # Slower than its own p90: race the next provider against it
+                    self.routing_stats['hedged'] += 1
+                    hedges.add(remaining[0])
+                    start(remaining.pop(0))
+                    hedge_delay = None
+                    continue
+                
+                for task in done:
+                    name = tasks.pop(task)
+                    try:
+                        result = task.result()
+                    except asyncio.TimeoutError:
+                        logger.warning(f"{name} analysis cancelled: latency budget exhausted")
+                        continue
+                    except Exception as e:
+                        logger.warning(f"{name} analysis failed: {e}")
+                        continue
+                    if result:
+                        if name in hedges:
+                            self.routing_stats['hedge_wins'] += 1
+                        return result, name
+                
+                if not tasks and remaining:
+                    self.routing_stats['failovers'] += 1
+        finally:
+            for task in tasks:
+                task.cancel()
+        
+        return None, None
+        
+    async def analyze_telemetry(self, telemetry_data: Dict, context: str = "",
+                                user_id: Optional[str] = None,
+                                signature_context: Optional[Dict] = None,
+                                deadline: Optional[float] = None) -> Optional[Dict]:
+        """
+        Analyze telemetry with dual AI analysis (Claude + Local ML + Fusion)
+        
+        When a cache is configured, results are looked up by the quantized
+        signature of `signature_context` (the analyzed context; defaults to the
+        telemetry itself) before any provider is called. LLM steps still
+        running at `deadline` (a time.monotonic() value) are cancelled and the
+        best answer available by then is returned. Results carry an
+        'analysis_path' of 'llm_fusion', 'llm', 'local' or 'cache'.
+        """
+        if self.cache is None:
+            return (await self._analyze_uncached(telemetry_data, context, deadline))[0]
+        
+        cache_key = self.cache.signature({
+            **telemetry_data, **(signature_context or {}),
+            'current_activity_type': telemetry_data.get('current_activity_type')
+        }, user_id)
+        hit, result = self.cache.get(cache_key)
+        if hit:
+            if result:
+                result['analysis_path'] = 'cache'
+            return result
+        
+        result, llm_answered = await self._analyze_uncached(telemetry_data, context, deadline)
+        # Local-only fallbacks are not cached so the LLM is retried on the next tick
+        if llm_answered:
+            self.cache.put(cache_key, result)
+        return result
+    
+    async def _analyze_uncached(self, telemetry_data: Dict, context: str,
+                                deadline: Optional[float] = None) -> Tuple[Optional[Dict], bool]:
+        """Run the provider analysis; also reports whether the LLM produced an answer"""
         
-        # Get local ML analysis (rule-based fallback)
+        # Get local ML analysis (rule-based fallback); it needs no I/O so it is ready first
         local_result = self._rule_based_analysis(telemetry_data)
+        if local_result:
+            local_result['analysis_path'] = 'local'
+        
+        # Get the LLM analysis from the fastest healthy provider
+        claude_result, provider_name = await self._routed_analysis(telemetry_data, context, deadline)
+        if claude_result:
+            claude_result['analysis_path'] = 'llm'
+            claude_result['provider'] = provider_name
         
-        # If we have both results, use Claude to fuse them
+        # If we have both results, fuse them: in-process when they agree, with Claude on real conflicts
         if claude_result and local_result and claude_result.get('nudge_text'):
+            disagreement = self._disagreement(claude_result, local_result)
+            conflict = disagreement > self.fusion_disagreement_threshold
+            fusion_providers = self.route('_make_request') if conflict else []
+            if not fusion_providers:
+                # A conflict with no routable fusion provider is still fused locally, but says so
+                self.fusion_stats['forced_local' if conflict else 'local'] += 1
+                return self._fuse_locally(claude_result, local_result, disagreement, forced=conflict), True
+            
+            self.fusion_stats['llm'] += 1
             try:
-                fusion_result = await self._fuse_analyses(claude_result, local_result, telemetry_data)
-                if fusion_result:
-                    return fusion_result
+                fusion_result = await self._call_provider(
+                    fusion_providers[0],
+                    self._fuse_analyses(claude_result, local_result, telemetry_data, fusion_providers[0]),
+                    deadline
+                )
+                if fusion_result and fusion_result.get('nudge_text'):
+                    fusion_result['analysis_path'] = 'llm_fusion'
+                    fusion_result['provider'] = fusion_providers[0]
+                    return fusion_result, True
+                # No usable nudge in the answer (or no answer): keep the Claude analysis
+                self.fusion_stats['llm_empty' if fusion_result else 'llm_failed'] += 1
+            except asyncio.TimeoutError:
+                self.fusion_stats['llm_failed'] += 1
+                logger.warning("AI fusion cancelled: latency budget exhausted, using Claude analysis")
             except Exception as e:
+                self.fusion_stats['llm_failed'] += 1
                 logger.warning(f"AI fusion failed: {e}")
+        elif claude_result:
+            self.fusion_stats['not_needed'] += 1
         
         # Return Claude result if available, otherwise local
         if claude_result and claude_result.get('nudge_text'):
-            return claude_result
+            return claude_result, True
         
-        return local_result
+        return local_result, bool(claude_result)
     
-    async def _fuse_analyses(self, claude_result: Dict, local_result: Dict, telemetry_data: Dict) -> Optional[Dict]:
-        """Use Claude to intelligently combine Claude and local ML results"""
+    def _disagreement(self, claude_result: Dict, local_result: Dict) -> float:
+        """
+        Disagreement score in [0, 1] between two analyses.
         
-        if self.primary_provider not in self.providers:
-            return claude_result
-            
-        fusion_prompt = f"""You are an AI coach fusion system. Combine these two coaching analyses into one optimal recommendation:
+        Nudge type counts 0.7 (0 same, 0.5 compatible, 1 different) and the
+        priority gap counts 0.3 (normalised over the 1-3 range).
+        """
+        claude_type = claude_result.get('nudge_type')
+        local_type = local_result.get('nudge_type')
+        if claude_type == local_type:
+            type_distance = 0.0
+        elif any({claude_type, local_type} <= group for group in self.COMPATIBLE_NUDGES):
+            type_distance = 0.5
+        else:
+            type_distance = 1.0
+        
+        try:
+            priority_gap = abs(float(claude_result.get('priority', 2)) - float(local_result.get('priority', 2))) / 2
+        except (TypeError, ValueError):
+            priority_gap = 1.0
+        return 0.7 * type_distance + 0.3 * min(priority_gap, 1.0)
+    
+    def _fuse_locally(self, claude_result: Dict, local_result: Dict, disagreement: float,
+                      forced: bool = False) -> Dict:
+        """
+        Deterministic in-process fusion of agreeing or compatible analyses.
+        
+        `forced` marks conflicting analyses fused here only because no LLM
+        fusion provider could be routed; the reasoning says so.
+        """
+        claude_confidence = float(claude_result.get('confidence', 0.8))
+        local_confidence = float(local_result.get('confidence', 0.5))
+        # Claude wins ties; agreement raises confidence, partial disagreement lowers it
+        lead = claude_result if claude_confidence >= local_confidence else local_result
+        return {
+            'nudge_text': lead['nudge_text'],
+            'nudge_type': lead.get('nudge_type', claude_result.get('nudge_type')),
+            'confidence': round(min(1.0, max(claude_confidence, local_confidence) + 0.1 * (0.5 - disagreement)), 3),
+            'priority': max(claude_result.get('priority', 2), local_result.get('priority', 2)),
+            'reasoning': (f"Claude and local analysis disagree (disagreement {disagreement:.2f}); "
+                          "fused locally because no LLM fusion provider was available") if forced
+                         else f"Claude and local analysis agree (disagreement {disagreement:.2f})",
+            'source': 'local_fusion',
+            'claude_insight': claude_result.get('reasoning', ''),
+            'local_insight': local_result.get('reasoning', ''),
+            'analysis_path': 'local_fusion',
+            'provider': claude_result.get('provider')
+        }
+    
+    @staticmethod
+    async def _within_deadline(coroutine, deadline: Optional[float]):
+        """Await `coroutine`, cancelling it with asyncio.TimeoutError at `deadline`"""
+        if deadline is None:
+            return await coroutine
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            coroutine.close()
+            raise asyncio.TimeoutError
+        return await asyncio.wait_for(coroutine, remaining)
+    
+    async def _fuse_analyses(self, claude_result: Dict, local_result: Dict, telemetry_data: Dict,
+                             provider_name: str) -> Optional[Dict]:
+        """
+        Use an LLM provider to intelligently combine the LLM and local ML results.
+        
+        Returns the provider's parsed answer even without a nudge_text (an
+        empty answer is not a provider fault for the circuit breaker); None
+        means the request itself failed.
+        """
+        
+        provider = self.providers[provider_name]
+        fusion_prompt = self.build_fusion_prompt(
+            claude_result, local_result, telemetry_data, getattr(provider, 'prompt_encoder', None)
+        )
+        return await provider._make_request(fusion_prompt, call_type='fusion')
+    
+    @staticmethod
+    def build_fusion_prompt(claude_result: Dict, local_result: Dict, telemetry_data: Dict,
+                            encoder: Optional[PromptEncoder] = None) -> str:
+        """Fusion prompt; the telemetry gets half the encoder's token budget since both analyses are included"""
+        encoder = encoder or PromptEncoder()
+        return f"""You are an AI coach fusion system. Combine these two coaching analyses into one optimal recommendation:
 
 CLAUDE ANALYSIS:
-{json.dumps(claude_result, indent=2)}
+{encoder.encode_analysis(claude_result)}
 
 LOCAL ML ANALYSIS:
-{json.dumps(local_result, indent=2)}
+{encoder.encode_analysis(local_result)}
 
 TELEMETRY CONTEXT:
-{json.dumps(telemetry_data, indent=2)}
+{encoder.encode_telemetry(telemetry_data, encoder.token_budget // 2)}
 
 Create a fused recommendation that:
 1. Takes the best insights from both analyses
@@ -265,15 +1379,6 @@ Respond with JSON:
     "local_insight": "Key insight from local ML"
 }}
 """
-        
-        try:
-            fusion_result = await self.providers[self.primary_provider]._make_request(fusion_prompt)
-            if fusion_result and fusion_result.get('nudge_text'):
-                return fusion_result
-        except Exception as e:
-            logger.error(f"Fusion analysis failed: {e}")
-        
-        return None
     
     def _rule_based_analysis(self, telemetry_data: Dict) -> Optional[Dict]:
         """Fallback rule-based analysis when AI is unavailable"""
@@ -317,7 +1422,10 @@ class SimpleClassifier:
     
     def __init__(self):
         self.tree = {}
-        self.feature_stats = {}
+        # Fitted per-feature statistics, stored as vectors for broadcasted prediction
+        self.mean_effective = np.zeros(0)
+        self.std_effective = np.zeros(0)
+        self.threshold = np.zeros(0)
     
     def fit(self, X, y):
         """Simple fitting based on feature thresholds"""
@@ -325,45 +1433,38 @@ class SimpleClassifier:
         y_array = np.array(y)
         
         # Calculate feature statistics
-        for i in range(X_array.shape[1]):
-            feature_values = X_array[:, i]
-            effective_values = feature_values[y_array == 1]
-            if len(effective_values) > 0:
-                self.feature_stats[i] = {
-                    'mean_effective': np.mean(effective_values),
-                    'std_effective': np.std(effective_values),
-                    'threshold': np.median(feature_values)
-                }
+        effective_values = X_array[y_array == 1]
+        if len(effective_values) > 0:
+            self.set_statistics(
+                np.mean(effective_values, axis=0),
+                np.std(effective_values, axis=0),
+                np.median(X_array, axis=0)
+            )
     
-    def predict_proba(self, X):
-        """Simple probability prediction"""
-        X_array = np.array(X)
-        probs = []
-        
-        for sample in X_array:
-            score = 0.0
-            for i, value in enumerate(sample):
-                if i in self.feature_stats:
-                    stats = self.feature_stats[i]
-                    # Higher score if closer to effective mean
-                    if stats['std_effective'] > 0:
-                        distance = abs(value - stats['mean_effective']) / stats['std_effective']
-                        score += max(0, 1 - distance) / len(self.feature_stats)
-            
-            probs.append([1 - score, score])
+    def set_statistics(self, mean_effective: np.ndarray, std_effective: np.ndarray, threshold: np.ndarray):
+        """Install per-feature statistics computed elsewhere (e.g. by online training)"""
+        self.mean_effective = np.asarray(mean_effective, dtype=np.float64)
+        self.std_effective = np.asarray(std_effective, dtype=np.float64)
+        self.threshold = np.asarray(threshold, dtype=np.float64)
+    
+    def predict_proba(self, X):
+        """Simple probability prediction (one broadcasted expression over all samples)"""
+        X_array = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        n_features = len(self.mean_effective)
+        if n_features == 0:
+            score = np.zeros(len(X_array))
+        else:
+            # Higher score if closer to effective mean; features with zero spread are skipped
+            valid = np.flatnonzero(self.std_effective > 0)
+            distance = np.abs(X_array[:, valid] - self.mean_effective[valid]) / self.std_effective[valid]
+            score = np.maximum(0.0, 1.0 - distance).sum(axis=1) / n_features
         
-        return np.array(probs)
+        return np.column_stack([1 - score, score])
     
     @property
     def feature_importances_(self):
         """Simple feature importance based on variance"""
-        importances = []
-        for i in range(max(self.feature_stats.keys()) + 1 if self.feature_stats else 0):
-            if i in self.feature_stats:
-                importances.append(self.feature_stats[i]['std_effective'])
-            else:
-                importances.append(0.0)
-        return importances
+        return self.std_effective.tolist()
 
 
 class SimpleScaler:
@@ -388,8 +1489,22 @@ class SimpleScaler:
 class ContextEngine:
     """Advanced context analysis combining evolved patterns with AI learning"""
     
+    # Telemetry read by the estimators, with the default used when a user omits it
+    ESTIMATOR_INPUTS = {
+        'keystrokes_per_min': 0, 'app_switches_per_hour': 0, 'error_rate': 0.0, 'backspace_rate': 0.0,
+        'lines_of_code_written': 0, 'documents_edited': 0, 'tasks_completed_last_hour': 0,
+        'deep_focus_minutes': 0, 'notifications_last_hour': 0, 'primary_app_time_percentage': 50,
+        'mouse_distance_traveled': 0, 'posture_quality': 0.5, 'active_window_count': 1,
+        'cyclomatic_complexity': 1.0, 'thinking_pauses_per_hour': 0, 'search_queries_last_hour': 0
+    }
+    # Context metrics that telemetry may provide directly instead of having them estimated
+    CONTEXT_OVERRIDES = ('energy_level', 'stress_level', 'productivity_score', 'focus_quality',
+                         'break_needed', 'cognitive_load')
+    # Users read per pass over the batch; a chunk's dicts stay in cache across the passes
+    BATCH_CHUNK_SIZE = 2048
+    
     def __init__(self):
-        self.context_history = []
+        self.context_history = deque(maxlen=50)
         self.user_patterns = {}
         self.effectiveness_scores = {}
         
@@ -408,19 +1523,171 @@ class ContextEngine:
             'cognitive_load': telemetry.get('cognitive_load', self._estimate_cognitive_load(telemetry))
         }
         
-        # Store in history for pattern recognition
+        # Store in history for pattern recognition (bounded to the last 50 entries)
         self.context_history.append({
             'timestamp': datetime.now(),
             'context': context,
             'telemetry': telemetry
         })
-        
-        # Keep only recent history (last 50 entries)
-        if len(self.context_history) > 50:
-            self.context_history.pop(0)
-            
+
         return context
-    
+
+    def analyze_context_batch(self, telemetry_list: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Vectorized analyze_context over a batch of telemetry dicts.
+
+        Returns one float64 column per context metric plus the shared
+        'time_period' string. Raises TypeError/ValueError when a value
+        cannot be represented as a float column.
+        """
+        now = datetime.now()
+        size = self.BATCH_CHUNK_SIZE
+        # An empty batch still reads one (empty) chunk so that every column exists
+        chunks = [self._read_chunk(telemetry_list[start:start + size], now)
+                  for start in range(0, max(len(telemetry_list), 1), size)]
+        inputs = {key: np.concatenate([chunk[key] for chunk in chunks]) for key in chunks[0]}
+        time_since_break = inputs['time_since_break']
+
+        def provided_or(key: str, estimate: np.ndarray) -> np.ndarray:
+            # NaN marks "not provided"; real values always take precedence
+            provided = inputs[key]
+            return np.where(np.isnan(provided), estimate, provided)
+
+        # Energy (mirrors _estimate_energy)
+        keystrokes = inputs['keystrokes_per_min']
+        energy = 1.0 - np.minimum(time_since_break / 4.0, 0.5)
+        energy = energy - np.where(keystrokes < 20, 0.2, 0.0)
+        energy = energy + np.where((keystrokes > 40) & (keystrokes < 80), 0.1, 0.0)
+        energy = np.clip(energy, 0.0, 1.0)
+
+        # Stress (mirrors _estimate_stress)
+        context_switches = inputs['app_switches_per_hour']
+        stress = 0.2 + np.minimum(inputs['error_rate'] * 2.0, 0.3)
+        stress = stress + np.minimum(inputs['backspace_rate'] * 1.5, 0.2)
+        stress = np.minimum(1.0, stress + np.minimum(context_switches / 60.0, 0.3))
+
+        # Productivity (mirrors _calculate_productivity)
+        lines_written = inputs['lines_of_code_written']
+        documents_edited = inputs['documents_edited']
+        productivity = 0.3 + np.minimum(inputs['tasks_completed_last_hour'] * 0.15, 0.3)
+        productivity = productivity + np.minimum(inputs['deep_focus_minutes'] / 60.0 * 0.3, 0.3)
+        productivity = productivity + np.minimum((lines_written + documents_edited * 10) / 100.0 * 0.1, 0.1)
+        productivity = np.minimum(1.0, productivity)
+
+        # Focus (mirrors _assess_focus)
+        focus = 1.0 - np.minimum(context_switches / 30.0, 0.4)
+        focus = focus - np.minimum(inputs['notifications_last_hour'] / 20.0, 0.3)
+        focus = np.maximum(0.0, focus * (inputs['primary_app_time_percentage'] / 100.0))
+
+        # Break urgency (mirrors _check_break_timing)
+        break_need = 0.0 + np.minimum(time_since_break / 2.0, 0.5)
+        break_need = break_need + np.where(inputs['mouse_distance_traveled'] > 10000, 0.2, 0.0)
+        break_need = np.minimum(1.0, break_need + (1.0 - inputs['posture_quality']) * 0.3)
+
+        # Cognitive load (mirrors _estimate_cognitive_load)
+        load = 0.2 + np.minimum(inputs['active_window_count'] / 10.0, 0.3)
+        load = load + np.minimum(inputs['cyclomatic_complexity'] / 10.0, 0.2)
+        load = load + np.minimum(inputs['thinking_pauses_per_hour'] / 30.0, 0.2)
+        load = np.minimum(1.0, load + np.minimum(inputs['search_queries_last_hour'] / 20.0, 0.1))
+
+        columns = {
+            'energy_level': provided_or('energy_level', energy),
+            'stress_level': provided_or('stress_level', stress),
+            'productivity_score': provided_or('productivity_score', productivity),
+            'focus_quality': provided_or('focus_quality', focus),
+            'break_needed': provided_or('break_needed', break_need),
+            'time_period': self._get_time_period(),
+            'cognitive_load': provided_or('cognitive_load', load)
+        }
+
+        # Only the most recent entries would survive the bounded history anyway
+        start = max(0, len(telemetry_list) - self.context_history.maxlen)
+        recent = range(start, len(telemetry_list))
+        for i, context in zip(recent, self.contexts_from_columns(columns, recent)):
+            self.context_history.append({
+                'timestamp': now,
+                'context': context,
+                'telemetry': telemetry_list[i]
+            })
+
+        return columns
+
+    @staticmethod
+    def contexts_from_columns(columns: Dict[str, Any], rows: Optional[List[int]] = None) -> List[Dict[str, Any]]:
+        """Build the scalar context dicts for every row of a batch (or only the given rows)"""
+        keys = list(columns)
+        values = [repeat(value) if isinstance(value, str) else (value if rows is None else value[rows]).tolist()
+                  for value in columns.values()]
+        return [dict(zip(keys, row)) for row in zip(*values)]
+
+    def _read_chunk(self, telemetry_list: List[Dict[str, Any]], now: datetime) -> Dict[str, np.ndarray]:
+        """
+        Float columns of everything analyze_context_batch reads from telemetry.
+        
+        Missing estimator inputs take their defaults and missing overrides are
+        NaN. Keys that every dict has are read together, one dict at a time.
+        """
+        count = len(telemetry_list)
+        present = set().union(*telemetry_list)  # Keys sent by at least one user
+        columns = {'time_since_break': self._seconds_since_break_batch(telemetry_list, now) / 3600.0}
+        keys = [key for key in chain(self.ESTIMATOR_INPUTS, self.CONTEXT_OVERRIDES) if key in present]
+        while len(keys) > 1:
+            try:
+                values = np.fromiter(chain.from_iterable(map(itemgetter(*keys), telemetry_list)),
+                                     dtype=np.float64, count=count * len(keys))
+            except KeyError as e:
+                keys.remove(e.args[0])  # Some dict lacks it; it is read on its own below
+            else:
+                columns.update(zip(keys, values.reshape(-1, len(keys)).T))
+                break
+
+        for key, default in chain(self.ESTIMATOR_INPUTS.items(), zip(self.CONTEXT_OVERRIDES, repeat(np.nan))):
+            if key in columns:
+                continue
+            if key not in present:
+                columns[key] = np.full(count, default, dtype=np.float64)
+                continue
+            try:
+                # Plain indexing is faster and works when every user sent the key
+                columns[key] = np.fromiter(map(dict.__getitem__, telemetry_list, repeat(key)),
+                                           dtype=np.float64, count=count)
+            except KeyError:
+                columns[key] = np.fromiter(map(dict.get, telemetry_list, repeat(key), repeat(default)),
+                                           dtype=np.float64, count=count)
+        return columns
+
+    def _seconds_since_break_batch(self, telemetry_list: List[Dict[str, Any]], now: datetime) -> np.ndarray:
+        """_seconds_since_break for a batch, parsing ISO strings in one NumPy call"""
+        last_breaks = list(map(dict.get, telemetry_list, repeat('last_break_time')))
+        try:
+            ''.join(last_breaks)  # Raises TypeError unless every value is a string
+            lengths = set(map(len, last_breaks))
+        except TypeError:
+            lengths = {None}
+        # Only naive "YYYY-MM-DDTHH:MM:SS[.ffffff]" strings parse identically in NumPy and datetime
+        if lengths <= {19, 26}:
+            try:
+                with warnings.catch_warnings():
+                    warnings.simplefilter('error')  # Time zone offsets warn in NumPy but fail in datetime
+                    stamps = np.array(last_breaks, dtype='datetime64[us]')
+            except (ValueError, Warning):
+                pass
+            else:
+                elapsed = (np.datetime64(now, 'us') - stamps).astype(np.int64)
+                # timedelta.seconds: whole seconds modulo one day
+                return ((elapsed // 1000000) % 86400).astype(np.float64)
+        return np.fromiter((self._seconds_since_break(t, now) for t in telemetry_list),
+                           dtype=np.float64, count=len(telemetry_list))
+
+    def _seconds_since_break(self, telemetry: Dict, now: datetime) -> int:
+        """Whole seconds since the last break, using the same rules as the scalar estimators"""
+        if 'last_break_time' not in telemetry:
+            return 7200  # Default assumes a break two hours ago
+        last_break = telemetry['last_break_time']
+        if isinstance(last_break, str):
+            last_break = datetime.fromisoformat(last_break)
+        return (now - last_break).seconds
+
     def _estimate_energy(self, telemetry: Dict) -> float:
         """Estimate user energy based on activity patterns"""
         # Time since last break
@@ -537,10 +1804,30 @@ class ContextEngine:
 class CoachingStrategy:
     """Intelligent coaching strategy selection based on evolved patterns"""
     
+    # One representative value per quantization bin, in decision table axis order.
+    # Bins follow the rule thresholds: stress >0.7; energy <0.3, <0.5, <=0.6, >0.6;
+    # productivity >0.7; focus <0.3, <=0.7, >0.7; break >0.7; cognitive load >0.8.
+    BIN_REPRESENTATIVES = {
+        'stress_level': (0.0, 1.0),
+        'energy_level': (0.0, 0.3, 0.5, 1.0),
+        'productivity_score': (0.0, 1.0),
+        'focus_quality': (0.0, 0.3, 1.0),
+        'break_needed': (0.0, 1.0),
+        'cognitive_load': (0.0, 1.0),
+        'time_period': ('night', 'morning', 'afternoon')
+    }
+    TIME_PERIOD_BINS = {'morning': 1, 'afternoon': 2}
+    
     def __init__(self):
         self.strategies = self._load_evolved_strategies()
         self.effectiveness_history = {}
         
+        # Compiled rule chain and per-key best message, indexed by strategy key position
+        self.strategy_keys = list(self.strategies)
+        self.decision_table = self._compile_decision_table()
+        self.decision_cells = self.decision_table.ravel().tolist()
+        self.best_strategies = [self._rank_strategy(key) for key in self.strategy_keys] + [None]
+        
     def _load_evolved_strategies(self) -> Dict[str, List[Dict]]:
         """Load coaching strategies discovered through evolution"""
         return {
@@ -645,49 +1932,89 @@ class CoachingStrategy:
         }
     
     def select_strategy(self, context: Dict[str, float]) -> Optional[Dict]:
-        """Select best coaching strategy based on context"""
-        # Determine primary coaching need based on evolved logic
+        """Select best coaching strategy based on context (one decision table lookup)"""
+        energy = context['energy_level']
+        focus = context['focus_quality']
+        # Row-major offset into decision_table (axes as in BIN_REPRESENTATIVES)
+        cell = (((((((context['stress_level'] > 0.7) * 4
+                     + (energy >= 0.3) + (energy >= 0.5) + (energy > 0.6)) * 2
+                    + (context['productivity_score'] > 0.7)) * 3
+                   + (focus >= 0.3) + (focus > 0.7)) * 2
+                  + (context['break_needed'] > 0.7)) * 2
+                 + (context['cognitive_load'] > 0.8)) * 3
+                + self.TIME_PERIOD_BINS.get(context['time_period'], 0))
+        return self.best_strategies[self.decision_cells[cell]]
+
+    def select_strategy_batch(self, columns: Dict[str, Any]) -> List[Optional[Dict]]:
+        """Vectorized select_strategy over the columns produced by analyze_context_batch"""
+        energy = columns['energy_level']
+        focus = columns['focus_quality']
+
+        # Same row-major offsets as select_strategy, one flat gather for the whole batch
+        cells = (((((((columns['stress_level'] > 0.7) * 4
+                      + (energy >= 0.3) + (energy >= 0.5) + (energy > 0.6)) * 2
+                     + (columns['productivity_score'] > 0.7)) * 3
+                    + (focus >= 0.3) + (focus > 0.7)) * 2
+                   + (columns['break_needed'] > 0.7)) * 2
+                  + (columns['cognitive_load'] > 0.8)) * 3
+                 + self.TIME_PERIOD_BINS.get(columns['time_period'], 0))
+        key_index = np.take(self.decision_table.ravel(), cells)
+        return list(map(self.best_strategies.__getitem__, key_index.tolist()))
+
+    def record_effectiveness(self, strategy_key: str, message: str, effectiveness: float):
+        """Record strategy effectiveness for learning"""
+        if strategy_key not in self.effectiveness_history:
+            self.effectiveness_history[strategy_key] = {}
+        
+        # Update with exponential moving average
+        current = self.effectiveness_history[strategy_key].get(message, 0.5)
+        self.effectiveness_history[strategy_key][message] = current * 0.7 + effectiveness * 0.3
+        
+        # Only this key's ranking can change
+        if strategy_key in self.strategy_keys:
+            self.best_strategies[self.strategy_keys.index(strategy_key)] = self._rank_strategy(strategy_key)
+
+    @staticmethod
+    def _match_rule(context: Dict[str, Any]) -> Optional[str]:
+        """The evolved rule chain; only evaluated when compiling the decision table"""
         if context['stress_level'] > 0.7 and context['energy_level'] < 0.3:
-            strategy_key = 'high_stress_low_energy'
+            return 'high_stress_low_energy'
         elif context['productivity_score'] > 0.7 and context['focus_quality'] > 0.7:
-            strategy_key = 'high_productivity_flow'
+            return 'high_productivity_flow'
         elif context['focus_quality'] < 0.3:
-            strategy_key = 'low_focus_high_switches'
+            return 'low_focus_high_switches'
         elif context['break_needed'] > 0.7:
-            strategy_key = 'break_needed'
+            return 'break_needed'
         elif context['time_period'] == 'afternoon' and context['energy_level'] < 0.5:
-            strategy_key = 'afternoon_slump'
+            return 'afternoon_slump'
         elif context['time_period'] == 'morning' and context['energy_level'] > 0.6:
-            strategy_key = 'morning_prime'
+            return 'morning_prime'
         elif context['cognitive_load'] > 0.8:
-            strategy_key = 'cognitive_overload'
-        else:
-            return None
-        
-        # Get strategy options
+            return 'cognitive_overload'
+        return None
+
+    def _compile_decision_table(self) -> np.ndarray:
+        """Evaluate the rule chain once per quantization cell"""
+        fields = list(self.BIN_REPRESENTATIVES)
+        cells = product(*self.BIN_REPRESENTATIVES.values())
+        keys = [self._match_rule(dict(zip(fields, cell))) for cell in cells]
+        # Unmatched cells point at the trailing None of best_strategies
+        codes = [self.strategy_keys.index(key) if key in self.strategy_keys else -1 for key in keys]
+        shape = [len(values) for values in self.BIN_REPRESENTATIVES.values()]
+        return np.array(codes, dtype=np.int8).reshape(shape)
+
+    def _rank_strategy(self, strategy_key: str) -> Optional[Dict]:
+        """Most effective message for a strategy key (first best wins ties)"""
         strategies = self.strategies.get(strategy_key, [])
         if not strategies:
             return None
-            
-        # Select based on effectiveness history
+        
         if strategy_key in self.effectiveness_history:
-            sorted_strategies = sorted(
+            return max(
                 strategies,
-                key=lambda s: self.effectiveness_history[strategy_key].get(s['message'], 0.5),
-                reverse=True
+                key=lambda s: self.effectiveness_history[strategy_key].get(s['message'], 0.5)
             )
-            return sorted_strategies[0]
-        else:
-            return strategies[0]
-    
-    def record_effectiveness(self, strategy_key: str, message: str, effectiveness: float):
-        """Record strategy effectiveness for learning"""
-        if strategy_key not in self.effectiveness_history:
-            self.effectiveness_history[strategy_key] = {}
-        
-        # Update with exponential moving average
-        current = self.effectiveness_history[strategy_key].get(message, 0.5)
-        self.effectiveness_history[strategy_key][message] = current * 0.7 + effectiveness * 0.3
+        return strategies[0]
 
 
 class NotificationManager:
@@ -728,12 +2055,131 @@ class NotificationManager:
         
         return True
     
+class DecayedScore:
+    """Exponentially-decayed running average of effectiveness scores for one action"""
+    
+    def __init__(self, decay: float = 0.9, reservoir_size: int = 0):
+        self.decay = decay
+        self.weighted_sum = 0.0
+        self.weight = 0.0
+        self.count = 0
+        self.reservoir_size = reservoir_size
+        self.reservoir = []  # Uniform sample of past scores, kept for diagnostics only
+    
+    def update(self, score: float):
+        """Fold in a new score; older scores lose weight by `decay` per update"""
+        self.weighted_sum = self.weighted_sum * self.decay + score
+        self.weight = self.weight * self.decay + 1.0
+        self.count += 1
+        
+        if self.reservoir_size > 0:
+            if len(self.reservoir) < self.reservoir_size:
+                self.reservoir.append(score)
+            else:
+                slot = random.randrange(self.count)
+                if slot < self.reservoir_size:
+                    self.reservoir[slot] = score
+    
+    @property
+    def value(self) -> float:
+        return self.weighted_sum / self.weight if self.weight > 0 else 0.5
+
+
+class StateTransitionStore:
+    """
+    Fleet-wide state transition counts.
+
+    The energy/stress/focus discretization gives 8 states, encoded as
+    4*high_energy + 2*stressed + focused. Every user owns one 8x8 int32 row
+    of a (users, 8, 8) count tensor plus the code of their last state, so
+    next-state distributions for the whole fleet come from one normalisation.
+    """
+
+    STATES = tuple(f"{energy}_{stress}_{focus}"
+                   for energy in ('low', 'high')
+                   for stress in ('calm', 'stressed')
+                   for focus in ('distracted', 'focused'))
+
+    def __init__(self, initial_users: int = 16):
+        self.user_index = {}
+        self.counts = np.zeros((initial_users, len(self.STATES), len(self.STATES)), dtype=np.int32)
+        self.last_state = np.full(initial_users, -1, dtype=np.int8)
+
+    def __len__(self) -> int:
+        return len(self.user_index)
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self.user_index
+
+    @staticmethod
+    def state_code(context: Dict) -> int:
+        """Discretize a context into its state code"""
+        return (4 * (context.get('energy_level', 0.5) >= 0.4)
+                + 2 * (context.get('stress_level', 0.5) > 0.6)
+                + (context.get('focus_quality', 0.5) > 0.6))
+
+    @staticmethod
+    def state_codes_batch(columns: Dict[str, np.ndarray]) -> np.ndarray:
+        """State codes for columnar contexts (see ContextEngine.analyze_context_batch)"""
+        return (4 * (columns['energy_level'] >= 0.4)
+                + 2 * (columns['stress_level'] > 0.6)
+                + (columns['focus_quality'] > 0.6)).astype(np.int8)
+
+    def record(self, user_id: str, state: int):
+        """Count the transition from the user's last state into `state`"""
+        row = self._row(user_id)
+        previous = self.last_state[row]
+        if previous >= 0:
+            self.counts[row, previous, state] += 1
+        self.last_state[row] = state
+
+    def counts_for(self, user_id: str) -> np.ndarray:
+        """8x8 transition counts for one user (a view while the user is known)"""
+        row = self.user_index.get(user_id)
+        if row is None:
+            return np.zeros(self.counts.shape[1:], dtype=self.counts.dtype)
+        return self.counts[row]
+
+    def next_state_distributions(self, user_ids: Optional[List[str]] = None) -> np.ndarray:
+        """
+        Row-normalised transition probabilities, shaped (users, 8, 8).
+
+        Rows for states a user has never left are all zeros. Without
+        `user_ids` the result covers every known user in insertion order;
+        unknown users get all-zero matrices.
+        """
+        if user_ids is None:
+            counts = self.counts[:len(self.user_index)]
+        else:
+            rows = np.fromiter(map(self.user_index.get, user_ids, repeat(-1)), dtype=np.int64, count=len(user_ids))
+            counts = np.where((rows >= 0)[:, None, None], np.take(self.counts, rows, axis=0), 0)
+        totals = counts.sum(axis=-1, keepdims=True)
+        return np.divide(counts, totals, out=np.zeros(counts.shape), where=totals > 0)
+
+    def _row(self, user_id: str) -> int:
+        row = self.user_index.get(user_id)
+        if row is None:
+            row = len(self.user_index)
+            if row == len(self.last_state):
+                self._grow()
+            self.user_index[user_id] = row
+        return row
+
+    def _grow(self):
+        """Double the number of user rows (amortized O(1) per new user)"""
+        self.counts = np.concatenate([self.counts, np.zeros_like(self.counts)])
+        self.last_state = np.concatenate([self.last_state, np.full_like(self.last_state, -1)])
+
+
 class UserModel:
     """Individual user behavior modeling with learning capabilities"""
     
-    def __init__(self, user_id: str):
+    def __init__(self, user_id: str, effectiveness_decay: float = 0.9, reservoir_size: int = 0,
+                 transitions: Optional[StateTransitionStore] = None):
         self.user_id = user_id
-        self.interaction_history = []
+        self.effectiveness_decay = effectiveness_decay
+        self.reservoir_size = reservoir_size
+        self.interaction_history = deque(maxlen=100)  # Recent window; AICoach keeps the tiered history
         self.feedback_history = []
         self.preference_model = {
             'preferred_break_duration': 5,
@@ -742,7 +2188,13 @@ class UserModel:
             'stress_triggers': [],
             'productivity_patterns': []
         }
-        self.state_transition_matrix = defaultdict(lambda: defaultdict(float))
+        # Shared with the rest of the fleet when created by AICoach
+        self.transitions = transitions if transitions is not None else StateTransitionStore(initial_users=1)
+    
+    @property
+    def state_transition_matrix(self) -> np.ndarray:
+        """8x8 transition counts, indexed by StateTransitionStore state codes"""
+        return self.transitions.counts_for(self.user_id)
         
     def update_from_interaction(self, context: Dict, action: str, outcome: Optional[Dict] = None):
         """Learn from each interaction"""
@@ -755,48 +2207,68 @@ class UserModel:
         self.interaction_history.append(interaction)
         
         # Learn state transitions
-        if len(self.interaction_history) > 1:
-            prev_state = self._extract_state(self.interaction_history[-2]['context'])
-            curr_state = self._extract_state(context)
-            self.state_transition_matrix[prev_state][curr_state] += 1
+        self.transitions.record(self.user_id, StateTransitionStore.state_code(context))
         
         # Update preference model
         if outcome and 'effectiveness' in outcome:
-            if action not in self.preference_model['notification_effectiveness']:
-                self.preference_model['notification_effectiveness'][action] = []
-            self.preference_model['notification_effectiveness'][action].append(outcome['effectiveness'])
-    
-    def _extract_state(self, context: Dict) -> str:
-        """Convert context to discrete state"""
-        energy = 'low' if context.get('energy_level', 0.5) < 0.4 else 'high'
-        stress = 'stressed' if context.get('stress_level', 0.5) > 0.6 else 'calm'
-        focus = 'focused' if context.get('focus_quality', 0.5) > 0.6 else 'distracted'
-        return f"{energy}_{stress}_{focus}"
+            scores = self.preference_model['notification_effectiveness']
+            if action not in scores:
+                scores[action] = DecayedScore(self.effectiveness_decay, self.reservoir_size)
+            scores[action].update(outcome['effectiveness'])
     
     def predict_next_state(self, current_context: Dict) -> Dict[str, float]:
         """Predict likely next states based on history"""
-        current_state = self._extract_state(current_context)
-        transitions = self.state_transition_matrix[current_state]
+        transitions = self.state_transition_matrix[StateTransitionStore.state_code(current_context)]
         
-        if not transitions:
+        total = int(transitions.sum())
+        if not total:
             return {}
         
-        total = sum(transitions.values())
-        return {state: count/total for state, count in transitions.items()}
+        return {StateTransitionStore.STATES[code]: count / total
+                for code, count in enumerate(transitions.tolist()) if count}
     
     def get_personalized_recommendation(self, action: str) -> float:
         """Get personalized effectiveness score for an action"""
-        if action in self.preference_model['notification_effectiveness']:
-            scores = self.preference_model['notification_effectiveness'][action]
-            # Weighted average favoring recent interactions
-            weights = np.exp(np.linspace(0, 1, len(scores)))
-            return np.average(scores, weights=weights)
+        score = self.preference_model['notification_effectiveness'].get(action)
+        if score is not None:
+            # Decayed average favoring recent interactions, maintained on feedback
+            return score.value
         return 0.5  # Default neutral score
 
 
+class RunningFeatureStats:
+    """Streaming per-feature mean and variance (Welford's algorithm)"""
+    
+    def __init__(self, n_features: int):
+        self.count = 0
+        self.mean = np.zeros(n_features)
+        self.m2 = np.zeros(n_features)
+    
+    def update(self, x: np.ndarray):
+        """Add one sample in O(features)"""
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+    
+    def reset(self, X: np.ndarray):
+        """Replace the statistics with those of a full sample matrix"""
+        self.count = len(X)
+        self.mean = np.mean(X, axis=0) if len(X) else np.zeros_like(self.mean)
+        self.m2 = np.var(X, axis=0) * len(X) if len(X) else np.zeros_like(self.m2)
+    
+    @property
+    def std(self) -> np.ndarray:
+        """Population standard deviation (matches np.std)"""
+        return np.sqrt(self.m2 / self.count) if self.count else np.zeros_like(self.m2)
+
+
 class PatternLearner:
     """Machine learning system for discovering coaching effectiveness patterns"""
     
+    FEATURE_NAMES = ['energy', 'stress', 'productivity', 'focus', 'time_since_break',
+                     'hour_of_day', 'context_switches', 'cognitive_load']
+    
     def __init__(self):
         self.classifier = SimpleClassifier()
         self.scaler = SimpleScaler()
@@ -804,14 +2276,20 @@ class PatternLearner:
         self.discovered_patterns = []
         self.is_trained = False
         
-    def learn_from_data(self, interaction_data: List[Dict]):
-        """Train ML model on historical interactions"""
-        if len(interaction_data) < 10:
-            return
+        # Sufficient statistics for online training (all samples / effective samples)
+        self.all_stats = RunningFeatureStats(len(self.FEATURE_NAMES))
+        self.effective_stats = RunningFeatureStats(len(self.FEATURE_NAMES))
         
+    def learn_from_data(self, interaction_data: List[Dict]):
+        """Train ML model on historical interactions and seed the online statistics from them"""
         # Extract features and labels
         X, y = self._prepare_training_data(interaction_data)
         
+        # Seed the online statistics so partial_fit continues from this data
+        X_array = np.array(X, dtype=np.float64).reshape(len(X), len(self.FEATURE_NAMES))
+        self.all_stats.reset(X_array)
+        self.effective_stats.reset(X_array[np.array(y, dtype=bool)])
+        
         if len(X) < 10:
             return
             
@@ -821,16 +2299,89 @@ class PatternLearner:
         self.is_trained = True
         
         # Extract feature importance
-        feature_names = ['energy', 'stress', 'productivity', 'focus', 'time_since_break', 
-                        'hour_of_day', 'context_switches', 'cognitive_load']
-        
-        for i, importance in enumerate(self.classifier.feature_importances_):
-            if i < len(feature_names):
-                self.feature_importance[feature_names[i]] = importance
+        self._update_feature_importance()
         
         # Discover patterns
         self._discover_patterns(X, y)
     
+    def partial_fit(self, interaction: Dict):
+        """
+        Online training on one new interaction in O(features).
+        
+        Every recorded interaction counts towards the all-samples statistics
+        (unrated ones as ineffective, like the batch labels); an effective
+        outcome also updates the effective-class statistics. The scaler,
+        classifier, feature importances and discovered patterns are then
+        re-derived from them.
+        """
+        features = self._interaction_features(interaction)
+        self.all_stats.update(features)
+        if self._is_effective(interaction):
+            self.effective_stats.update(features)
+        self._refit()
+    
+    def add_outcome(self, interaction: Dict):
+        """Account for feedback on an interaction that partial_fit has already seen unrated"""
+        if self._is_effective(interaction):
+            self.effective_stats.update(self._interaction_features(interaction))
+            self._refit()
+    
+    def _refit(self):
+        """Re-derive the model from the running statistics"""
+        if self.all_stats.count < 10:
+            return
+        
+        # Scaler: running mean/std over all samples
+        std = self.all_stats.std
+        std[std == 0] = 1  # Avoid division by zero
+        self.scaler.mean_ = self.all_stats.mean.copy()
+        self.scaler.std_ = std
+        
+        # Classifier: effective-class statistics expressed in scaled units
+        if self.effective_stats.count > 0:
+            self.classifier.set_statistics(
+                (self.effective_stats.mean - self.scaler.mean_) / std,
+                self.effective_stats.std / std,
+                np.zeros(len(self.FEATURE_NAMES))  # Streaming stand-in for the median: the scaled mean
+            )
+        self.is_trained = True
+        
+        self._update_feature_importance()
+        self._discover_patterns_from_statistics()
+    
+    def _interaction_features(self, interaction: Dict) -> np.ndarray:
+        return np.array(self._extract_features(interaction.get('context', {}), self._interaction_hour(interaction)))
+    
+    @staticmethod
+    def _interaction_hour(interaction: Dict) -> int:
+        """Hour the interaction happened (now, for records without a usable timestamp)"""
+        timestamp = interaction.get('timestamp')
+        return timestamp.hour if isinstance(timestamp, datetime) else datetime.now().hour
+    
+    @staticmethod
+    def _is_effective(interaction: Dict) -> bool:
+        """Label: was the intervention effective? (unrated counts as 0.5)"""
+        outcome = interaction.get('outcome') or {}
+        return outcome.get('effectiveness', 0.5) > 0.6
+    
+    def _update_feature_importance(self):
+        for i, importance in enumerate(self.classifier.feature_importances_):
+            if i < len(self.FEATURE_NAMES):
+                self.feature_importance[self.FEATURE_NAMES[i]] = importance
+    
+    def _extract_features(self, context: Dict, hour: int) -> List[float]:
+        """Convert a context into the ML feature vector"""
+        return [
+            context.get('energy_level', 0.5),
+            context.get('stress_level', 0.5),
+            context.get('productivity_score', 0.5),
+            context.get('focus_quality', 0.5),
+            context.get('time_since_break', 2.0),
+            hour,
+            context.get('app_switches_per_hour', 20),
+            context.get('cognitive_load', 0.5)
+        ]
+    
     def _prepare_training_data(self, interactions: List[Dict]) -> Tuple[List[List[float]], List[int]]:
         """Convert interactions to ML features"""
         X = []
@@ -838,22 +2389,10 @@ class PatternLearner:
         
         for interaction in interactions:
             context = interaction.get('context', {})
-            outcome = interaction.get('outcome', {})
-            
-            features = [
-                context.get('energy_level', 0.5),
-                context.get('stress_level', 0.5),
-                context.get('productivity_score', 0.5),
-                context.get('focus_quality', 0.5),
-                context.get('time_since_break', 2.0),
-                datetime.now().hour,
-                context.get('app_switches_per_hour', 20),
-                context.get('cognitive_load', 0.5)
-            ]
+            features = self._extract_features(context, self._interaction_hour(interaction))
             
             # Label: was the intervention effective?
-            effectiveness = outcome.get('effectiveness', 0.5)
-            label = 1 if effectiveness > 0.6 else 0
+            label = 1 if self._is_effective(interaction) else 0
             
             X.append(features)
             y.append(label)
@@ -869,77 +2408,313 @@ class PatternLearner:
         effective_indices = np.where(y_array == 1)[0]
         if len(effective_indices) > 5:
             effective_features = X_array[effective_indices]
-            mean_effective = np.mean(effective_features, axis=0)
-            
-            patterns = []
-            feature_names = ['energy', 'stress', 'productivity', 'focus', 'time_since_break', 
-                           'hour_of_day', 'context_switches', 'cognitive_load']
-            
-            for i, (feature_name, mean_val) in enumerate(zip(feature_names, mean_effective)):
-                if self.feature_importance.get(feature_name, 0) > 0.1:
-                    patterns.append({
-                        'feature': feature_name,
-                        'optimal_value': mean_val,
-                        'importance': self.feature_importance[feature_name]
-                    })
-            
-            self.discovered_patterns = sorted(patterns, key=lambda x: x['importance'], reverse=True)
+            self._set_patterns(np.mean(effective_features, axis=0))
+    
+    def _discover_patterns_from_statistics(self):
+        """Discover patterns from the running effective-class means"""
+        if self.effective_stats.count > 5:
+            self._set_patterns(self.effective_stats.mean)
+    
+    def _set_patterns(self, mean_effective: np.ndarray):
+        patterns = []
+        for feature_name, mean_val in zip(self.FEATURE_NAMES, mean_effective):
+            if self.feature_importance.get(feature_name, 0) > 0.1:
+                patterns.append({
+                    'feature': feature_name,
+                    'optimal_value': mean_val,
+                    'importance': self.feature_importance[feature_name]
+                })
+        
+        self.discovered_patterns = sorted(patterns, key=lambda x: x['importance'], reverse=True)
     
     def predict_effectiveness(self, context: Dict) -> float:
         """Predict effectiveness of intervention given context"""
         if not self.is_trained:
             return 0.5
         
-        features = [
-            context.get('energy_level', 0.5),
-            context.get('stress_level', 0.5),
-            context.get('productivity_score', 0.5),
-            context.get('focus_quality', 0.5),
-            context.get('time_since_break', 2.0),
-            datetime.now().hour,
-            context.get('app_switches_per_hour', 20),
-            context.get('cognitive_load', 0.5)
-        ]
+        features = self._extract_features(context, datetime.now().hour)
         
         X_scaled = self.scaler.transform([features])
         probability = self.classifier.predict_proba(X_scaled)[0][1]
         
         return probability
+    
+    def predict_effectiveness_batch(self, contexts) -> np.ndarray:
+        """
+        Predict effectiveness for many contexts at once.
+        
+        Accepts a list of context dicts or a dict of per-context columns
+        (as returned by ContextEngine.analyze_context_batch).
+        """
+        if isinstance(contexts, dict):
+            n_contexts = len(contexts['energy_level'])
+        else:
+            n_contexts = len(contexts)
+        if not self.is_trained or n_contexts == 0:
+            return np.full(n_contexts, 0.5)
+        
+        X_scaled = self.scaler.transform(self._feature_matrix(contexts, n_contexts, datetime.now().hour))
+        return self.classifier.predict_proba(X_scaled)[:, 1]
+    
+    def _feature_matrix(self, contexts, n_contexts: int, hour: int) -> np.ndarray:
+        """Stack the ML feature vectors of many contexts into one matrix"""
+        if not isinstance(contexts, dict):
+            return np.array([self._extract_features(context, hour) for context in contexts], dtype=np.float64)
+        
+        # Columnar input: missing columns take the same defaults as _extract_features
+        # (hour_of_day is never a context column, so it always comes from `hour`)
+        defaults = self._extract_features({}, hour)
+        keys = ['energy_level', 'stress_level', 'productivity_score', 'focus_quality',
+                'time_since_break', 'hour_of_day', 'app_switches_per_hour', 'cognitive_load']
+        return np.column_stack([
+            contexts[key] if key in contexts else np.full(n_contexts, default, dtype=np.float64)
+            for key, default in zip(keys, defaults)
+        ])
+
+
+class TimeSeriesStore:
+    """
+    Compact per-user ring buffers for predictive time series.
+
+    All users share one preallocated block: a (capacity, users, METRICS)
+    float32 array plus (capacity, users) int64 epoch-millisecond timestamps,
+    with no slack beyond `capacity` samples per user. Each user row is a
+    ring written at its head, so appends are O(1). The block is time-major
+    so that a batch of users sharing a head writes one contiguous slice.
+    Windows are zero-copy views unless they straddle the end of the ring,
+    in which case they are copied. The block grows by a quarter when it runs
+    out of user rows.
+
+    Least-squares trends over the last `trend_window` samples are kept as
+    running sums (Σy and Σxy, with x the position inside the window; Σx and
+    Σx² follow from the window length), so slopes are read in O(1). The sums
+    are recomputed exactly whenever a ring wraps around to bound drift.
+    """
+
+    METRICS = ('energy', 'stress', 'productivity', 'focus')
+
+    def __init__(self, capacity: int = 100, trend_window: int = 10, initial_users: int = 16):
+        if not 2 <= trend_window <= capacity:
+            raise ValueError("trend_window must be between 2 and capacity")
+        self.capacity = capacity
+        self.trend_window = trend_window
+        self.user_index = {}
+        self.values = np.zeros((capacity, initial_users, len(self.METRICS)), dtype=np.float32)
+        self.timestamps = np.zeros((capacity, initial_users), dtype=np.int64)
+        self.heads = np.zeros(initial_users, dtype=np.int32)
+        self.lengths = np.zeros(initial_users, dtype=np.int32)
+        self.sum_y = np.zeros((initial_users, len(self.METRICS)))
+        self.sum_xy = np.zeros((initial_users, len(self.METRICS)))
+        # Rows of the last batch looked up; a user's row never changes once assigned
+        self._batch_user_ids = []
+        self._batch_rows = np.zeros(0, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.user_index)
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self.user_index
+
+    def length(self, user_id: str) -> int:
+        """Number of samples currently held for a user"""
+        row = self.user_index.get(user_id)
+        return 0 if row is None else int(self.lengths[row])
+
+    def append(self, user_id: str, sample: List[float], timestamp_ms: Optional[int] = None):
+        """Append one sample (ordered as METRICS)"""
+        row = self._row(user_id)
+        head = int(self.heads[row])
+        length = int(self.lengths[row])
+
+        # Read the sample leaving the trend window before the ring overwrites it
+        window = self.trend_window
+        if length >= window:
+            evicted = self.values[head - window, row].astype(np.float64)
+
+        self.values[head, row] = sample
+        self.timestamps[head, row] = int(time.time() * 1000) if timestamp_ms is None else timestamp_ms
+
+        # Slide the trend sums: every x shifts down by one when the oldest sample leaves
+        y = self.values[head, row].astype(np.float64)
+        if length >= window:
+            self.sum_xy[row] += evicted - self.sum_y[row] + (window - 1) * y
+            self.sum_y[row] += y - evicted
+        else:
+            self.sum_xy[row] += length * y
+            self.sum_y[row] += y
+
+        self.lengths[row] = min(length + 1, self.capacity)
+        if head + 1 == self.capacity:
+            self.heads[row] = 0
+            self._refresh_sums([row])
+        else:
+            self.heads[row] = head + 1
+
+    def append_batch(self, user_ids: List[str], samples: np.ndarray, timestamp_ms: Optional[int] = None) -> np.ndarray:
+        """Append one sample per user (user_ids must be unique); returns their rows"""
+        rows = self.rows_for(user_ids, create=True)
+        # Batches usually cover consecutive rows (users in creation order); slices avoid gathers
+        first = int(rows[0]) if len(rows) else 0
+        at = slice(first, first + len(rows)) if np.array_equal(rows, np.arange(first, first + len(rows))) else rows
+        heads = self.heads[at].astype(np.int64)
+        lengths = self.lengths[at].astype(np.int64)
+        window = self.trend_window
+        stored = np.asarray(samples, dtype=np.float32)
+        stamp = int(time.time() * 1000) if timestamp_ms is None else timestamp_ms
+
+        if isinstance(at, slice) and len(rows) and heads.min() == heads.max():
+            # Users that have always been appended together share one head: one contiguous slice
+            head = int(heads[0])
+            evicted = self.values[(head - window) % self.capacity, at].astype(np.float64)
+            self.values[head, at] = stored
+            self.timestamps[head, at] = stamp
+        else:
+            # Ring cells are addressed by flat index; np.take/np.put beat 2-D fancy indexing
+            metrics = len(self.METRICS)
+            offsets = np.arange(metrics)
+            users = len(self.heads)
+            cells = heads * users + rows
+            evicted_cells = (heads - window) % self.capacity * users + rows
+            evicted = np.take(self.values, (evicted_cells * metrics)[:, None] + offsets).astype(np.float64)
+            np.put(self.values, (cells * metrics)[:, None] + offsets, stored)
+            np.put(self.timestamps, cells, stamp)
+
+        # Same sliding update as append(), with "full" masking the eviction terms
+        full = lengths >= window
+        y = stored.astype(np.float64)
+        if full.all():
+            self.sum_xy[at] += evicted - self.sum_y[at] + (window - 1) * y
+        else:
+            evicted[~full] = 0.0
+            positions = np.where(full, window - 1, lengths)[:, None]
+            self.sum_xy[at] += np.where(full[:, None], evicted - self.sum_y[at], 0.0) + positions * y
+        self.sum_y[at] += y - evicted
+
+        self.lengths[at] = np.minimum(lengths + 1, self.capacity)
+        heads += 1
+        wrapped = heads == self.capacity
+        heads[wrapped] = 0
+        self.heads[at] = heads
+        if wrapped.any():
+            self._refresh_sums(rows[wrapped])
+        return rows
+
+    def window(self, user_id: str, size: int) -> np.ndarray:
+        """(size, len(METRICS)) array of a user's most recent samples, oldest first"""
+        row = self.user_index[user_id]
+        size = min(size, int(self.lengths[row]))
+        head = int(self.heads[row])
+        if size <= head:
+            return self.values[head - size:head, row]
+        # The window straddles the end of the ring
+        return np.concatenate([self.values[head - size:, row], self.values[:head, row]])
+
+    def rows_for(self, user_ids: List[str], create: bool = False) -> np.ndarray:
+        """Row of each user (-1 for unknown users unless `create` adds them)"""
+        if user_ids == self._batch_user_ids:
+            return self._batch_rows.copy()  # The same users as last time (the usual case every tick)
+        rows = np.fromiter(map(self.user_index.get, user_ids, repeat(-1)), dtype=np.int64, count=len(user_ids))
+        if create:
+            for i in np.flatnonzero(rows < 0).tolist():
+                rows[i] = self._row(user_ids[i])
+        if len(rows) and rows.min() >= 0:
+            self._batch_user_ids, self._batch_rows = list(user_ids), rows.copy()
+        return rows
+
+    def lengths_for(self, user_ids: List[str]) -> np.ndarray:
+        """Sample counts for many users (0 for unknown users)"""
+        return self.lengths_at(self.rows_for(user_ids))
+
+    def lengths_at(self, rows: np.ndarray) -> np.ndarray:
+        """Sample counts for rows from rows_for (0 for -1)"""
+        return np.where(rows >= 0, np.take(self.lengths, rows), 0)
+
+    def trend(self, user_id: str) -> List[float]:
+        """O(1) least-squares slope of each metric over the trend window"""
+        row = self.user_index.get(user_id)
+        n = 0 if row is None else min(int(self.lengths[row]), self.trend_window)
+        if n < 2:
+            return [0.0] * len(self.METRICS)
+
+        sum_x = n * (n - 1) / 2
+        denominator = n * (n - 1) * n * (2 * n - 1) / 6 - sum_x * sum_x
+        return [(n * sum_xy - sum_x * sum_y) / denominator
+                for sum_y, sum_xy in zip(self.sum_y[row].tolist(), self.sum_xy[row].tolist())]
+
+    def trends_for(self, user_ids: List[str]) -> np.ndarray:
+        """(users, len(METRICS)) slopes for many known users"""
+        rows = np.fromiter(map(self.user_index.__getitem__, user_ids), dtype=np.int64, count=len(user_ids))
+        return self.trends_at(rows)
+
+    def trends_at(self, rows: np.ndarray) -> np.ndarray:
+        """(len(rows), len(METRICS)) slopes for existing rows"""
+        return self._slopes(np.take(self.lengths, rows), np.take(self.sum_y, rows, axis=0),
+                            np.take(self.sum_xy, rows, axis=0))
+
+    def _slopes(self, lengths: np.ndarray, sum_y: np.ndarray, sum_xy: np.ndarray) -> np.ndarray:
+        n = np.minimum(lengths, self.trend_window)
+        if len(n) and n.min() == n.max() >= 2:
+            # Every window has the same length (e.g. all full), so Σx and Σx² are shared scalars
+            n = float(n[0])
+            sum_x = n * (n - 1) / 2
+            return (n * sum_xy - sum_x * sum_y) / (n * ((n - 1) * n * (2 * n - 1) / 6) - sum_x * sum_x)
+        n = n.astype(np.float64)[:, None]
+        sum_x = n * (n - 1) / 2
+        sum_xx = (n - 1) * n * (2 * n - 1) / 6
+        denominator = n * sum_xx - sum_x * sum_x
+        with np.errstate(divide='ignore', invalid='ignore'):
+            slopes = (n * sum_xy - sum_x * sum_y) / denominator
+        return np.where(n >= 2, slopes, 0.0)
+
+    def _row(self, user_id: str) -> int:
+        row = self.user_index.get(user_id)
+        if row is None:
+            row = len(self.user_index)
+            if row == len(self.heads):
+                self._grow()
+            self.user_index[user_id] = row
+        return row
+
+    def _refresh_sums(self, rows):
+        """Recompute the trend sums of rows whose head just wrapped to 0"""
+        window = self.values[self.capacity - self.trend_window:, rows].astype(np.float64)
+        self.sum_y[rows] = window.sum(axis=0)
+        # Elementwise products keep one summation order for any number of rows
+        self.sum_xy[rows] = (np.arange(self.trend_window)[:, None, None] * window).sum(axis=0)
+
+    def _grow(self):
+        """Add a quarter more user rows (amortized O(1) per new user, at most 25% of rows spare)"""
+        extra = max(1, len(self.heads) // 4)
+        for name, axis in (('values', 1), ('timestamps', 1), ('heads', 0), ('lengths', 0), ('sum_y', 0), ('sum_xy', 0)):
+            array = getattr(self, name)
+            shape = list(array.shape)
+            shape[axis] = extra
+            setattr(self, name, np.concatenate([array, np.zeros(shape, dtype=array.dtype)], axis=axis))
 
 
 class PredictiveEngine:
     """Predictive analytics for burnout prevention and optimal timing"""
     
     def __init__(self):
-        self.time_series_data = defaultdict(list)
+        self.time_series_data = TimeSeriesStore(capacity=100, trend_window=10)
         self.predictions = {}
         
     def update_time_series(self, user_id: str, context: Dict):
-        """Update time series data for predictions"""
-        data_point = {
-            'timestamp': datetime.now(),
-            'energy': context.get('energy_level', 0.5),
-            'stress': context.get('stress_level', 0.5),
-            'productivity': context.get('productivity_score', 0.5),
-            'focus': context.get('focus_quality', 0.5)
-        }
-        self.time_series_data[user_id].append(data_point)
-        
-        # Keep only last 100 data points
-        if len(self.time_series_data[user_id]) > 100:
-            self.time_series_data[user_id].pop(0)
+        """Update time series data for predictions (keeps the last 100 points)"""
+        self.time_series_data.append(user_id, [
+            context.get('energy_level', 0.5),
+            context.get('stress_level', 0.5),
+            context.get('productivity_score', 0.5),
+            context.get('focus_quality', 0.5)
+        ])
     
     def predict_burnout_risk(self, user_id: str) -> float:
         """Predict risk of burnout based on trends"""
-        if user_id not in self.time_series_data or len(self.time_series_data[user_id]) < 10:
+        if self.time_series_data.length(user_id) < 10:
             return 0.0
         
-        recent_data = self.time_series_data[user_id][-10:]
-        
-        # Calculate trends
-        energy_trend = self._calculate_trend([d['energy'] for d in recent_data])
-        stress_trend = self._calculate_trend([d['stress'] for d in recent_data])
-        productivity_trend = self._calculate_trend([d['productivity'] for d in recent_data])
+        # Calculate trends over the last 10 points (O(1) running regression)
+        energy_trend, stress_trend, productivity_trend, _ = self.time_series_data.trend(user_id)
         
         # Burnout indicators: declining energy, increasing stress, declining productivity
         burnout_risk = 0.0
@@ -951,14 +2726,44 @@ class PredictiveEngine:
             burnout_risk += 0.3
         
         return min(1.0, burnout_risk)
-    
+
+    def update_time_series_batch(self, user_ids: List[str], columns: Dict[str, Any]) -> np.ndarray:
+        """Append one data point per user from analyze_context_batch columns; returns their store rows"""
+        samples = np.column_stack([columns['energy_level'], columns['stress_level'],
+                                   columns['productivity_score'], columns['focus_quality']])
+        return self.time_series_data.append_batch(user_ids, samples)
+
+    def predict_burnout_risk_batch(self, user_ids: List[str], rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Vectorized predict_burnout_risk: one least-squares slope per user and metric
+        
+        `rows` may pass the store rows returned by update_time_series_batch
+        to skip looking the users up again.
+        """
+        risk = np.zeros(len(user_ids))
+        if rows is None:
+            rows = self.time_series_data.rows_for(user_ids)
+        ready = self.time_series_data.lengths_at(rows) >= 10
+        if ready.all():
+            ready = slice(None)  # Steady state: every user has a full window
+        elif not ready.any():
+            return risk
+
+        trends = self.time_series_data.trends_at(rows[ready])
+        energy_trend, stress_trend, productivity_trend = trends[:, 0], trends[:, 1], trends[:, 2]
+
+        burnout_risk = (np.where(energy_trend < -0.05, 0.3, 0.0)
+                        + np.where(stress_trend > 0.05, 0.4, 0.0)
+                        + np.where(productivity_trend < -0.05, 0.3, 0.0))
+        risk[ready] = np.minimum(1.0, burnout_risk)
+        return risk
+
     def predict_optimal_break_time(self, user_id: str) -> Optional[int]:
         """Predict when user will need a break"""
-        if user_id not in self.time_series_data or len(self.time_series_data[user_id]) < 5:
+        if self.time_series_data.length(user_id) < 5:
             return None
         
-        recent_data = self.time_series_data[user_id][-5:]
-        energy_values = [d['energy'] for d in recent_data]
+        energy_values = self.time_series_data.window(user_id, 5)[:, 0].tolist()
         
         if len(energy_values) > 1:
             decline_rate = (energy_values[-1] - energy_values[0]) / len(energy_values)
@@ -984,6 +2789,167 @@ class PredictiveEngine:
         return slope
 
 
+class InteractionHistory:
+    """
+    Tiered coaching interaction history with bounded memory
+    
+    - hot: the most recent interactions, kept in memory for ML training
+    - aggregates: compacted per-user, per-action statistics for evicted interactions
+    - cold: optional JSONL segment on disk that receives every evicted interaction
+    """
+    
+    def __init__(self, hot_capacity: int = 1000, cold_path: Optional[str] = None,
+                 cold_flush_size: int = 100):
+        self.hot_capacity = hot_capacity
+        self.cold_path = cold_path
+        self.cold_flush_size = cold_flush_size
+        self.hot = deque()
+        self.aggregates = defaultdict(dict)
+        self.total_count = 0
+        self.compacted_count = 0
+        self.cold_count = 0
+        self._cold_buffer = []
+    
+    def __iter__(self):
+        return iter(self.hot)
+    
+    def append(self, interaction: Dict):
+        """Add an interaction, compacting the oldest one once the hot window is full"""
+        self.hot.append(interaction)
+        self.total_count += 1
+        self._enforce_capacity()
+    
+    def extend(self, interactions: List[Dict]):
+        for interaction in interactions:
+            self.append(interaction)
+    
+    def configure(self, hot_capacity: int, cold_path: Optional[str]):
+        """Change the tier settings, compacting immediately if the hot window shrinks"""
+        self.flush()
+        self.hot_capacity = hot_capacity
+        self.cold_path = cold_path
+        self._enforce_capacity()
+    
+    def record_outcome(self, interaction: Dict, outcome: Dict):
+        """Attach feedback, folding it into the aggregates if the interaction was already compacted"""
+        interaction['outcome'] = outcome
+        if interaction.get('compacted'):
+            self._add_outcome(self._stats(interaction), outcome)
+    
+    def summary(self) -> Dict[str, int]:
+        return {
+            'total': self.total_count,
+            'hot': len(self.hot),
+            'compacted': self.compacted_count,
+            'cold': self.cold_count + len(self._cold_buffer)
+        }
+    
+    def flush(self):
+        """Write buffered evicted interactions to the cold segment"""
+        if not self._cold_buffer or not self.cold_path:
+            self._cold_buffer = []
+            return
+        try:
+            with open(self.cold_path, 'a') as f:
+                for interaction in self._cold_buffer:
+                    record = {k: v for k, v in interaction.items() if k != 'compacted'}
+                    f.write(json.dumps(record, default=str) + '\n')
+            self.cold_count += len(self._cold_buffer)
+        except Exception as e:
+            logger.error(f"Error writing cold interaction history: {e}")
+        self._cold_buffer = []
+    
+    def _enforce_capacity(self):
+        while len(self.hot) > self.hot_capacity:
+            self._compact(self.hot.popleft())
+    
+    def _compact(self, interaction: Dict):
+        interaction['compacted'] = True
+        stats = self._stats(interaction)
+        stats['count'] += 1
+        self._add_outcome(stats, interaction.get('outcome'))
+        self.compacted_count += 1
+        
+        if self.cold_path:
+            self._cold_buffer.append(interaction)
+            if len(self._cold_buffer) >= self.cold_flush_size:
+                self.flush()
+    
+    def _stats(self, interaction: Dict) -> Dict[str, float]:
+        actions = self.aggregates[interaction['user_id']]
+        if interaction['action'] not in actions:
+            actions[interaction['action']] = {'count': 0, 'rated': 0, 'effectiveness_sum': 0.0}
+        return actions[interaction['action']]
+    
+    @staticmethod
+    def _add_outcome(stats: Dict[str, float], outcome: Optional[Dict]):
+        if outcome and 'effectiveness' in outcome:
+            stats['rated'] += 1
+            stats['effectiveness_sum'] += outcome['effectiveness']
+    
+    def __getstate__(self):
+        # Pending cold writes belong to the running process, not the snapshot
+        self.flush()
+        return self.__dict__.copy()
+
+
+class FeedbackIndex:
+    """
+    Maps notification ids to their interactions until feedback arrives or the TTL expires.
+    
+    At most `max_pending` notifications are tracked; registering beyond that
+    drops the oldest ones, which can then no longer receive feedback.
+    """
+    
+    def __init__(self, ttl_seconds: float = 24 * 3600, max_pending: int = 100000):
+        self.ttl_seconds = ttl_seconds
+        self.max_pending = max_pending
+        # Insertion order equals expiry order because the TTL is fixed
+        self.pending = OrderedDict()
+        self.evictions = 0
+    
+    def __len__(self) -> int:
+        return len(self.pending)
+    
+    def register(self, notification_id: str, interaction: Dict):
+        """Track an interaction awaiting feedback, evicting the oldest one when full"""
+        now = time.time()
+        self._evict_expired(now)
+        self.pending[notification_id] = (now + self.ttl_seconds, interaction)
+        while len(self.pending) > self.max_pending:
+            self.pending.popitem(last=False)
+            self.evictions += 1
+    
+    def register_batch(self, notification_ids: List[str], interactions: List[Dict]):
+        """register() for many notifications at once, in order"""
+        now = time.time()
+        self._evict_expired(now)
+        self.pending.update(zip(notification_ids, zip(repeat(now + self.ttl_seconds), interactions)))
+        while len(self.pending) > self.max_pending:
+            self.pending.popitem(last=False)
+            self.evictions += 1
+    
+    def get(self, notification_id: str) -> Optional[Dict]:
+        """Return the interaction for a notification, if it is still pending"""
+        self._evict_expired(time.time())
+        entry = self.pending.get(notification_id)
+        return entry[1] if entry else None
+    
+    def pop(self, notification_id: str) -> Optional[Dict]:
+        """Remove and return the interaction for a notification, if it is still pending"""
+        now = time.time()
+        self._evict_expired(now)
+        entry = self.pending.pop(notification_id, None)
+        return entry[1] if entry else None
+    
+    def _evict_expired(self, now: float):
+        while self.pending:
+            expires_at, _ = next(iter(self.pending.values()))
+            if expires_at > now:
+                break
+            self.pending.popitem(last=False)
+
+
 class AICoach:
     """
     Ultimate AI Coach with genuine intelligence and learning capabilities
@@ -997,7 +2963,18 @@ class AICoach:
     - Real Claude AI integration with fallback
     """
     
-    def __init__(self, model_path: Optional[str] = None):
+    BURNOUT_MESSAGE = "I'm detecting signs of potential burnout. Let's take a proper break."
+    
+    def __init__(self, model_path: Optional[str] = None, feedback_ttl_seconds: float = 24 * 3600,
+                 feedback_max_pending: int = 100000,
+                 history_hot_capacity: int = 1000, history_cold_path: Optional[str] = None,
+                 llm_cache_size: int = 1024, llm_cache_ttl_seconds: float = 300.0,
+                 llm_cache_scope: str = 'user', llm_cache_entries_per_user: int = 4,
+                 latency_budget: Optional[float] = None,
+                 fusion_disagreement_threshold: float = 0.5, stream_llm_responses: bool = False,
+                 llm_providers: Optional[Dict[str, Any]] = None, hedge_llm_requests: bool = False,
+                 llm_batch_size: int = 0, llm_batch_wait_ms: float = 20.0,
+                 llm_metrics_sink: Optional[Callable[[Dict], None]] = None):
         # Core components
         self.context_engine = ContextEngine()
         self.coaching_strategy = CoachingStrategy()
@@ -1005,11 +2982,36 @@ class AICoach:
         
         # AI components
         self.user_models = {}
+        self.state_transitions = StateTransitionStore()
         self.pattern_learner = PatternLearner()
         self.predictive_engine = PredictiveEngine()
-        self.global_interaction_history = []
+        self.global_interaction_history = InteractionHistory(history_hot_capacity, history_cold_path)
+        
+        # Interactions awaiting feedback, keyed by notification id
+        self.feedback_index = FeedbackIndex(feedback_ttl_seconds, feedback_max_pending)
         
-        # Initialize AI providers
+        # User ids of the last batch, already checked to be unique and given user models
+        self._batch_user_ids = []
+        
+        # Default seconds allowed for LLM analysis per call (None waits for the providers)
+        self.latency_budget = latency_budget
+        self.fusion_disagreement_threshold = fusion_disagreement_threshold
+        self.stream_llm_responses = stream_llm_responses
+        
+        # Extra providers routed alongside Claude (e.g. {'local': LocalCoachProvider()})
+        self.extra_llm_providers = dict(llm_providers or {})
+        self.hedge_llm_requests = hedge_llm_requests
+        
+        # Cross-user micro-batching of Claude analyses (a batch size below 2 disables it)
+        self.llm_batch_size = llm_batch_size
+        self.llm_batch_wait_ms = llm_batch_wait_ms
+        
+        # Receives one record per LLM call (latency, retries, status codes, tokens)
+        self.llm_metrics_sink = llm_metrics_sink
+        
+        # Initialize AI providers (a cache size of 0 disables response caching)
+        self.llm_cache = ResponseCache(llm_cache_size, llm_cache_ttl_seconds, llm_cache_scope,
+                                       entries_per_user=llm_cache_entries_per_user) if llm_cache_size > 0 else None
         self.ai_client = self._initialize_ai_providers()
         
         # Model persistence
@@ -1027,14 +3029,20 @@ class AICoach:
             # Try to initialize Claude
             anthropic_key = os.getenv('ANTHROPIC_API_KEY')
             if anthropic_key:
-                claude_client = ClaudeClient(anthropic_key)
+                claude_client = ClaudeClient(anthropic_key, stream=self.stream_llm_responses,
+                                             metrics_sink=self.llm_metrics_sink)
+                if self.llm_batch_size > 1:
+                    claude_client = ClaudeMicroBatcher(claude_client, self.llm_batch_size, self.llm_batch_wait_ms)
                 providers["claude"] = claude_client
                 logger.info("✅ Claude AI client initialized")
             else:
                 logger.warning("⚠️ ANTHROPIC_API_KEY not found - AI features will use rule-based fallback")
             
+            providers.update(self.extra_llm_providers)
             if providers:
-                return MultiProviderLLMClient(providers)
+                return MultiProviderLLMClient(providers, cache=self.llm_cache,
+                                              fusion_disagreement_threshold=self.fusion_disagreement_threshold,
+                                              hedge_requests=self.hedge_llm_requests)
             else:
                 return None
                 
@@ -1045,21 +3053,29 @@ class AICoach:
     def _get_user_model(self, user_id: str) -> UserModel:
         """Get or create user model"""
         if user_id not in self.user_models:
-            self.user_models[user_id] = UserModel(user_id)
+            self.user_models[user_id] = UserModel(user_id, transitions=self.state_transitions)
+            if self.llm_cache is not None:
+                self.llm_cache.reserve_users(len(self.user_models))
         return self.user_models[user_id]
     
     async def analyze_telemetry(self, telemetry: Dict[str, Any], 
-                               user_id: str = 'default') -> Optional[Dict]:
+                               user_id: str = 'default',
+                               latency_budget: Optional[float] = None) -> Optional[Dict]:
         """
         Main AI coaching interface
         
         Args:
             telemetry: Dictionary containing user activity telemetry
             user_id: User identifier for personalization
+            latency_budget: Seconds allowed for LLM analysis and fusion, which
+                run concurrently with the local analysis; steps still running
+                when it is exhausted are cancelled (defaults to the coach's
+                latency_budget)
             
         Returns:
             Coaching notification dict with AI insights or None
         """
+        deadline = self._deadline(latency_budget)
         try:
             # Get user model for personalization
             user_model = self._get_user_model(user_id)
@@ -1073,98 +3089,296 @@ class AICoach:
             # Check for predictive interventions (burnout prevention)
             burnout_risk = self.predictive_engine.predict_burnout_risk(user_id)
             if burnout_risk > 0.7:
-                return self._create_predictive_notification(
-                    "I'm detecting signs of potential burnout. Let's take a proper break.",
-                    'burnout_prevention',
-                    context,
-                    priority=3
-                )
-            
-            # Use ML to predict intervention effectiveness
-            if self.pattern_learner.is_trained:
-                effectiveness = self.pattern_learner.predict_effectiveness(context)
-                if effectiveness < 0.3:
-                    # Low predicted effectiveness - try different approach
-                    context['force_alternative'] = True
+                return self._create_burnout_notification(context, user_id)
             
-            # Run dual analysis: AI + Local ML in parallel
-            ai_recommendation = None
+            # Start AI analysis first so its I/O overlaps the local analysis below
+            ai_task = None
             if self.ai_client:
-                try:
-                    # This now does: Claude analysis + Local ML + AI fusion
-                    ai_recommendation = await self.ai_client.analyze_telemetry(telemetry, f"User: {user_id}")
-                    if ai_recommendation and ai_recommendation.get('nudge_text'):
-                        # Convert AI recommendation to coaching format
-                        base_strategy = {
-                            'message': ai_recommendation['nudge_text'],
-                            'action': ai_recommendation.get('nudge_type', 'ai_coaching'),
-                            'priority': ai_recommendation.get('priority', 2),
-                            'duration': 10,  # Default duration
-                            'confidence': ai_recommendation.get('confidence', 0.8),
-                            'source': ai_recommendation.get('source', 'ai_analysis')
-                        }
-                        
-                        # Log the analysis type
-                        if ai_recommendation.get('source') == 'ai_fusion':
-                            logger.info(f"🔀 Using AI fusion: Claude + Local ML combined")
-                        else:
-                            logger.info(f"🤖 Using AI analysis: {ai_recommendation['nudge_type']}")
-                    else:
-                        ai_recommendation = None
-                except Exception as e:
-                    logger.warning(f"AI analysis failed, falling back to rule-based: {e}")
-                    ai_recommendation = None
+                ai_task = asyncio.ensure_future(self._get_ai_strategy(telemetry, user_id, context, deadline))
+            
+            try:
+                if ai_task:
+                    await asyncio.sleep(0)
+                
+                # Use ML to predict intervention effectiveness
+                if self.pattern_learner.is_trained:
+                    effectiveness = self.pattern_learner.predict_effectiveness(context)
+                    if effectiveness < 0.3:
+                        # Low predicted effectiveness - try different approach
+                        context['force_alternative'] = True
+                
+                rule_strategy = self.coaching_strategy.select_strategy(context)
+                
+                # Run dual analysis: AI + Local ML in parallel
+                base_strategy = await ai_task if ai_task else None
+            finally:
+                # Never leave the LLM call running if the local analysis failed
+                if ai_task and not ai_task.done():
+                    ai_task.cancel()
+            ai_recommendation = base_strategy is not None
             
             # Fallback to pure rule-based strategy if AI completely unavailable
             if not ai_recommendation:
-                base_strategy = self.coaching_strategy.select_strategy(context)
+                base_strategy = rule_strategy
                 logger.info("📊 Using rule-based strategy only")
             
-            if base_strategy:
-                # Apply personalization
-                action = base_strategy['action']
-                personalization_score = user_model.get_personalized_recommendation(action)
-                
-                # Adjust strategy based on personal effectiveness
-                if personalization_score < 0.3 and not ai_recommendation:
-                    # This strategy hasn't worked well for this user (but keep AI recommendations)
-                    base_strategy = self._get_alternative_strategy(context, exclude=action)
-                
-                if base_strategy and self.notification_manager.should_notify(user_id, base_strategy['priority']):
-                    # Predict optimal timing
-                    optimal_break = self.predictive_engine.predict_optimal_break_time(user_id)
-                    if optimal_break and 'duration' in base_strategy:
-                        base_strategy['duration'] = optimal_break
-                    
-                    # Create AI-enhanced notification
-                    notification = self._create_enhanced_notification(base_strategy, context, user_model)
-                    
-                    # Record interaction for learning
-                    user_model.update_from_interaction(context, base_strategy['action'])
-                    self.global_interaction_history.append({
-                        'user_id': user_id,
-                        'timestamp': datetime.now(),
-                        'context': context,
-                        'action': base_strategy['action']
-                    })
-                    
-                    # Retrain ML model periodically
-                    if len(self.global_interaction_history) % 50 == 0:
-                        self.pattern_learner.learn_from_data(self.global_interaction_history)
-                    
-                    self.notification_manager.record_notification(user_id)
-                    return notification
+            return self._deliver_strategy(base_strategy, ai_recommendation, context, user_model, user_id)
+            
+        except Exception as e:
+            logger.error(f"Error in AI analysis: {str(e)}")
+            return None
+
+    async def analyze_telemetry_batch(self, telemetry_list: List[Dict[str, Any]],
+                                      user_ids: List[str],
+                                      latency_budget: Optional[float] = None) -> List[Optional[Dict]]:
+        """
+        Batch AI coaching interface for many users in one tick
+        
+        Context estimation, burnout prediction and rule-based strategy
+        selection run as NumPy column operations over the whole batch;
+        only users that end up with a candidate strategy go through the
+        per-user personalization and notification steps. The results match
+        calling analyze_telemetry for each user in order.
+        
+        Args:
+            telemetry_list: One telemetry dict per user
+            user_ids: User identifiers, unique within the batch
+            latency_budget: Seconds allowed for the (concurrent) LLM analyses
+                of the whole batch (defaults to the coach's latency_budget)
             
+        Returns:
+            One coaching notification dict (or None) per user, in input order
+        """
+        deadline = self._deadline(latency_budget)
+        if len(telemetry_list) != len(user_ids):
+            raise ValueError("telemetry_list and user_ids must have the same length")
+        known_users = user_ids == self._batch_user_ids  # The same users as last tick
+        if not known_users and len(set(user_ids)) != len(user_ids):
+            raise ValueError("user_ids must be unique within a batch")
+        
+        try:
+            columns = self.context_engine.analyze_context_batch(telemetry_list)
+        except (TypeError, ValueError) as e:
+            # Telemetry that cannot be expressed as float columns takes the scalar path
+            logger.warning(f"Batch context analysis failed, analyzing users one by one: {e}")
+            return [await self.analyze_telemetry(telemetry, user_id, latency_budget)
+                    for telemetry, user_id in zip(telemetry_list, user_ids)]
+        
+        if not known_users:
+            for user_id in list(filterfalse(self.user_models.__contains__, user_ids)):
+                self._get_user_model(user_id)
+            self._batch_user_ids = list(user_ids)
+        
+        rows = self.predictive_engine.update_time_series_batch(user_ids, columns)
+        burnout = self.predictive_engine.predict_burnout_risk_batch(user_ids, rows) > 0.7
+        
+        force_alternative = np.zeros(len(user_ids), dtype=bool)
+        if self.pattern_learner.is_trained:
+            effectiveness = self.pattern_learner.predict_effectiveness_batch(columns)
+            force_alternative = ~burnout & (effectiveness < 0.3)
+        
+        # Context dicts are only built for the users that go past the column stage
+        contexts: Dict[int, Dict[str, Any]] = {}
+        
+        def build_contexts(indices: List[int]):
+            indices = [i for i in indices if i not in contexts]
+            for i, context in zip(indices, ContextEngine.contexts_from_columns(columns, indices)):
+                if force_alternative[i]:
+                    context['force_alternative'] = True
+                contexts[i] = context
+        
+        # AI analysis is I/O bound, so issue it concurrently for every user that needs it
+        ai_strategies = [None] * len(user_ids)
+        if self.ai_client:
+            pending = np.flatnonzero(~burnout).tolist()
+            build_contexts(pending)
+            results = await asyncio.gather(*(
+                self._get_ai_strategy(telemetry_list[i], user_ids[i], contexts[i], deadline) for i in pending
+            ))
+            for i, strategy in zip(pending, results):
+                ai_strategies[i] = strategy
+        
+        # Nothing runs before should_notify that has side effects, so while every
+        # notification would be refused the remaining users can be skipped
+        notifications = [None] * len(user_ids)
+        in_cooldown = self.notification_manager.in_global_cooldown
+        rule_strategies = [] if in_cooldown() else self.coaching_strategy.select_strategy_batch(columns)
+        for i in (np.flatnonzero(~burnout).tolist() if rule_strategies else []):
+            ai_recommendation = ai_strategies[i] is not None
+            base_strategy = ai_strategies[i] if ai_recommendation else rule_strategies[i]
+            if not base_strategy:
+                continue
+            if in_cooldown():
+                break
+            user_id = user_ids[i]
+            try:
+                build_contexts([i])
+                notifications[i] = self._deliver_strategy(
+                    base_strategy, ai_recommendation, contexts[i], self.user_models[user_id], user_id
+                )
+            except Exception as e:
+                logger.error(f"Error in AI analysis for {user_id}: {str(e)}")
+        
+        burnout_rows = np.flatnonzero(burnout).tolist()
+        if burnout_rows:
+            try:
+                build_contexts(burnout_rows)
+                burnout_notifications = self._create_burnout_notifications(
+                    [contexts[i] for i in burnout_rows], [user_ids[i] for i in burnout_rows]
+                )
+                for i, notification in zip(burnout_rows, burnout_notifications):
+                    notifications[i] = notification
+            except Exception as e:
+                logger.error(f"Error creating burnout notifications: {str(e)}")
+        
+        return notifications
+
+    def _deadline(self, latency_budget: Optional[float]) -> Optional[float]:
+        """time.monotonic() deadline for a call's LLM work, or None when unbounded"""
+        budget = self.latency_budget if latency_budget is None else latency_budget
+        return None if budget is None else time.monotonic() + budget
+
+    async def _get_ai_strategy(self, telemetry: Dict[str, Any], user_id: str,
+                               context: Optional[Dict] = None,
+                               deadline: Optional[float] = None) -> Optional[Dict]:
+        """Ask the AI providers for a recommendation, converted to coaching strategy format"""
+        if not self.ai_client:
             return None
+        
+        try:
+            # This now does: Claude analysis + Local ML + AI fusion (or a cached answer)
+            ai_recommendation = await self.ai_client.analyze_telemetry(
+                telemetry, f"User: {user_id}", user_id=user_id, signature_context=context, deadline=deadline
+            )
+            if not ai_recommendation or not ai_recommendation.get('nudge_text'):
+                return None
+            
+            # Log the analysis type
+            source = ai_recommendation.get('source', 'ai_analysis')
+            if source == 'ai_fusion':
+                logger.info(f"🔀 Using AI fusion: Claude + Local ML combined")
+            elif source == 'local_fusion':
+                logger.info(f"🔀 Using local fusion: Claude and Local ML agree")
+            else:
+                logger.info(f"🤖 Using AI analysis: {ai_recommendation['nudge_type']}")
             
+            # Convert AI recommendation to coaching format
+            strategy = {
+                'message': ai_recommendation['nudge_text'],
+                'action': ai_recommendation.get('nudge_type', 'ai_coaching'),
+                'priority': ai_recommendation.get('priority', 2),
+                'duration': 10,  # Default duration
+                'confidence': ai_recommendation.get('confidence', 0.8),
+                'source': source,
+                'analysis_path': ai_recommendation.get('analysis_path', 'llm'),
+                'provider': ai_recommendation.get('provider')
+            }
+            if source in ('ai_fusion', 'local_fusion'):
+                for key in ('claude_insight', 'local_insight', 'reasoning'):
+                    strategy[key] = ai_recommendation.get(key, '')
+            return strategy
         except Exception as e:
-            logger.error(f"Error in AI analysis: {str(e)}")
+            logger.warning(f"AI analysis failed, falling back to rule-based: {e}")
+            return None
+
+    def _deliver_strategy(self, base_strategy: Optional[Dict], ai_recommendation: bool,
+                          context: Dict, user_model: 'UserModel', user_id: str) -> Optional[Dict]:
+        """Personalize a candidate strategy and turn it into a notification if timing allows"""
+        if not base_strategy:
             return None
+        
+        # Apply personalization
+        action = base_strategy['action']
+        personalization_score = user_model.get_personalized_recommendation(action)
+        
+        # Adjust strategy based on personal effectiveness
+        if personalization_score < 0.3 and not ai_recommendation:
+            # This strategy hasn't worked well for this user (but keep AI recommendations)
+            base_strategy = self._get_alternative_strategy(context, exclude=action)
+        
+        if not base_strategy or not self.notification_manager.should_notify(user_id, base_strategy['priority']):
+            return None
+        
+        # Predict optimal timing
+        optimal_break = self.predictive_engine.predict_optimal_break_time(user_id)
+        if optimal_break and 'duration' in base_strategy:
+            base_strategy['duration'] = optimal_break
+        
+        # Create AI-enhanced notification
+        notification = self._create_enhanced_notification(base_strategy, context, user_model)
+        
+        # Record interaction for learning
+        user_model.update_from_interaction(context, base_strategy['action'])
+        interaction = {
+            'user_id': user_id,
+            'timestamp': datetime.now(),
+            'context': context,
+            'action': base_strategy['action']
+        }
+        self.global_interaction_history.append(interaction)
+        self.pattern_learner.partial_fit(interaction)  # Unrated for now; feedback adds the label
+        self.feedback_index.register(notification['notification_id'], interaction)
+        
+        self.notification_manager.record_notification(user_id)
+        return notification
+
+    def _create_burnout_notification(self, context: Dict, user_id: str) -> Dict:
+        """Create the burnout prevention notification and track it for feedback"""
+        notification = self._create_predictive_notification(
+            self.BURNOUT_MESSAGE,
+            'burnout_prevention',
+            context,
+            priority=3
+        )
+        self.feedback_index.register(notification['notification_id'], {
+            'user_id': user_id,
+            'timestamp': datetime.now(),
+            'context': context,
+            'action': 'burnout_prevention'
+        })
+        return notification
+    
+    def _create_burnout_notifications(self, contexts: List[Dict], user_ids: List[str]) -> List[Dict]:
+        """_create_burnout_notification for many users, sharing one timestamp and baseline risk"""
+        now = datetime.now()
+        timestamp = now.isoformat()
+        burnout_risk = round(self.predictive_engine.predict_burnout_risk('default'), 2)
+        notification_ids = self._notification_ids(len(contexts))
+        notifications = [{
+            'notification_id': notification_id,
+            'message': self.BURNOUT_MESSAGE,
+            'priority': 3,
+            'action': 'burnout_prevention',
+            'ai_predicted': True,
+            'context': {
+                'energy_level': round(context.get('energy_level', 0), 2),
+                'stress_level': round(context.get('stress_level', 0), 2),
+                'burnout_risk': burnout_risk
+            },
+            'timestamp': timestamp
+        } for notification_id, context in zip(notification_ids, contexts)]
+        self.feedback_index.register_batch(notification_ids, [{
+            'user_id': user_id,
+            'timestamp': now,
+            'context': context,
+            'action': 'burnout_prevention'
+        } for user_id, context in zip(user_ids, contexts)])
+        return notifications
+    
+    @staticmethod
+    def _notification_ids(count: int) -> List[str]:
+        """`count` random ids in uuid4().hex format, drawn in one call"""
+        raw = np.frombuffer(os.urandom(16 * count), dtype=np.uint8).reshape(count, 16).copy()
+        raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40  # Version 4
+        raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80  # RFC 4122 variant
+        text = raw.tobytes().hex()
+        return [text[start:start + 32] for start in range(0, len(text), 32)]
     
     def _create_predictive_notification(self, message: str, action: str, 
                                       context: Dict, priority: int = 2) -> Dict:
         """Create notification for predictive intervention"""
         return {
+            'notification_id': uuid.uuid4().hex,
             'message': message,
             'priority': priority,
             'action': action,
@@ -1181,11 +3395,14 @@ class AICoach:
                                     user_model: UserModel) -> Dict:
         """Create notification with AI enhancements"""
         base_notification = self.notification_manager.format_notification(strategy, context)
+        base_notification['notification_id'] = uuid.uuid4().hex
         
         # Add AI insights
         base_notification['ai_insights'] = {
             'ai_powered': self.ai_client is not None,
             'analysis_type': strategy.get('source', 'rule_based'),
+            'analysis_path': strategy.get('analysis_path', 'rule_based'),
+            'provider': strategy.get('provider'),
             'personalization_score': user_model.get_personalized_recommendation(strategy['action']),
             'predicted_effectiveness': self.pattern_learner.predict_effectiveness(context) if self.pattern_learner.is_trained else None,
             'next_state_prediction': user_model.predict_next_state(context),
@@ -1193,7 +3410,7 @@ class AICoach:
         }
         
         # Add fusion-specific insights if available
-        if hasattr(strategy, 'get') and strategy.get('source') == 'ai_fusion':
+        if hasattr(strategy, 'get') and strategy.get('source') in ('ai_fusion', 'local_fusion'):
             base_notification['fusion_details'] = {
                 'claude_insight': strategy.get('claude_insight', ''),
                 'local_insight': strategy.get('local_insight', ''),
@@ -1220,21 +3437,29 @@ class AICoach:
     
     def record_feedback(self, user_id: str, notification_id: str, feedback: Dict):
         """Record user feedback for continuous learning"""
-        user_model = self._get_user_model(user_id)
-        
-        # Find and update the interaction
-        for interaction in reversed(self.global_interaction_history):
-            if interaction['user_id'] == user_id:
-                interaction['outcome'] = feedback
-                user_model.update_from_interaction(
-                    interaction['context'],
-                    interaction['action'],
-                    feedback
-                )
-                break
+        # Find the interaction that produced this notification
+        interaction = self.feedback_index.get(notification_id)
+        if interaction is None:
+            logger.warning(f"No pending notification {notification_id} (unknown, answered or expired)")
+            return
+        if interaction['user_id'] != user_id:
+            logger.warning(f"Notification {notification_id} does not belong to user {user_id}")
+            return
+        
+        self.feedback_index.pop(notification_id)
+        self.global_interaction_history.record_outcome(interaction, feedback)
+        
+        # Online ML update from the new label (O(features)); burnout alerts are not training samples
+        if interaction['action'] != 'burnout_prevention':
+            self.pattern_learner.add_outcome(interaction)
+        self._get_user_model(user_id).update_from_interaction(
+            interaction['context'],
+            interaction['action'],
+            feedback
+        )
         
         # Save model periodically
-        if len(self.global_interaction_history) % 10 == 0:
+        if self.global_interaction_history.total_count % 10 == 0:
             self._save_model()
     
     def _save_model(self):
@@ -1242,6 +3467,7 @@ class AICoach:
         try:
             model_data = {
                 'user_models': self.user_models,
+                'state_transitions': self.state_transitions,
                 'pattern_learner': self.pattern_learner,
                 'interaction_history': self.global_interaction_history
             }
@@ -1258,12 +3484,40 @@ class AICoach:
                 with open(self.model_path, 'rb') as f:
                     model_data = pickle.load(f)
                     self.user_models = model_data.get('user_models', {})
+                    self.state_transitions = model_data.get('state_transitions', self.state_transitions)
                     self.pattern_learner = model_data.get('pattern_learner', PatternLearner())
-                    self.global_interaction_history = model_data.get('interaction_history', [])
+                    self._restore_history(model_data.get('interaction_history', []))
+                if self.llm_cache is not None:
+                    self.llm_cache.reserve_users(len(self.user_models))
+                self._seed_pattern_learner()
                 logger.info("AI models loaded successfully")
         except Exception as e:
             logger.error(f"Error loading model: {e}")
     
+    def _seed_pattern_learner(self):
+        """Fit the learner once from the restored history if it carries no running statistics"""
+        if not isinstance(getattr(self.pattern_learner, 'all_stats', None), RunningFeatureStats):
+            # Snapshots from before online training: retrain from the history instead
+            self.pattern_learner = PatternLearner()
+        if self.pattern_learner.all_stats.count == 0:
+            self.pattern_learner.learn_from_data(list(self.global_interaction_history))
+    
+    def _restore_history(self, saved_history):
+        """Adopt a saved history, keeping this coach's tier configuration"""
+        current = self.global_interaction_history
+        if isinstance(saved_history, InteractionHistory):
+            saved_history.configure(current.hot_capacity, current.cold_path)
+            self.global_interaction_history = saved_history
+        else:
+            # Older snapshots stored the full history as a plain list
+            current.extend(saved_history)
+    
+    async def aclose(self):
+        """Release pooled LLM connections and flush buffered history; call once when done coaching"""
+        if self.ai_client:
+            await self.ai_client.aclose()
+        self.global_interaction_history.flush()
+    
     def get_coach_status(self) -> Dict:
         """Get comprehensive coach status and AI statistics"""
         return {
@@ -1276,10 +3530,23 @@ class AICoach:
                 'pattern_discovery': len(self.pattern_learner.discovered_patterns) > 0
             },
             'statistics': {
-                'total_interactions': len(self.global_interaction_history),
+                'total_interactions': self.global_interaction_history.total_count,
+                'interaction_history': self.global_interaction_history.summary(),
+                'pending_feedback': {'pending': len(self.feedback_index), 'evictions': self.feedback_index.evictions},
                 'active_users': len(self.user_models),
                 'discovered_patterns': len(self.pattern_learner.discovered_patterns),
-                'feature_importance': dict(list(self.pattern_learner.feature_importance.items())[:3])
+                'feature_importance': dict(list(self.pattern_learner.feature_importance.items())[:3]),
+                'llm_cache': self.llm_cache.stats() if self.llm_cache else None,
+                'fusion_paths': dict(self.ai_client.fusion_stats) if self.ai_client else None,
+                'provider_circuits': {name: breaker.stats() for name, breaker in self.ai_client.breakers.items()}
+                                     if self.ai_client else {},
+                'provider_latency': {name: stats.stats() for name, stats in self.ai_client.provider_stats.items()}
+                                    if self.ai_client else {},
+                'provider_routing': dict(self.ai_client.routing_stats) if self.ai_client else None,
+                'llm_batching': {name: dict(provider.batch_stats) for name, provider in self.ai_client.providers.items()
+                                 if hasattr(provider, 'batch_stats')} if self.ai_client else {},
+                'llm_calls': {name: provider.call_metrics.stats() for name, provider in self.ai_client.providers.items()
+                              if hasattr(provider, 'call_metrics')} if self.ai_client else {}
             }
         }
 
@@ -1358,7 +3625,7 @@ async def demonstrate_ai_capabilities():
             
             # Simulate user feedback
             effectiveness = 0.9 if "break" in notification['message'] else 0.6
-            coach.record_feedback(user_id, f"demo_{i}", {"effectiveness": effectiveness})
+            coach.record_feedback(user_id, notification['notification_id'], {"effectiveness": effectiveness})
         else:
             print("   ✅ No intervention needed - you're doing great!")
     
@@ -1390,69 +3657,652 @@ async def demonstrate_ai_capabilities():
 
 
 # Enhanced Telemetry Collection Classes
+class WindowSensingBackend(ABC):
+    """
+    Source of focus-change events for WindowTracker.
+    
+    Backends sense from a helper thread or process and push
+    `on_change(window_info, tab_info, timestamp)` whenever the focused
+    window, its title or the browser tab changes, so callers never block on
+    sensing. `window_info` has the keys app_name, window_title and
+    full_context; `tab_info` is None outside browsers.
+    """
+    
+    @abstractmethod
+    def start(self, on_change: Callable[[Dict[str, Optional[str]], Optional[Dict[str, Any]], float], None]):
+        """Begin sensing on a helper thread or process; must return without blocking"""
+    
+    def stop(self):
+        pass
+    
+    @staticmethod
+    def window_info(app_name: Optional[str], window_title: str = '') -> Dict[str, Optional[str]]:
+        return {
+            'app_name': app_name,
+            'window_title': window_title,
+            'full_context': f"{app_name}: {window_title}" if app_name and window_title else app_name or window_title
+        }
+    
+    @staticmethod
+    def _terminate(helper: Optional[subprocess.Popen]):
+        """Stop a helper process and reap it so no zombies are left behind"""
+        if helper is None:
+            return
+        if helper.poll() is None:
+            helper.terminate()
+        try:
+            helper.wait(timeout=1.0)
+        except subprocess.TimeoutExpired:
+            helper.kill()
+            helper.wait()
+
+
+class PollingWindowBackend(WindowSensingBackend):
+    """
+    Runs a blocking `sample()` -> (window_info, tab_info) on a helper thread and pushes changes.
+    
+    Samples every `interval` seconds, or right away when `wake()` is called.
+    """
+    
+    def __init__(self, sample: Callable[[], Tuple[Dict[str, Optional[str]], Optional[Dict[str, Any]]]],
+                 interval: float = 5.0):
+        self.sample = sample
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def start(self, on_change):
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, args=(on_change,), name='window-sensing', daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+    
+    def wake(self):
+        """Sample now instead of at the next interval"""
+        self._wake.set()
+    
+    def _run(self, on_change):
+        last = None
+        while not self._stopped.is_set():
+            try:
+                current = self.sample()
+                if current != last and current[0].get('app_name'):
+                    on_change(current[0], current[1], time.time())
+                    last = current
+            except Exception as e:
+                logger.debug(f"Window sampling failed: {e}")
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+
+class MacWorkspaceBackend(PollingWindowBackend):
+    """
+    macOS backend driven by NSWorkspace application-activation notifications.
+    
+    A long-lived JavaScript for Automation helper (`osascript -l JavaScript`)
+    observes NSWorkspaceDidActivateApplicationNotification on its own run
+    loop and prints a line per activation; each line wakes the sampler, so
+    app switches are picked up as they happen. NSWorkspace does not report
+    title or tab changes inside an app, so those are still sampled every
+    `interval` seconds. If the helper cannot run, this degrades to polling
+    at that interval.
+    """
+    
+    WATCH_SCRIPT = '''
+    ObjC.import('AppKit');
+    ObjC.registerSubclass({
+        name: 'CoachActivationObserver',
+        methods: {
+            'activated:': {
+                types: ['void', ['id']],
+                implementation: function (notification) { console.log('activated'); }
+            }
+        }
+    });
+    var observer = $.CoachActivationObserver.alloc.init;
+    $.NSWorkspace.sharedWorkspace.notificationCenter.addObserverSelectorNameObject(
+        observer, 'activated:', $.NSWorkspaceDidActivateApplicationNotification, $());
+    $.NSRunLoop.currentRunLoop.run;
+    '''
+    
+    def __init__(self, sample: Callable[[], Tuple[Dict[str, Optional[str]], Optional[Dict[str, Any]]]],
+                 interval: float = 5.0, osascript: str = 'osascript'):
+        super().__init__(sample, interval)
+        self.osascript = osascript
+        self._watcher: Optional[subprocess.Popen] = None
+    
+    @staticmethod
+    def available(osascript: str = 'osascript') -> bool:
+        return sys.platform == 'darwin' and shutil.which(osascript) is not None
+    
+    def start(self, on_change):
+        try:
+            # JXA's console.log writes to stderr
+            self._watcher = subprocess.Popen([self.osascript, '-l', 'JavaScript', '-e', self.WATCH_SCRIPT],
+                                             stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, bufsize=1)
+        except OSError as e:
+            logger.warning(f"Workspace notifications unavailable, polling every {self.interval}s: {e}")
+        else:
+            threading.Thread(target=self._watch_activations, args=(self._watcher,),
+                             name='workspace-activations', daemon=True).start()
+        super().start(on_change)
+    
+    def stop(self):
+        super().stop()
+        watcher, self._watcher = self._watcher, None
+        self._terminate(watcher)
+    
+    def _watch_activations(self, watcher: subprocess.Popen):
+        for _ in watcher.stderr:
+            self.wake()
+        if self._watcher is watcher:
+            logger.warning(f"Workspace notification helper exited, polling every {self.interval}s")
+
+
+class X11WindowBackend(WindowSensingBackend):
+    """
+    Linux X11/EWMH backend built on long-lived `xprop -spy` helper processes.
+    
+    One process watches the root window's _NET_ACTIVE_WINDOW; a second one
+    watches the focused window's _NET_WM_NAME, so both focus changes and
+    title changes (e.g. switching browser tabs) arrive as soon as X reports
+    them. Windows without a _NET_WM_NAME (the desktop, some dialogs) are
+    reported with the application name alone. The application name comes
+    from WM_CLASS, or from
+    /proc/<_NET_WM_PID>/comm when the class is missing. Browsers do not
+    expose the URL here, so tab info carries the page title only.
+    """
+    
+    BROWSERS = {'chrome': 'Chrome', 'chromium': 'Chromium', 'firefox': 'Firefox', 'brave': 'Brave',
+                'vivaldi': 'Vivaldi', 'opera': 'Opera', 'edge': 'Edge'}
+    ACTIVE_WINDOW = re.compile(r'window id # (0x[0-9a-fA-F]+)')
+    WINDOW_NAME = re.compile(r'^_NET_WM_NAME\([^)]*\) = "(.*)"$')
+    WINDOW_PID = re.compile(r'_NET_WM_PID\(CARDINAL\) = (\d+)')
+    WINDOW_CLASS = re.compile(r'WM_CLASS\(STRING\) = "[^"]*", "([^"]*)"')
+    
+    def __init__(self, xprop: str = 'xprop'):
+        self.xprop = xprop
+        self._lock = threading.Lock()
+        self._active: Optional[str] = None
+        self._root_spy: Optional[subprocess.Popen] = None
+        self._title_spy: Optional[subprocess.Popen] = None
+        self._on_change = None
+    
+    @staticmethod
+    def available(xprop: str = 'xprop') -> bool:
+        return sys.platform.startswith('linux') and bool(os.environ.get('DISPLAY')) and shutil.which(xprop) is not None
+    
+    def start(self, on_change):
+        self._on_change = on_change
+        self._root_spy = self._spawn('-root', '-spy', '_NET_ACTIVE_WINDOW')
+        threading.Thread(target=self._watch_focus, args=(self._root_spy,), name='x11-focus', daemon=True).start()
+    
+    def stop(self):
+        with self._lock:
+            spies, self._root_spy, self._title_spy, self._active = (self._root_spy, self._title_spy), None, None, None
+        for spy in spies:
+            self._terminate(spy)
+    
+    def _spawn(self, *args: str) -> subprocess.Popen:
+        return subprocess.Popen([self.xprop, *args], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                text=True, bufsize=1)
+    
+    def _watch_focus(self, root_spy: subprocess.Popen):
+        for line in root_spy.stdout:
+            match = self.ACTIVE_WINDOW.search(line)
+            window_id = match.group(1) if match and int(match.group(1), 16) else None
+            with self._lock:
+                if self._root_spy is not root_spy:
+                    break
+                if window_id == self._active:
+                    continue
+                previous_spy = self._title_spy
+                self._active = window_id
+                self._title_spy = self._spawn('-id', window_id, '-spy', '_NET_WM_NAME') if window_id else None
+                title_spy = self._title_spy
+            self._terminate(previous_spy)
+            if title_spy is not None:
+                threading.Thread(target=self._watch_title, args=(window_id, title_spy),
+                                 name='x11-title', daemon=True).start()
+    
+    def _watch_title(self, window_id: str, title_spy: subprocess.Popen):
+        app_name = self._app_name(window_id)
+        reported = False
+        for line in title_spy.stdout:
+            match = self.WINDOW_NAME.match(line.strip())
+            if not match and reported:
+                continue
+            # Without a _NET_WM_NAME xprop prints "not found"; report the application alone
+            title = match.group(1).replace('\\"', '"').replace('\\\\', '\\') if match else ''
+            if not self._report(window_id, app_name, title):
+                return
+            reported = True
+        if not reported:
+            self._report(window_id, app_name, '')
+    
+    def _report(self, window_id: str, app_name: Optional[str], title: str) -> bool:
+        """Push a change for the focused window; False once focus has moved elsewhere"""
+        with self._lock:
+            if self._active != window_id:
+                return False
+        if app_name or title:
+            self._on_change(self.window_info(app_name, title), self._tab_info(app_name, title), time.time())
+        return True
+    
+    def _app_name(self, window_id: str) -> Optional[str]:
+        """WM_CLASS class name, else the owning process name from /proc"""
+        try:
+            result = subprocess.run([self.xprop, '-id', window_id, '_NET_WM_PID', 'WM_CLASS'],
+                                    capture_output=True, text=True, timeout=2)
+        except (OSError, subprocess.SubprocessError):
+            return None
+        match = self.WINDOW_CLASS.search(result.stdout)
+        if match and match.group(1):
+            return match.group(1)
+        match = self.WINDOW_PID.search(result.stdout)
+        if match:
+            try:
+                return Path(f"/proc/{match.group(1)}/comm").read_text().strip() or None
+            except OSError:
+                pass
+        return None
+    
+    def _tab_info(self, app_name: Optional[str], title: str) -> Optional[Dict[str, Any]]:
+        """Page title of a browser window (its title minus the trailing ' - Browser Name')"""
+        app_lower = (app_name or '').lower()
+        browser = next((name for key, name in self.BROWSERS.items() if key in app_lower), None)
+        if browser is None:
+            return None
+        page_title = re.split(r'\s+[-—–]\s+(?=[^-—–]*$)', title, maxsplit=1)[0]
+        return {'title': page_title, 'url': '', 'browser': browser}
+
+
+class FakeWindowBackend(WindowSensingBackend):
+    """
+    Scriptable backend for tests and demos.
+    
+    `push()` delivers a change immediately; a `script` of
+    (delay_seconds, app_name, window_title, tab_info) steps is played on a
+    helper thread once started.
+    """
+    
+    def __init__(self, script: Optional[List[Tuple[float, str, str, Optional[Dict[str, Any]]]]] = None):
+        self.script = list(script or [])
+        self._on_change = None
+        self._stopped = threading.Event()
+    
+    def start(self, on_change):
+        self._on_change = on_change
+        self._stopped.clear()
+        if self.script:
+            threading.Thread(target=self._play, name='fake-window-script', daemon=True).start()
+    
+    def stop(self):
+        self._stopped.set()
+    
+    def push(self, app_name: str, window_title: str = '', tab_info: Optional[Dict[str, Any]] = None,
+             timestamp: Optional[float] = None):
+        if self._on_change is not None:
+            self._on_change(self.window_info(app_name, window_title), tab_info, timestamp or time.time())
+    
+    def _play(self):
+        for delay, app_name, window_title, tab_info in self.script:
+            if self._stopped.wait(delay):
+                return
+            self.push(app_name, window_title, tab_info)
+
+
+class RateCounter:
+    """
+    Sliding-window event counter made of time buckets in a ring.
+    
+    `add` is O(1) (it only touches the current bucket), so it is cheap
+    enough for input-hook threads; `count` sums the buckets still inside
+    the window in O(window_seconds / bucket_seconds). Buckets are reused
+    lazily: a slot whose stamp is stale is reset on its next write.
+    """
+    
+    def __init__(self, window_seconds: int = 60, bucket_seconds: int = 1):
+        self.bucket_seconds = bucket_seconds
+        self.slots = max(1, window_seconds // bucket_seconds)
+        self.counts = [0] * self.slots
+        self.stamps = [-1] * self.slots  # Absolute bucket number each slot currently holds
+    
+    def add(self, now: float, n: float = 1):
+        bucket = int(now // self.bucket_seconds)
+        slot = bucket % self.slots
+        if self.stamps[slot] != bucket:
+            # Reset before restamping so a concurrent reader never sees old counts under the new stamp
+            self.counts[slot] = 0
+            self.stamps[slot] = bucket
+        self.counts[slot] += n
+    
+    def add_span(self, start: float, end: float):
+        """Add the seconds of [start, end) to the buckets they fall in; time older than the window is dropped"""
+        start = max(start, end - self.slots * self.bucket_seconds)
+        while start < end:
+            split = min(end, (start // self.bucket_seconds + 1) * self.bucket_seconds)
+            self.add(start, split - start)
+            start = split
+    
+    def count(self, now: float) -> float:
+        """Total added during the window, including the current bucket"""
+        oldest = int(now // self.bucket_seconds) - self.slots
+        return sum(count for count, stamp in zip(self.counts, self.stamps) if stamp > oldest)
+
+
+class TopKCounter:
+    """
+    Bounded accumulator of per-key totals for finding the top keys.
+    
+    Tracks at most `capacity` keys using the Space-Saving scheme: a new key
+    arriving when full replaces the key with the smallest total and starts
+    from that total, so heavy keys are kept and memory does not grow with
+    the number of distinct keys (totals of replacing keys are upper
+    bounds). The smallest total is found with a lazily updated min-heap.
+    """
+    
+    def __init__(self, capacity: int = 64):
+        self.capacity = capacity
+        self.totals: Dict[Any, float] = {}
+        self._heap: List[Tuple[float, Any]] = []  # (total, key); entries with an outdated total are skipped
+    
+    def add(self, key: Any, amount: float):
+        if key not in self.totals and len(self.totals) >= self.capacity:
+            self.totals[key] = self._evict_min()
+        total = self.totals.get(key, 0.0) + amount
+        self.totals[key] = total
+        heapq.heappush(self._heap, (total, key))
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(value, item) for item, value in self.totals.items()]
+            heapq.heapify(self._heap)
+    
+    def _evict_min(self) -> float:
+        while True:
+            total, key = heapq.heappop(self._heap)
+            if self.totals.get(key) == total:
+                del self.totals[key]
+                return total
+    
+    def top(self, n: int) -> Dict[Any, float]:
+        return dict(heapq.nlargest(n, self.totals.items(), key=lambda item: item[1]))
+
+
 class ActivityTracker:
-    """Tracks keyboard and mouse activity"""
+    """
+    Tracks keyboard and mouse activity
     
-    def __init__(self):
-        self.keyboard_events = deque(maxlen=1000)
-        self.mouse_events = deque(maxlen=1000)
-        self.typing_speed = deque(maxlen=100)
+    Input hooks only bump per-second ring counters, so each event costs
+    O(1) on the hook thread; per-minute rates are summed when read. Raw
+    mouse moves only store the latest position and count down to the next
+    clock check. A check takes a sample once `1 / mouse_sample_hz` seconds
+    have passed, and the number of moves between checks adapts (1 up to
+    MAX_MOVES_PER_CHECK) so that fast streams of moves read the clock about
+    once per sample interval. Each sample counts one mouse event and
+    credits the straight-line distance (pixels) travelled since the
+    previous credit. Reading the metrics credits the moves made since the
+    last sample, so the end of a movement is never lost.
+    
+    Crediting chords instead of every raw step keeps the hook cheaper than
+    timestamping each move, but under-reads curved paths. Straight
+    movements are exact. A turn of θ radians between samples loses about
+    θ²/24 of its length, e.g. about 2% for a circle drawn once a second at
+    the default 20 Hz. Raise `mouse_sample_hz` for more accuracy at the
+    cost of more clock reads.
+    """
+    
+    MAX_MOVES_PER_CHECK = 64
+    
+    def __init__(self, mouse_sample_hz: float = 20.0):
+        self.keyboard_events = RateCounter(60)
+        self.mouse_events = RateCounter(60)
+        self.mouse_distance = RateCounter(60)
+        self.mouse_sample_interval = 1.0 / mouse_sample_hz
+        self._moves_per_check = 1
+        self._moves_until_check = 1
+        self._next_mouse_sample = 0.0
+        self._mouse_x = self._mouse_y = None  # Latest raw position
+        self._credited_position: Optional[Tuple[float, float]] = None  # Distance is credited up to here
+        self._mouse_lock = threading.Lock()
         self.last_activity = time.time()
         self.is_active = False
         
     def on_key_press(self, key):
         now = time.time()
-        self.keyboard_events.append(now)
+        self.keyboard_events.add(now)
         self.last_activity = now
         self.is_active = True
-        
-        if len(self.keyboard_events) >= 2:
-            recent_events = [t for t in self.keyboard_events if now - t <= 60]
-            if len(recent_events) > 1:
-                wpm = len(recent_events) / 5
-                self.typing_speed.append(wpm)
     
     def on_mouse_move(self, x, y):
+        self._mouse_x = x
+        self._mouse_y = y
+        self._moves_until_check -= 1
+        if self._moves_until_check:
+            return
+        self._sample_mouse()
+    
+    def _sample_mouse(self):
         now = time.time()
-        self.mouse_events.append(now)
+        late = now - self._next_mouse_sample
+        if late < 0:
+            # Checked too early: wait for more moves before reading the clock again
+            self._moves_per_check = min(self._moves_per_check * 2, self.MAX_MOVES_PER_CHECK)
+            self._moves_until_check = self._moves_per_check
+            return
+        if late > self.mouse_sample_interval / 2:
+            self._moves_per_check = max(1, self._moves_per_check // 2)
+        self._moves_until_check = self._moves_per_check
+        self._next_mouse_sample = now + self.mouse_sample_interval
+        self._credit_mouse_distance(now)
+        self.mouse_events.add(now)
         self.last_activity = now
         self.is_active = True
     
+    def _credit_mouse_distance(self, now: float):
+        """Credit the distance from the last credited position to the latest raw one"""
+        with self._mouse_lock:
+            # A read racing the hook may pair x and y of adjacent moves, an error of at most one move
+            position, credited = (self._mouse_x, self._mouse_y), self._credited_position
+            if position[0] is None:
+                return
+            if credited is not None and position != credited:
+                self.mouse_distance.add(now, math.hypot(position[0] - credited[0], position[1] - credited[1]))
+            self._credited_position = position
+    
     def on_mouse_click(self, x, y, button, pressed):
         if pressed:
             now = time.time()
-            self.mouse_events.append(now)
+            self.mouse_events.add(now)
             self.last_activity = now
             self.is_active = True
     
     def get_activity_metrics(self) -> Dict[str, float]:
         now = time.time()
-        recent_keys = [t for t in self.keyboard_events if now - t <= 60]
-        recent_mouse = [t for t in self.mouse_events if now - t <= 60]
-        
-        keystrokes_per_min = len(recent_keys)
-        mouse_events_per_min = len(recent_mouse)
+        self._credit_mouse_distance(now)
+        keystrokes_per_min = self.keyboard_events.count(now)
+        mouse_events_per_min = self.mouse_events.count(now)
         idle_seconds = now - self.last_activity if self.last_activity else 0
-        avg_typing_speed = sum(self.typing_speed) / len(self.typing_speed) if self.typing_speed else 0
         
         return {
             'keystrokes_per_min': keystrokes_per_min,
             'mouse_events_per_min': mouse_events_per_min,
             'idle_seconds': idle_seconds,
-            'typing_speed_wpm': avg_typing_speed,
+            'typing_speed_wpm': keystrokes_per_min / 5,  # Five keystrokes per word
+            'mouse_distance_traveled': self.mouse_distance.count(now),
             'is_active': idle_seconds < 30
         }
 
 
+class ActivityClassifier:
+    """
+    Activity classifier compiled from keyword rules and a URL-domain table.
+    
+    All keywords are matched in one pass over the text with an Aho-Corasick
+    automaton, so the cost per window change depends on the text length,
+    not on the number of rules. A category scores one point per distinct
+    keyword found (the highest score wins, ties go to the earlier
+    category). A URL whose host, or a parent domain of it, is in the domain
+    table is classified by the table directly. Results are memoized in an
+    LRU cache keyed on (app, title, tab title, url).
+    """
+    
+    DEFAULT_DOMAINS = {
+        'github.com': 'productive', 'gitlab.com': 'productive', 'docs.google.com': 'productive',
+        'stackoverflow.com': 'research', 'wikipedia.org': 'research', 'arxiv.org': 'research',
+        'mail.google.com': 'communication', 'slack.com': 'communication', 'zoom.us': 'communication',
+        'youtube.com': 'entertainment', 'netflix.com': 'entertainment', 'twitter.com': 'entertainment',
+        'x.com': 'entertainment', 'instagram.com': 'entertainment', 'reddit.com': 'entertainment'
+    }
+    
+    def __init__(self, keywords: Dict[str, List[str]], domains: Optional[Dict[str, str]] = None,
+                 cache_size: int = 1024):
+        self.keywords: Dict[str, List[str]] = {}
+        self.domains = dict(self.DEFAULT_DOMAINS if domains is None else domains)
+        self.cache_size = cache_size
+        self._cache: OrderedDict = OrderedDict()
+        self.add_rules(keywords)
+    
+    def add_rules(self, keywords: Dict[str, List[str]]):
+        """Add keywords per category (new categories rank after existing ones) and recompile"""
+        for category, words in keywords.items():
+            self.keywords.setdefault(category, []).extend(word.lower() for word in words if word)
+        self._compile()
+    
+    def add_domains(self, domains: Dict[str, str]):
+        self.domains.update({domain.lower(): category for domain, category in domains.items()})
+        self._cache.clear()
+    
+    def _compile(self):
+        """Build the automaton: trie transitions, failure links and per-state keyword outputs"""
+        self.categories = list(self.keywords)
+        keyword_ids: Dict[str, int] = {}
+        self._keyword_categories: List[List[int]] = []  # Keyword id -> category index per rule
+        for category_index, category in enumerate(self.categories):
+            for word in self.keywords[category]:
+                if word not in keyword_ids:
+                    keyword_ids[word] = len(self._keyword_categories)
+                    self._keyword_categories.append([])
+                categories = self._keyword_categories[keyword_ids[word]]
+                if category_index not in categories:  # A repeated keyword still scores once
+                    categories.append(category_index)
+        
+        goto: List[Dict[str, int]] = [{}]
+        outputs: List[Tuple[int, ...]] = [()]
+        for word, keyword_id in keyword_ids.items():
+            state = 0
+            for char in word:
+                next_state = goto[state].get(char)
+                if next_state is None:
+                    next_state = len(goto)
+                    goto[state][char] = next_state
+                    goto.append({})
+                    outputs.append(())
+                state = next_state
+            outputs[state] += (keyword_id,)
+        
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in goto[state].items():
+                queue.append(child)
+                fallback = fail[state]
+                while fallback and char not in goto[fallback]:
+                    fallback = fail[fallback]
+                fail[child] = goto[fallback].get(char, 0)
+                outputs[child] += outputs[fail[child]]
+        
+        self._goto, self._fail, self._outputs = goto, fail, outputs
+        self._cache.clear()
+    
+    def classify(self, app_name: Optional[str] = None, window_title: Optional[str] = None,
+                 tab_title: Optional[str] = None, url: Optional[str] = None) -> str:
+        key = (app_name, window_title, tab_title, url)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        
+        result = self._classify_domain(url) or self._classify_text(
+            ' '.join(part.lower() for part in (app_name, window_title, tab_title, url) if part)
+        )
+        if self.cache_size > 0:
+            self._cache[key] = result
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return result
+    
+    def _classify_domain(self, url: Optional[str]) -> Optional[str]:
+        if not url or not self.domains:
+            return None
+        try:
+            host = (urlsplit(url if '//' in url else f"//{url}").hostname or '').lower()
+        except ValueError:
+            return None
+        labels = host.split('.')
+        for start in range(len(labels) - 1):
+            category = self.domains.get('.'.join(labels[start:]))
+            if category:
+                return category
+        return None
+    
+    def _classify_text(self, text: str) -> str:
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        matched = set()
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if outputs[state]:
+                matched.update(outputs[state])
+        
+        if not matched:
+            return 'unknown'
+        scores = [0] * len(self.categories)
+        for keyword_id in matched:
+            for category_index in self._keyword_categories[keyword_id]:
+                scores[category_index] += 1
+        best = max(range(len(scores)), key=scores.__getitem__)
+        return self.categories[best] if scores[best] > 0 else 'unknown'
+
+
 class WindowTracker:
-    """Enhanced application and window tracking with browser tabs"""
+    """
+    Enhanced application and window tracking with browser tabs
     
-    def __init__(self):
+    Focus changes are pushed by a WindowSensingBackend running off the
+    caller's thread (NSWorkspace notifications on macOS, xprop on Linux/X11), so
+    `update()` never blocks. Without a backend, `update()` samples
+    synchronously as before.
+    
+    Usage aggregates are maintained as time is accounted: switches and
+    per-activity seconds in minute buckets over the last hour, and window
+    totals in a bounded top-K counter, so reading metrics does not scan
+    the history.
+    """
+    
+    def __init__(self, backend: Optional[WindowSensingBackend] = None, top_window_capacity: int = 64,
+                 activity_rules: Optional[Dict[str, List[str]]] = None,
+                 activity_domains: Optional[Dict[str, str]] = None, title_poll_interval: float = 5.0):
+        self.title_poll_interval = title_poll_interval  # Seconds between macOS title/tab samples
+        self.backend = backend if backend is not None else self._default_backend()
+        self._backend_started = False
+        self._lock = threading.Lock()  # Backend threads and the coaching loop both touch the state below
+        self._latest: Tuple[Dict[str, Optional[str]], Optional[Dict[str, Any]]] = (
+            WindowSensingBackend.window_info(None), None
+        )
         self.window_history = deque(maxlen=1000)
         self.current_window = None
         self.current_app = None
-        self.window_usage = defaultdict(float)
+        self.current_activity_type = 'unknown'
+        self.window_usage = TopKCounter(top_window_capacity)
         self.window_switches = 0
+        self.switch_counter = RateCounter(3600, 10)  # Windows entered over the last hour
+        self.activity_seconds = defaultdict(partial(RateCounter, 3600, 60))  # Activity type -> seconds over the last hour
         self.last_check = time.time()
         self.productivity_keywords = {
             'productive': ['code', 'docs', 'document', 'spreadsheet', 'presentation', 'terminal', 'editor', 'development'],
@@ -1460,6 +4310,40 @@ class WindowTracker:
             'research': ['browser', 'chrome', 'safari', 'firefox', 'research', 'documentation'],
             'entertainment': ['youtube', 'netflix', 'spotify', 'music', 'video', 'game', 'social', 'twitter', 'instagram']
         }
+        # User rules extend the built-in keywords; call activity_classifier.add_rules() to add more later
+        self.activity_classifier = ActivityClassifier(self.productivity_keywords, activity_domains)
+        if activity_rules:
+            self.activity_classifier.add_rules(activity_rules)
+    
+    def _default_backend(self) -> Optional[WindowSensingBackend]:
+        if MacWorkspaceBackend.available():
+            return MacWorkspaceBackend(self._sample_osascript, self.title_poll_interval)
+        if X11WindowBackend.available():
+            return X11WindowBackend()
+        return None
+    
+    def _sample_osascript(self) -> Tuple[Dict[str, Optional[str]], Optional[Dict[str, Any]]]:
+        window_info = self.get_window_info()
+        return window_info, self.get_browser_tab_info(window_info['app_name'])
+    
+    def start(self):
+        """Start pushing focus changes from the sensing backend"""
+        if self.backend is not None and not self._backend_started:
+            self.backend.start(self._on_window_change)
+            self._backend_started = True
+    
+    def stop(self):
+        if self.backend is not None and self._backend_started:
+            self.backend.stop()
+            self._backend_started = False
+    
+    def _on_window_change(self, window_info: Dict[str, Optional[str]], tab_info: Optional[Dict[str, Any]],
+                          timestamp: float):
+        """Backend callback (helper thread): record the change at the time it was sensed"""
+        with self._lock:
+            self._latest = (window_info, tab_info)
+            # A change sensed just before the last metrics read is accounted from that read
+            self._record_window(window_info, tab_info, max(timestamp, self.last_check))
     
     def get_window_info(self) -> Dict[str, Optional[str]]:
         """Get detailed window information including title"""
@@ -1566,76 +4450,72 @@ class WindowTracker:
     
     def classify_activity(self, window_info: Dict, tab_info: Optional[Dict] = None) -> str:
         """Classify current activity based on window/tab content"""
-        
-        text_to_analyze = []
-        if window_info.get('app_name'):
-            text_to_analyze.append(window_info['app_name'].lower())
-        if window_info.get('window_title'):
-            text_to_analyze.append(window_info['window_title'].lower())
-        if tab_info:
-            if tab_info.get('title'):
-                text_to_analyze.append(tab_info['title'].lower())
-            if tab_info.get('url'):
-                text_to_analyze.append(tab_info['url'].lower())
-        
-        combined_text = ' '.join(text_to_analyze)
-        
-        scores = {}
-        for category, keywords in self.productivity_keywords.items():
-            score = sum(1 for keyword in keywords if keyword in combined_text)
-            if score > 0:
-                scores[category] = score
-        
-        if scores:
-            return max(scores, key=scores.get)
-        
-        return 'unknown'
+        tab_info = tab_info or {}
+        return self.activity_classifier.classify(
+            window_info.get('app_name'), window_info.get('window_title'), tab_info.get('title'), tab_info.get('url')
+        )
     
     def update(self):
-        """Update window tracking with enhanced info"""
-        now = time.time()
+        """Update window tracking with enhanced info (non-blocking when a backend is running)"""
+        if self.backend is not None:
+            self.start()
+            with self._lock:
+                return self._latest
+        
         window_info = self.get_window_info()
         app_name = window_info['app_name']
-        full_context = window_info['full_context']
-        
         tab_info = self.get_browser_tab_info(app_name) if app_name else None
+        with self._lock:
+            self._record_window(window_info, tab_info, time.time())
+        return window_info, tab_info
+    
+    def _record_window(self, window_info: Dict[str, Optional[str]], tab_info: Optional[Dict[str, Any]], now: float):
+        """Account the time spent in the previous window and log a switch (caller holds the lock)"""
+        app_name = window_info['app_name']
+        full_context = window_info['full_context']
         
+        self._account_time(now)
         if full_context and full_context != self.current_window:
             if self.current_window:
-                duration = now - self.last_check
-                self.window_usage[self.current_window] += duration
                 self.window_switches += 1
             
             self.current_window = full_context
             self.current_app = app_name
+            self.current_activity_type = self.classify_activity(window_info, tab_info)
+            self.switch_counter.add(now)
             
             history_entry = {
                 'timestamp': now,
                 'window': full_context,
                 'app': app_name,
                 'tab_info': tab_info,
-                'activity_type': self.classify_activity(window_info, tab_info)
+                'activity_type': self.current_activity_type
             }
             self.window_history.append(history_entry)
-        
+    
+    def _account_time(self, now: float):
+        """Credit the time since the last check to the current window and activity"""
+        if self.current_window:
+            duration = max(0.0, now - self.last_check)
+            self.window_usage.add(self.current_window, duration)
+            # Spread over the minutes it covered, so a long stay never exceeds the hour window
+            self.activity_seconds[self.current_activity_type].add_span(self.last_check, now)
         self.last_check = now
-        return window_info, tab_info
     
     def get_enhanced_metrics(self) -> Dict[str, Any]:
         """Get detailed window and activity metrics"""
-        now = time.time()
-        
-        if self.current_window:
-            duration = now - self.last_check
-            self.window_usage[self.current_window] += duration
-            self.last_check = now
-        
-        recent_activity = [entry for entry in self.window_history if now - entry['timestamp'] <= 3600]
+        with self._lock:
+            return self._enhanced_metrics(time.time())
+    
+    def _enhanced_metrics(self, now: float) -> Dict[str, Any]:
+        self._account_time(now)
         
-        activity_breakdown = defaultdict(float)
-        for entry in recent_activity:
-            activity_type = entry.get('activity_type', 'unknown')
-            activity_breakdown[activity_type] += 2
+        # Seconds per activity type over the last hour
+        activity_breakdown = {}
+        for activity_type, seconds in self.activity_seconds.items():
+            total = seconds.count(now)
+            if total > 0:
+                activity_breakdown[activity_type] = total
         
         current_info = self.window_history[-1] if self.window_history else {}
         
@@ -1643,10 +4523,10 @@ class WindowTracker:
             'current_app': self.current_app,
             'current_window': self.current_window,
             'current_tab': current_info.get('tab_info'),
-            'current_activity_type': current_info.get('activity_type', 'unknown'),
-            'window_switches_per_hour': len(recent_activity),
-            'activity_breakdown': dict(activity_breakdown),
-            'top_windows': dict(sorted(self.window_usage.items(), key=lambda x: x[1], reverse=True)[:5])
+            'current_activity_type': self.current_activity_type,
+            'window_switches_per_hour': int(self.switch_counter.count(now)),
+            'activity_breakdown': activity_breakdown,
+            'top_windows': self.window_usage.top(5)
         }
 
 
@@ -1663,7 +4543,7 @@ class NotificationManager:
         now = time.time()
         
         # Check global cooldown
-        if now - self.last_notification < self.notification_cooldown:
+        if self.in_global_cooldown(now):
             return False
         
         # Check per-user cooldown (shorter for high priority)
@@ -1672,6 +4552,10 @@ class NotificationManager:
         
         return now - last_user_notification >= user_cooldown
     
+    def in_global_cooldown(self, now: Optional[float] = None) -> bool:
+        """Whether any notification was sent within the cooldown, which blocks all users"""
+        return (time.time() if now is None else now) - self.last_notification < self.notification_cooldown
+    
     def format_notification(self, strategy: Dict, context: Dict) -> Dict:
         """Format coaching strategy as notification"""
         return {
@@ -1734,9 +4618,9 @@ class NotificationManager:
 class EnhancedTelemetryCollector:
     """Complete telemetry collector with real monitoring"""
     
-    def __init__(self):
+    def __init__(self, window_backend: Optional[WindowSensingBackend] = None):
         self.activity_tracker = ActivityTracker()
-        self.window_tracker = WindowTracker()
+        self.window_tracker = WindowTracker(window_backend)
         self.notification_manager = NotificationManager()
         self.start_time = time.time()
         self.monitoring = False
@@ -1763,6 +4647,7 @@ class EnhancedTelemetryCollector:
             )
             self.mouse_listener.start()
             
+            self.window_tracker.start()
             self.monitoring = True
             print("✅ Started real telemetry monitoring!")
             return True
@@ -1777,6 +4662,7 @@ class EnhancedTelemetryCollector:
             self.keyboard_listener.stop()
         if self.mouse_listener:
             self.mouse_listener.stop()
+        self.window_tracker.stop()
         
         self.monitoring = False
         print("⏹️  Stopped telemetry monitoring")
@@ -1805,6 +4691,7 @@ class EnhancedTelemetryCollector:
             # Core metrics
             'keystrokes_per_min': activity_metrics['keystrokes_per_min'],
             'mouse_events_per_min': activity_metrics['mouse_events_per_min'],
+            'mouse_distance_traveled': activity_metrics['mouse_distance_traveled'],
             'app_switches_per_hour': enhanced_metrics['window_switches_per_hour'],
             'session_duration_hours': session_duration,
             'focus_quality': focus_quality,
@@ -2033,7 +4920,7 @@ class EnhancedPersonalCoach:
         
         # Record feedback
         effectiveness = 0.8 if telemetry['productivity_score'] < 0.5 else 0.6
-        self.coach.record_feedback(self.user_id, f"alert_{self.coaching_stats['total_notifications']}", {"effectiveness": effectiveness})
+        self.coach.record_feedback(self.user_id, notification['notification_id'], {"effectiveness": effectiveness})
     
     def _show_status(self, telemetry: Dict):
         """Show status update"""
@@ -2063,6 +4950,7 @@ class EnhancedPersonalCoach:
         
         self.running = False
         self.collector.stop_monitoring()
+        await self.coach.aclose()
         
         print("\n📊 COACHING SESSION SUMMARY")
         print("=" * 50)
@@ -2125,7 +5013,8 @@ async def main():
         await coach.start_personal_coaching()
     else:
         # Demo mode
-        await demonstrate_ai_capabilities()
+        coach = await demonstrate_ai_capabilities()
+        await coach.aclose()
 
 
 if __name__ == "__main__":
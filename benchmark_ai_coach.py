@@ -0,0 +1,902 @@
+#!/usr/bin/env python3
+"""
+AI Coach Performance Benchmarks
+===============================
+
+Micro and macro benchmarks for the hot paths of the AI coach. Each suite
+compares the current implementation against the straightforward
+per-call/per-user approach and checks that both produce the same results.
+
+Usage:
+    # Batch coaching throughput (scalar loop vs analyze_telemetry_batch)
+    python benchmark_ai_coach.py --suite batch --users 10000 --ticks 5
+
+    # Per-user memory of the predictive time series
+    python benchmark_ai_coach.py --suite memory --users 10000
+
+    # Trend estimation per call at window sizes 10, 100 and 1000
+    python benchmark_ai_coach.py --suite trend
+
+    # Claude requests against a local stub server at 1, 10 and 100 concurrent users
+    python benchmark_ai_coach.py --suite http --stub-latency-ms 5
+
+    # LLM calls in a steady-state monitoring session with and without the response cache
+    python benchmark_ai_coach.py --suite cache --users 20 --ticks 30
+
+    # Estimated prompt tokens: indented JSON telemetry vs the compact encoder
+    python benchmark_ai_coach.py --suite prompt
+
+    # Time to nudge with a buffered response vs SSE streaming (local SSE stub)
+    python benchmark_ai_coach.py --suite stream
+
+    # Decision latency tail with two spiky in-process providers, without and with hedging
+    python benchmark_ai_coach.py --suite route
+
+    # Claude requests for concurrent users: one call per user vs cross-user micro-batches
+    python benchmark_ai_coach.py --suite microbatch --users 200 --stub-latency-ms 50
+
+    # Input-hook cost per keystroke: timestamp deque rescans vs per-second ring counters
+    python benchmark_ai_coach.py --suite input
+
+    # Mouse-move hook cost and accounting: per-event timestamps vs coalesced samples
+    python benchmark_ai_coach.py --suite mouse
+
+    # Window metrics per telemetry tick over a simulated day: history rescans vs incremental aggregates
+    python benchmark_ai_coach.py --suite window
+
+    # Activity classification with 10k keyword rules: substring loop vs compiled matcher and cache
+    python benchmark_ai_coach.py --suite classify
+
+Author: AI Coach Evolution Team
+Version: 1.0
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+import httpx
+import numpy as np
+
+# Benchmarks must never reach the real API or pick up a saved model
+os.environ.pop('ANTHROPIC_API_KEY', None)
+
+import ai_coach
+from ai_coach import (ActivityClassifier, ActivityTracker, AICoach, ClaudeClient, ClaudeMicroBatcher, FakeWindowBackend,
+                      LocalCoachProvider, MultiProviderLLMClient, PredictiveEngine, TimeSeriesStore,
+                      WindowSensingBackend, WindowTracker)
+
+logging.getLogger(ai_coach.__name__).setLevel(logging.WARNING)
+logging.getLogger('httpx').setLevel(logging.WARNING)
+
+
+def _random_telemetry(rng: random.Random) -> Dict[str, Any]:
+    """Telemetry mixing provided scores with values the coach must estimate"""
+    telemetry = {
+        'last_break_time': (datetime.now() - timedelta(minutes=rng.randint(5, 300))).isoformat(),
+        'keystrokes_per_min': rng.randint(0, 120),
+        'error_rate': rng.random() * 0.2,
+        'backspace_rate': rng.random() * 0.2,
+        'app_switches_per_hour': rng.randint(0, 60),
+        'tasks_completed_last_hour': rng.randint(0, 4),
+        'deep_focus_minutes': rng.randint(0, 60),
+        'primary_app_time_percentage': rng.randint(20, 100),
+        'notifications_last_hour': rng.randint(0, 20),
+        'mouse_distance_traveled': rng.randint(0, 20000),
+        'posture_quality': rng.random(),
+        'active_window_count': rng.randint(1, 12),
+        'thinking_pauses_per_hour': rng.randint(0, 30)
+    }
+    if rng.random() < 0.5:
+        telemetry['energy_level'] = rng.random()
+    if rng.random() < 0.5:
+        telemetry['stress_level'] = rng.random()
+    return telemetry
+
+
+def _comparable(notification: Any) -> Any:
+    """Drop wall-clock fields and generated ids so notifications from two runs can be compared"""
+    if not isinstance(notification, dict):
+        return notification
+    return {key: _comparable(value) for key, value in notification.items()
+            if key not in ('timestamp', 'notification_id')}
+
+
+async def benchmark_batch(users: int, ticks: int, warmup: int = 10, seed: int = 42) -> Dict[str, float]:
+    """
+    Time analyze_telemetry in a loop vs analyze_telemetry_batch over several ticks.
+
+    The first `warmup` ticks fill the per-user time series (burnout prediction
+    only kicks in after 10 samples) and are checked but not timed, so the
+    timings reflect a long-running deployment.
+    """
+    rng = random.Random(seed)
+    user_ids = [f"user_{i}" for i in range(users)]
+    workload = [[_random_telemetry(rng) for _ in user_ids] for _ in range(warmup + ticks)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        scalar_coach = AICoach(model_path=os.path.join(tmp, 'scalar.pkl'))
+        batch_coach = AICoach(model_path=os.path.join(tmp, 'batch.pkl'))
+
+        scalar_time = 0.0
+        batch_time = 0.0
+        mismatches = 0
+        for tick, telemetry_list in enumerate(workload):
+            timed = tick >= warmup
+
+            start = time.perf_counter()
+            scalar_results = [await scalar_coach.analyze_telemetry(t, u)
+                              for t, u in zip(telemetry_list, user_ids)]
+            scalar_time += (time.perf_counter() - start) if timed else 0.0
+
+            start = time.perf_counter()
+            batch_results = await batch_coach.analyze_telemetry_batch(telemetry_list, user_ids)
+            batch_time += (time.perf_counter() - start) if timed else 0.0
+
+            mismatches += sum(_comparable(a) != _comparable(b)
+                              for a, b in zip(scalar_results, batch_results))
+
+    return {
+        'scalar_users_per_sec': users * ticks / scalar_time,
+        'batch_users_per_sec': users * ticks / batch_time,
+        'speedup': scalar_time / batch_time,
+        'mismatches': mismatches
+    }
+
+
+def benchmark_time_series_memory(users: int, samples: int = 100) -> Dict[str, float]:
+    """Resident bytes per user: list-of-dicts history vs TimeSeriesStore ring buffers"""
+    import tracemalloc
+
+    tracemalloc.start()
+    legacy = defaultdict(list)
+    for i in range(users):
+        for j in range(samples):
+            legacy[f"user_{i}"].append({
+                'timestamp': datetime.now(),
+                'energy': j / samples,
+                'stress': 1.0 - j / samples,
+                'productivity': 0.5 + j / (3 * samples),
+                'focus': 0.25 + j / (4 * samples)
+            })
+    legacy_bytes = tracemalloc.get_traced_memory()[0]
+    del legacy
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    store = TimeSeriesStore(capacity=samples)
+    for i in range(users):
+        for j in range(samples):
+            store.append(f"user_{i}", [j / samples, 1.0 - j / samples,
+                                       0.5 + j / (3 * samples), 0.25 + j / (4 * samples)])
+    store_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    return {
+        'legacy_bytes_per_user': legacy_bytes / users,
+        'store_bytes_per_user': store_bytes / users,
+        'reduction': legacy_bytes / store_bytes
+    }
+
+
+def benchmark_trend(window: int, calls: int = 2000, seed: int = 42) -> Dict[str, float]:
+    """Per-call cost of burnout trend estimation: polyfit on a fresh list vs running sums"""
+    rng = random.Random(seed)
+    engine = PredictiveEngine()
+    store = TimeSeriesStore(capacity=window, trend_window=window, initial_users=1)
+    for _ in range(3 * window):
+        store.append('user', [rng.random() for _ in TimeSeriesStore.METRICS])
+
+    # Before: rebuild each metric list from the window and fit it with np.polyfit
+    recent = store.window('user', window)
+    start = time.perf_counter()
+    for _ in range(calls):
+        polyfit_trends = [engine._calculate_trend(recent[:, k].tolist()) for k in range(3)]
+    polyfit_time = (time.perf_counter() - start) / calls
+
+    # After: read the slopes maintained incrementally by the store
+    start = time.perf_counter()
+    for _ in range(calls):
+        running_trends = store.trend('user')[:3]
+    running_time = (time.perf_counter() - start) / calls
+
+    return {
+        'polyfit_us_per_call': polyfit_time * 1e6,
+        'running_sums_us_per_call': running_time * 1e6,
+        'speedup': polyfit_time / running_time,
+        'max_abs_slope_diff': float(max(abs(a - b) for a, b in zip(polyfit_trends, running_trends)))
+    }
+
+
+class _StubMessagesHandler(BaseHTTPRequestHandler):
+    """
+    Minimal Messages API stand-in: a fixed JSON nudge after an optional delay.
+
+    The answer is "generated" in 8-character chunks taking `chunk_delay`
+    seconds each. Buffered requests get the whole body once generation ends;
+    requests with "stream": true get server-sent events as chunks are produced.
+    Multi-user prompts (numbered `[i]` lines) get a JSON array with the nudge
+    repeated for every user.
+    """
+
+    protocol_version = 'HTTP/1.1'  # Keep-alive, like the real API
+    disable_nagle_algorithm = True  # Headers and body go out as separate writes
+    latency = 0.0
+    chunk_delay = 0.0
+    answer = json.dumps({
+        'nudge_text': 'Stand up and stretch for two minutes.',
+        'nudge_type': 'break_reminder',
+        'confidence': 0.8,
+        'priority': 2,
+        'reasoning': 'Stub response'
+    })
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        self.server.request_count += 1
+        if self.latency:
+            time.sleep(self.latency)
+        answer = self.answer
+        prompt = request.get('messages', [{}])[0].get('content', '')
+        users = re.findall(r'^\[(\d+)\]', prompt, re.MULTILINE)
+        if users:
+            answer = json.dumps([{'user': int(user), **json.loads(answer)} for user in users])
+        chunks = [answer[i:i + 8] for i in range(0, len(answer), 8)]
+        try:
+            if request.get('stream'):
+                self._stream(chunks, len(prompt) // 4)
+                return
+            if self.chunk_delay:
+                time.sleep(self.chunk_delay * len(chunks))
+            body = json.dumps({'content': [{'type': 'text', 'text': answer}],
+                               'usage': {'input_tokens': len(prompt) // 4, 'output_tokens': len(answer) // 4}}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # Client cancelled the request (e.g. latency budget exhausted)
+
+    def _stream(self, chunks: List[str], input_tokens: int):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        def send(event: Dict[str, Any]):
+            data = f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode()
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+
+        send({'type': 'message_start', 'message': {'role': 'assistant', 'content': [],
+                                                   'usage': {'input_tokens': input_tokens, 'output_tokens': 1}}})
+        send({'type': 'content_block_start', 'index': 0, 'content_block': {'type': 'text', 'text': ''}})
+        for chunk in chunks:
+            if self.chunk_delay:
+                time.sleep(self.chunk_delay)
+            send({'type': 'content_block_delta', 'index': 0, 'delta': {'type': 'text_delta', 'text': chunk}})
+        send({'type': 'content_block_stop', 'index': 0})
+        send({'type': 'message_delta', 'delta': {'stop_reason': 'end_turn'},
+              'usage': {'output_tokens': len(''.join(chunks)) // 4}})
+        send({'type': 'message_stop'})
+        self.wfile.write(b"0\r\n\r\n")
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256  # Room for 100 users connecting at once without pooling
+    request_count = 0
+
+
+def _start_stub_server(latency: float, chunk_delay: float = 0.0,
+                       answer: Optional[str] = None) -> ThreadingHTTPServer:
+    attributes = {'latency': latency, 'chunk_delay': chunk_delay}
+    if answer is not None:
+        attributes['answer'] = answer
+    handler = type('StubHandler', (_StubMessagesHandler,), attributes)
+    server = _StubServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def _run_clients(request, concurrency: int, requests_per_user: int) -> Dict[str, float]:
+    """`concurrency` users each issuing `requests_per_user` sequential requests"""
+    latencies: List[float] = []
+
+    async def user():
+        for _ in range(requests_per_user):
+            start = time.perf_counter()
+            await request()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        'mean_ms': float(np.mean(latencies)) * 1000,
+        'p95_ms': float(np.percentile(latencies, 95)) * 1000,
+        'requests_per_sec': len(latencies) / elapsed
+    }
+
+
+async def benchmark_http(concurrency: int, requests_per_user: int = 20,
+                         stub_latency_ms: float = 5.0) -> Dict[str, float]:
+    """Per-request latency and throughput: a fresh httpx client per request vs the pooled ClaudeClient"""
+    server = _start_stub_server(stub_latency_ms / 1000)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    client = ClaudeClient('stub-key', base_url=base_url, max_connections=100)
+    payload = {'model': client.model, 'max_tokens': 300,
+               'messages': [{'role': 'user', 'content': 'benchmark'}]}
+
+    # Before: every attempt opened (and tore down) its own AsyncClient and connection
+    async def fresh_request():
+        async with httpx.AsyncClient(timeout=30.0) as fresh:
+            response = await fresh.post(f"{base_url}/messages", headers=client.headers, json=payload)
+            return response.json()
+
+    try:
+        fresh = await _run_clients(fresh_request, concurrency, requests_per_user)
+        pooled = await _run_clients(lambda: client._make_request('benchmark'), concurrency, requests_per_user)
+    finally:
+        await client.aclose()
+        server.shutdown()
+        server.server_close()
+
+    results = {f"fresh_{key}": value for key, value in fresh.items()}
+    results.update({f"pooled_{key}": value for key, value in pooled.items()})
+    results['throughput_gain'] = pooled['requests_per_sec'] / fresh['requests_per_sec']
+    return results
+
+
+def _steady_telemetry(baseline: Dict[str, Any], rng: random.Random) -> Dict[str, Any]:
+    """A monitoring tick that jitters slightly around the user's baseline"""
+    telemetry = dict(baseline)
+    for key in ('energy_level', 'stress_level', 'error_rate', 'backspace_rate', 'posture_quality'):
+        if key in telemetry:
+            telemetry[key] = min(1.0, max(0.0, telemetry[key] + rng.uniform(-0.02, 0.02)))
+    telemetry['keystrokes_per_min'] = max(0, baseline['keystrokes_per_min'] + rng.randint(-3, 3))
+    return telemetry
+
+
+async def benchmark_cache(users: int, ticks: int, seed: int = 42) -> Dict[str, float]:
+    """Stub Messages API requests for a steady-state session, without and with the response cache"""
+    server = _start_stub_server(0.0)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    rng = random.Random(seed)
+    user_ids = [f"user_{i}" for i in range(users)]
+    baselines = [_random_telemetry(rng) for _ in user_ids]
+    workload = [[_steady_telemetry(b, rng) for b in baselines] for _ in range(ticks)]
+
+    results = {}
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            for label, cache_size in (('uncached', 0), ('cached', 1024)):
+                coach = AICoach(model_path=os.path.join(tmp, f'{label}.pkl'), llm_cache_size=cache_size)
+                coach.ai_client = MultiProviderLLMClient(
+                    {'claude': ClaudeClient('stub-key', base_url=base_url)}, cache=coach.llm_cache
+                )
+                server.request_count = 0
+                for telemetry_list in workload:
+                    for telemetry, user_id in zip(telemetry_list, user_ids):
+                        await coach.analyze_telemetry(telemetry, user_id)
+                results[f"{label}_llm_requests"] = server.request_count
+                if coach.llm_cache:
+                    results['cache_hit_rate'] = coach.get_coach_status()['statistics']['llm_cache']['hit_rate']
+                await coach.aclose()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    results['llm_call_reduction'] = 1 - results['cached_llm_requests'] / max(1, results['uncached_llm_requests'])
+    return results
+
+
+def _enhanced_telemetry(rng: random.Random) -> Dict[str, Any]:
+    """Telemetry shaped like EnhancedTelemetryCollector output (titles, URLs, breakdowns, metadata)"""
+    telemetry = _random_telemetry(rng)
+    tab = {'title': 'Pull request #4821: Refactor scheduler retry handling - GitHub',
+           'url': 'https://github.com/example-org/scheduler/pull/4821/files?diff=split',
+           'browser': 'Google Chrome'}
+    telemetry.update({
+        'mouse_events_per_min': rng.randint(0, 80),
+        'session_duration_hours': rng.random() * 6,
+        'focus_quality': rng.random(),
+        'productivity_score': rng.random(),
+        'current_app': 'Google Chrome',
+        'current_window': tab['title'],
+        'current_tab': tab,
+        'current_activity_type': 'productive',
+        'enhanced_focus_quality': rng.random(),
+        'distraction_level': rng.random(),
+        'context_switches': telemetry['app_switches_per_hour'],
+        'activity_breakdown': {app: rng.random() * 3600 for app in (
+            'Google Chrome', 'Visual Studio Code', 'Slack', 'Terminal', 'Zoom', 'Notion')},
+        'browser_tab_title': tab['title'],
+        'browser_tab_url': tab['url'],
+        'browser_name': tab['browser'],
+        'typing_speed_wpm': rng.randint(0, 90),
+        'idle_seconds': rng.randint(0, 600),
+        'is_active': True,
+        'timestamp': datetime.now().isoformat(),
+        'monitoring_active': True,
+        'data_source': 'enhanced_real_telemetry',
+        'enhanced_monitoring': True
+    })
+    return telemetry
+
+
+def benchmark_prompt(samples: int = 200, seed: int = 42) -> Dict[str, float]:
+    """Estimated prompt tokens per call: json.dumps(indent=2) telemetry vs PromptEncoder"""
+    rng = random.Random(seed)
+    client = ClaudeClient('stub-key')
+    encoder = client.prompt_encoder
+    claude = {'nudge_text': 'Step away from the screen for five minutes.', 'nudge_type': 'break_reminder',
+              'confidence': 0.82, 'priority': 2, 'reasoning': 'Long stretch without a break and rising errors'}
+    local = {'nudge_text': 'Too many distractions. Focus on one task for the next 25 minutes.',
+             'nudge_type': 'focus_boost', 'confidence': 0.6, 'priority': 2, 'reasoning': 'Low focus quality'}
+
+    totals = defaultdict(int)
+    for _ in range(samples):
+        telemetry = _enhanced_telemetry(rng)
+        compact = client.build_analysis_prompt(telemetry, "User: bench")
+        # Before: the same template with the raw telemetry as indented JSON
+        legacy = compact.replace(encoder.encode_telemetry(telemetry), json.dumps(telemetry, indent=2), 1)
+        totals['legacy_analysis_tokens'] += encoder.estimate_tokens(legacy)
+        totals['compact_analysis_tokens'] += encoder.estimate_tokens(compact)
+
+        compact = MultiProviderLLMClient.build_fusion_prompt(claude, local, telemetry, encoder)
+        legacy = (compact
+                  .replace(encoder.encode_analysis(claude), json.dumps(claude, indent=2), 1)
+                  .replace(encoder.encode_analysis(local), json.dumps(local, indent=2), 1)
+                  .replace(encoder.encode_telemetry(telemetry, encoder.token_budget // 2),
+                           json.dumps(telemetry, indent=2), 1))
+        totals['legacy_fusion_tokens'] += encoder.estimate_tokens(legacy)
+        totals['compact_fusion_tokens'] += encoder.estimate_tokens(compact)
+
+    results = {key: value / samples for key, value in totals.items()}
+    results['analysis_reduction'] = 1 - results['compact_analysis_tokens'] / results['legacy_analysis_tokens']
+    results['fusion_reduction'] = 1 - results['compact_fusion_tokens'] / results['legacy_fusion_tokens']
+    return results
+
+
+async def benchmark_stream(requests: int = 20, stub_latency_ms: float = 5.0,
+                           chunk_delay_ms: float = 2.0) -> Dict[str, float]:
+    """Time-to-nudge for a buffered response vs SSE streaming with early extraction"""
+    answer = json.dumps({
+        'nudge_text': 'Step away from the screen for five minutes and refill your water.',
+        'nudge_type': 'break_reminder',
+        'confidence': 0.82,
+        'priority': 2,
+        'reasoning': ' '.join(['Typing speed has dropped while the error rate keeps climbing,'
+                               ' and the last real break was over two hours ago.'] * 6)
+    })
+    server = _start_stub_server(stub_latency_ms / 1000, chunk_delay_ms / 1000, answer)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    expected = {key: value for key, value in json.loads(answer).items() if key != 'reasoning'}
+
+    results = {}
+    try:
+        for label, stream in (('buffered', False), ('streaming', True)):
+            client = ClaudeClient('stub-key', base_url=base_url, stream=stream)
+            latencies = []
+            for _ in range(requests):
+                start = time.perf_counter()
+                nudge = await client._make_request('benchmark')
+                latencies.append(time.perf_counter() - start)
+                assert {key: nudge.get(key) for key in expected} == expected, nudge
+            await client.aclose()
+            results[f"{label}_time_to_nudge_ms"] = float(np.mean(latencies)) * 1000
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    results['speedup'] = results['buffered_time_to_nudge_ms'] / results['streaming_time_to_nudge_ms']
+    return results
+
+
+class _SpikyProvider(LocalCoachProvider):
+    """In-process provider with a fixed latency and an occasional stall"""
+
+    def __init__(self, latency: float, stall: float, stall_probability: float, rng: random.Random):
+        super().__init__(latency)
+        self.stall = stall
+        self.stall_probability = stall_probability
+        self.rng = rng
+
+    async def analyze_telemetry(self, telemetry_data: Dict, context: str = "") -> Optional[Dict]:
+        if self.rng.random() < self.stall_probability:
+            await asyncio.sleep(self.stall)
+        return await super().analyze_telemetry(telemetry_data, context)
+
+
+async def benchmark_route(requests: int = 400, stall_ms: float = 500.0, stall_probability: float = 0.05,
+                          seed: int = 42) -> Dict[str, float]:
+    """Decision latency percentiles with latency-aware routing, without and with hedged requests"""
+    telemetry = _random_telemetry(random.Random(seed))
+
+    results = {}
+    for label, hedge in (('routed', False), ('hedged', True)):
+        rng = random.Random(seed)
+        client = MultiProviderLLMClient({
+            'fast': _SpikyProvider(0.02, stall_ms / 1000, stall_probability, rng),
+            'backup': _SpikyProvider(0.03, stall_ms / 1000, stall_probability, rng)
+        }, hedge_requests=hedge)
+        latencies = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            await client.analyze_telemetry(telemetry)
+            latencies.append(time.perf_counter() - start)
+        for percentile in (50, 95, 99):
+            results[f"{label}_p{percentile}_ms"] = float(np.percentile(latencies, percentile)) * 1000
+        results[f"{label}_hedged_requests"] = client.routing_stats['hedged']
+    return results
+
+
+async def benchmark_microbatch(users: int, stub_latency_ms: float = 50.0, ticks: int = 3,
+                               max_batch_size: int = 16, max_wait_ms: float = 20.0) -> Dict[str, float]:
+    """Stub Messages API requests and tick latency for `users` concurrent analyses, unbatched vs micro-batched"""
+    server = _start_stub_server(stub_latency_ms / 1000)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    rng = random.Random(42)
+    telemetry = [_random_telemetry(rng) for _ in range(users)]
+    expected = json.loads(_StubMessagesHandler.answer)
+
+    results = {}
+    try:
+        for label in ('unbatched', 'batched'):
+            provider = ClaudeClient('stub-key', base_url=base_url)
+            if label == 'batched':
+                provider = ClaudeMicroBatcher(provider, max_batch_size, max_wait_ms)
+            server.request_count = 0
+            tick_seconds = []
+            for _ in range(ticks):
+                start = time.perf_counter()
+                answers = await asyncio.gather(*(provider.analyze_telemetry(t, f"User: user_{i}")
+                                                 for i, t in enumerate(telemetry)))
+                tick_seconds.append(time.perf_counter() - start)
+                assert all(answer == expected for answer in answers), answers[:2]
+            await provider.aclose()
+            results[f"{label}_llm_requests"] = server.request_count
+            results[f"{label}_tick_ms"] = float(np.mean(tick_seconds)) * 1000
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    results['request_reduction'] = 1 - results['batched_llm_requests'] / max(1, results['unbatched_llm_requests'])
+    return results
+
+
+class _DequeKeyTracker:
+    """The previous keystroke hook: a timestamp deque rescanned on every key press"""
+
+    def __init__(self):
+        self.keyboard_events = deque(maxlen=1000)
+        self.typing_speed = deque(maxlen=100)
+
+    def on_key_press(self, now: float):
+        self.keyboard_events.append(now)
+        if len(self.keyboard_events) >= 2:
+            recent_events = [t for t in self.keyboard_events if now - t <= 60]
+            if len(recent_events) > 1:
+                self.typing_speed.append(len(recent_events) / 5)
+
+
+def benchmark_input(events: int = 100000, keys_per_second: float = 12.0) -> Dict[str, float]:
+    """Per-keystroke hook cost and the keystrokes/min read, deque rescans vs ring counters"""
+    timestamps = [1_700_000_000.0 + i / keys_per_second for i in range(events)]
+
+    legacy = _DequeKeyTracker()
+    start = time.perf_counter()
+    for now in timestamps:
+        legacy.on_key_press(now)
+    legacy_seconds = time.perf_counter() - start
+
+    tracker = ActivityTracker()
+    start = time.perf_counter()
+    for now in timestamps:
+        tracker.keyboard_events.add(now)
+    ring_seconds = time.perf_counter() - start
+
+    now = timestamps[-1]
+    expected = sum(1 for t in legacy.keyboard_events if now - t < 60)
+    return {
+        'deque_us_per_key': legacy_seconds / events * 1e6,
+        'ring_us_per_key': ring_seconds / events * 1e6,
+        'speedup': legacy_seconds / ring_seconds,
+        'deque_keys_per_min': expected,
+        'ring_keys_per_min': tracker.keyboard_events.count(now)
+    }
+
+
+class _PerEventMouseTracker:
+    """The previous mouse-move hook: one timestamp per raw move event"""
+
+    def __init__(self):
+        self.mouse_events = deque(maxlen=1000)
+        self.last_activity = time.time()
+        self.is_active = False
+
+    def on_mouse_move(self, x, y):
+        now = time.time()
+        self.mouse_events.append(now)
+        self.last_activity = now
+        self.is_active = True
+
+
+def _time_hook(hook, events: int, repeats: int = 7) -> float:
+    """Seconds spent calling a mouse-move hook `events` times (best of `repeats`, to shed scheduler noise)"""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for i in range(events):
+            hook(i % 1000, 500)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def benchmark_mouse(events: int = 200000, replay_seconds: float = 2.0, move_hz: float = 500.0) -> Dict[str, float]:
+    """
+    Raw mouse-move hook cost, then a paced circular motion checked against its exact path length.
+
+    Hook costs are also reported net of an empty hook, i.e. without the
+    Python call overhead that any hook pays. The replay ends with a short
+    drag that stops between samples, which must still be credited.
+    """
+    call_seconds = _time_hook(lambda x, y: None, events)
+    legacy_seconds = _time_hook(_PerEventMouseTracker().on_mouse_move, events)
+    coalesced_seconds = _time_hook(ActivityTracker().on_mouse_move, events)
+
+    tracker = ActivityTracker()
+    radius, exact, previous = 300.0, 0.0, None
+    raw_moves = 0
+    end = time.perf_counter() + replay_seconds
+    while time.perf_counter() < end:
+        angle = time.perf_counter() * 2 * np.pi  # One revolution per second
+        point = (500 + radius * np.cos(angle), 500 + radius * np.sin(angle))
+        if previous is not None:
+            exact += float(np.hypot(point[0] - previous[0], point[1] - previous[1]))
+        previous = point
+        tracker.on_mouse_move(*point)
+        raw_moves += 1
+        time.sleep(1 / move_hz)
+    for step in range(1, 4):
+        tracker.on_mouse_move(previous[0] + 10 * step, previous[1])
+        raw_moves += 1
+    exact += 30.0
+    metrics = tracker.get_activity_metrics()
+
+    return {
+        'per_event_us_per_move': legacy_seconds / events * 1e6,
+        'coalesced_us_per_move': coalesced_seconds / events * 1e6,
+        'speedup': legacy_seconds / coalesced_seconds,
+        'per_event_net_us_per_move': (legacy_seconds - call_seconds) / events * 1e6,
+        'coalesced_net_us_per_move': (coalesced_seconds - call_seconds) / events * 1e6,
+        'net_speedup': (legacy_seconds - call_seconds) / (coalesced_seconds - call_seconds),
+        'replay_raw_moves': raw_moves,
+        'replay_mouse_events_counted': metrics['mouse_events_per_min'],
+        'replay_exact_distance_px': exact,
+        'replay_measured_distance_px': metrics['mouse_distance_traveled']
+    }
+
+
+class _ScanningWindowMetrics:
+    """The previous window metrics: hour-long history rescans and an unbounded usage dict sorted per tick"""
+
+    def __init__(self):
+        self.window_history = deque(maxlen=1000)
+        self.window_usage = defaultdict(float)
+        self.current_window = None
+        self.last_check = 0.0
+
+    def record(self, window: str, activity_type: str, now: float):
+        if window == self.current_window:
+            return
+        if self.current_window:
+            self.window_usage[self.current_window] += now - self.last_check
+        self.current_window = window
+        self.window_history.append({'timestamp': now, 'window': window, 'activity_type': activity_type})
+        self.last_check = now
+
+    def metrics(self, now: float) -> Dict[str, Any]:
+        self.window_usage[self.current_window] += now - self.last_check
+        self.last_check = now
+        recent_activity = [entry for entry in self.window_history if now - entry['timestamp'] <= 3600]
+        activity_breakdown = defaultdict(float)
+        for entry in recent_activity:
+            activity_breakdown[entry['activity_type']] += 2
+        return {
+            'window_switches_per_hour': len(recent_activity),
+            'activity_breakdown': dict(activity_breakdown),
+            'top_windows': dict(sorted(self.window_usage.items(), key=lambda x: x[1], reverse=True)[:5])
+        }
+
+
+def benchmark_window(hours: int = 8, switches_per_hour: int = 600, distinct_windows: int = 5000,
+                     tick_seconds: float = 5.0, seed: int = 42) -> Dict[str, float]:
+    """Per-tick cost of window metrics over a simulated work day with Zipf-distributed window titles"""
+    rng = np.random.default_rng(seed)
+    titles = [f"Editor: file_{i}.py" if i % 3 else f"Chrome: page {i}" for i in range(distinct_windows)]
+    start_time = 1_700_000_000.0
+    switch_times = np.sort(rng.uniform(0, hours * 3600, hours * switches_per_hour)) + start_time
+    picks = np.minimum(rng.zipf(1.2, len(switch_times)), distinct_windows) - 1
+
+    legacy = _ScanningWindowMetrics()
+    tracker = WindowTracker(FakeWindowBackend())
+    legacy_seconds = incremental_seconds = 0.0
+    ticks = 0
+    next_switch = 0
+    for now in np.arange(start_time, start_time + hours * 3600, tick_seconds):
+        while next_switch < len(switch_times) and switch_times[next_switch] <= now:
+            title = titles[picks[next_switch]]
+            app, window_title = title.split(': ', 1)
+            window_info = WindowSensingBackend.window_info(app, window_title)
+            tracker._record_window(window_info, None, float(switch_times[next_switch]))
+            legacy.record(window_info['full_context'], tracker.current_activity_type, float(switch_times[next_switch]))
+            next_switch += 1
+        if not tracker.current_window:
+            continue
+
+        begin = time.perf_counter()
+        expected = legacy.metrics(float(now))
+        legacy_seconds += time.perf_counter() - begin
+        begin = time.perf_counter()
+        metrics = tracker._enhanced_metrics(float(now))
+        incremental_seconds += time.perf_counter() - begin
+        ticks += 1
+
+    exact_top = list(expected['top_windows'])
+    return {
+        'rescan_us_per_tick': legacy_seconds / ticks * 1e6,
+        'incremental_us_per_tick': incremental_seconds / ticks * 1e6,
+        'speedup': legacy_seconds / incremental_seconds,
+        'rescan_tracked_windows': len(legacy.window_usage),
+        'incremental_tracked_windows': len(tracker.window_usage.totals),
+        'top5_overlap': len(set(exact_top) & set(metrics['top_windows'])) / len(exact_top),
+        'rescan_switches_last_hour': expected['window_switches_per_hour'],
+        'incremental_switches_last_hour': metrics['window_switches_per_hour']
+    }
+
+
+def _substring_classify(keywords: Dict[str, List[str]], app: str, title: str, tab_title: str, url: str) -> str:
+    """The previous classifier: `keyword in text` for every keyword of every category"""
+    combined_text = ' '.join(part.lower() for part in (app, title, tab_title, url) if part)
+    scores = {}
+    for category, words in keywords.items():
+        score = sum(1 for keyword in words if keyword in combined_text)
+        if score > 0:
+            scores[category] = score
+    return max(scores, key=scores.get) if scores else 'unknown'
+
+
+def benchmark_classify(rules: int = 10000, events: int = 5000, distinct_windows: int = 300,
+                       seed: int = 42) -> Dict[str, float]:
+    """Per-event classification cost with `rules` user keywords on top of the built-in ones"""
+    rng = random.Random(seed)
+    keywords = {category: list(words) for category, words in WindowTracker(FakeWindowBackend()).productivity_keywords.items()}
+    categories = list(keywords)
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    for _ in range(rules):
+        word = ''.join(rng.choice(letters) for _ in range(rng.randint(5, 10)))
+        keywords[rng.choice(categories)].append(word)
+
+    vocabulary = ['code', 'review', 'slack', 'general', 'youtube', 'music', 'quarterly', 'report', 'docs',
+                  'scheduler', 'pull', 'request', 'inbox', 'design'] + [rng.choice(keywords[c]) for c in categories * 5]
+    windows = []
+    for i in range(distinct_windows):
+        title = ' '.join(rng.choice(vocabulary) for _ in range(rng.randint(3, 8)))
+        app = rng.choice(['Google Chrome', 'Code', 'Slack', 'Terminal', 'Preview'])
+        url = f"https://example-{i % 40}.com/{title.replace(' ', '/')}" if app == 'Google Chrome' else ''
+        windows.append((app, title, title if url else '', url))
+    stream = [windows[min(int(rng.paretovariate(1.2)) - 1, distinct_windows - 1)] for _ in range(events)]
+
+    start = time.perf_counter()
+    expected = [_substring_classify(keywords, *window) for window in stream]
+    substring_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    classifier = ActivityClassifier(keywords, domains={}, cache_size=0)
+    compile_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    compiled = [classifier.classify(*window) for window in stream]
+    compiled_seconds = time.perf_counter() - start
+
+    cached_classifier = ActivityClassifier(keywords, domains={}, cache_size=1024)
+    start = time.perf_counter()
+    cached = [cached_classifier.classify(*window) for window in stream]
+    cached_seconds = time.perf_counter() - start
+
+    return {
+        'substring_us_per_event': substring_seconds / events * 1e6,
+        'compiled_us_per_event': compiled_seconds / events * 1e6,
+        'cached_us_per_event': cached_seconds / events * 1e6,
+        'compiled_speedup': substring_seconds / compiled_seconds,
+        'cached_speedup': substring_seconds / cached_seconds,
+        'compile_ms': compile_seconds * 1000,
+        'mismatches': sum(a != b for a, b in zip(expected, compiled)) + sum(a != b for a, b in zip(expected, cached))
+    }
+
+
+def _print_results(title: str, results: Dict[str, float]):
+    print(f"\n⏱️  {title}")
+    print("=" * 50)
+    for key, value in results.items():
+        if isinstance(value, float):
+            print(f"  {key}: {value:,.2f}" if value == 0 or abs(value) >= 0.01 else f"  {key}: {value:.2e}")
+        else:
+            print(f"  {key}: {value}")
+
+
+async def main():
+    """Run the selected benchmark suite"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark AI Coach hot paths')
+    parser.add_argument('--suite', choices=['batch', 'memory', 'trend', 'http', 'cache', 'prompt', 'stream', 'route',
+                                            'microbatch', 'input', 'mouse', 'window',
+                                            'classify'],
+                       default='batch',
+                       help='Benchmark suite to run')
+    parser.add_argument('--users', type=int, default=10000,
+                       help='Users per tick for the batch, cache and microbatch suites')
+    parser.add_argument('--ticks', type=int, default=5,
+                       help='Timed telemetry ticks per user for the batch and cache suites')
+    parser.add_argument('--warmup', type=int, default=10,
+                       help='Untimed ticks that fill per-user history first')
+    parser.add_argument('--requests-per-user', type=int, default=20,
+                       help='Sequential requests per concurrent user for the http suite')
+    parser.add_argument('--stub-latency-ms', type=float, default=5.0,
+                       help='Server-side delay of the stub Messages API for the http suite')
+
+    args = parser.parse_args()
+
+    if args.suite == 'batch':
+        results = await benchmark_batch(args.users, args.ticks, args.warmup)
+        _print_results(f"Batch coaching: {args.users} users x {args.ticks} ticks", results)
+    elif args.suite == 'memory':
+        results = benchmark_time_series_memory(args.users)
+        _print_results(f"Time series memory: {args.users} users x 100 samples", results)
+    elif args.suite == 'trend':
+        for window in (10, 100, 1000):
+            _print_results(f"Burnout trend estimation: window {window}", benchmark_trend(window))
+    elif args.suite == 'http':
+        for concurrency in (1, 10, 100):
+            results = await benchmark_http(concurrency, args.requests_per_user, args.stub_latency_ms)
+            _print_results(f"Claude requests vs local stub: {concurrency} concurrent users", results)
+    elif args.suite == 'cache':
+        results = await benchmark_cache(args.users, args.ticks)
+        _print_results(f"LLM response cache: {args.users} users x {args.ticks} steady-state ticks", results)
+    elif args.suite == 'prompt':
+        _print_results("Estimated prompt tokens per call", benchmark_prompt())
+    elif args.suite == 'stream':
+        results = await benchmark_stream(stub_latency_ms=args.stub_latency_ms)
+        _print_results("Time to nudge: buffered vs streamed response", results)
+    elif args.suite == 'route':
+        _print_results("Decision latency: routed vs hedged providers", await benchmark_route())
+    elif args.suite == 'microbatch':
+        results = await benchmark_microbatch(args.users, args.stub_latency_ms)
+        _print_results(f"Claude micro-batching: {args.users} concurrent users", results)
+    elif args.suite == 'input':
+        _print_results("Keystroke hook cost at 12 keys/s", benchmark_input())
+    elif args.suite == 'mouse':
+        _print_results("Mouse-move hook: per-event vs coalesced at 20 Hz", benchmark_mouse())
+    elif args.suite == 'window':
+        _print_results("Window metrics per tick: 8h day, 600 switches/h, 5000 titles", benchmark_window())
+    elif args.suite == 'classify':
+        _print_results("Activity classification with 10k user rules", benchmark_classify())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
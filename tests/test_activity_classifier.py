@@ -0,0 +1,54 @@
+import random
+
+from ai_coach import ActivityClassifier
+
+
+def _naive_classify(keywords, text):
+    """One point per distinct keyword found as a substring; ties go to the earlier category"""
+    text = text.lower()
+    scores = [sum(1 for word in set(words) if word in text) for words in keywords.values()]
+    best = max(range(len(scores)), key=scores.__getitem__)
+    return list(keywords)[best] if scores[best] > 0 else 'unknown'
+
+
+def test_overlapping_keywords_are_all_counted():
+    classifier = ActivityClassifier({
+        'productive': ['code', 'coder'],
+        'research': ['decode', 'she', 'he', 'hers'],
+    }, domains={})
+
+    # decode, code and coder all end inside 'decoder': productive 2, research 1
+    assert classifier.classify('decoder') == 'productive'
+    # she, he and hers overlap in 'ushers'
+    assert classifier.classify('ushers') == 'research'
+    # A keyword shared by two categories scores for both; the tie goes to the earlier one
+    classifier.add_rules({'research': ['code']})
+    assert classifier.classify('code') == 'productive'
+
+
+def test_matches_naive_substring_scoring():
+    rng = random.Random(7)
+    keywords = {
+        category: [''.join(rng.choice('abc') for _ in range(rng.randint(1, 4))) for _ in range(6)]
+        for category in ('productive', 'research', 'communication')
+    }
+    classifier = ActivityClassifier(keywords, domains={}, cache_size=0)
+
+    for _ in range(500):
+        text = ''.join(rng.choice('abcd') for _ in range(rng.randint(0, 12)))
+        assert classifier.classify(text) == _naive_classify(keywords, text), text
+
+
+def test_domains_win_over_keywords():
+    classifier = ActivityClassifier({'productive': ['code']})
+
+    assert classifier.classify('Chrome', 'Code review', url='https://m.youtube.com/watch') == 'entertainment'
+    assert classifier.classify('Chrome', 'Code review', url='https://notyoutube.com/') == 'productive'
+
+
+def test_cache_is_invalidated_by_new_rules():
+    classifier = ActivityClassifier({'productive': ['code']}, domains={})
+    assert classifier.classify('Figma') == 'unknown'
+
+    classifier.add_rules({'design': ['figma']})
+    assert classifier.classify('Figma') == 'design'
@@ -0,0 +1,70 @@
+import math
+import time
+
+from ai_coach import ActivityTracker, RateCounter
+
+
+def test_rate_counter_expires_buckets_across_the_window():
+    counter = RateCounter(window_seconds=60, bucket_seconds=10)
+    counter.add(1000.0)
+    counter.add(1005.0, 2)
+    counter.add(1030.0)
+
+    assert counter.count(1030.0) == 4
+    # The bucket starting at 1000 stays until the window has moved past it
+    assert counter.count(1059.0) == 4
+    assert counter.count(1060.0) == 1
+    assert counter.count(1089.0) == 1
+    assert counter.count(1090.0) == 0
+
+
+def test_rate_counter_reuses_stale_slots():
+    counter = RateCounter(window_seconds=60, bucket_seconds=10)
+    counter.add(1000.0, 5)
+    # Same ring slot one full window later
+    counter.add(1060.0)
+
+    assert counter.count(1060.0) == 1
+
+
+def test_mouse_distance_includes_the_last_segment():
+    tracker = ActivityTracker(mouse_sample_hz=1.0)
+    tracker.on_mouse_move(0, 0)
+    for x in range(1, 11):
+        tracker.on_mouse_move(x * 10, 0)
+
+    metrics = tracker.get_activity_metrics()
+    assert math.isclose(metrics['mouse_distance_traveled'], 100.0)
+    assert metrics['mouse_events_per_min'] == 1
+
+
+def _replay(monkeypatch, path, move_hz, sample_hz=20.0):
+    """Play raw moves at `move_hz` on a fake clock; returns (exact path length, credited distance)"""
+    clock = [1000.0]
+    monkeypatch.setattr(time, 'time', lambda: clock[0])
+    tracker = ActivityTracker(mouse_sample_hz=sample_hz)
+    for point in path:
+        tracker.on_mouse_move(*point)
+        clock[0] += 1 / move_hz
+    exact = sum(math.dist(a, b) for a, b in zip(path, path[1:]))
+    return exact, tracker.get_activity_metrics()['mouse_distance_traveled']
+
+
+def test_mouse_distance_on_a_curve_reads_low_within_bounds(monkeypatch):
+    # Two circles of radius 300 px, one per second, with raw moves at 500 Hz
+    path = [(500 + 300 * math.cos(step * math.pi / 250), 500 + 300 * math.sin(step * math.pi / 250))
+            for step in range(1001)]
+
+    exact, measured = _replay(monkeypatch, path, move_hz=500)
+    assert 0.97 * exact <= measured <= exact
+
+    # Sampling faster follows the curve more closely
+    _, finer = _replay(monkeypatch, path, move_hz=500, sample_hz=100.0)
+    assert measured < finer <= exact
+
+
+def test_mouse_distance_is_exact_for_straight_moves(monkeypatch):
+    path = [(x * 3, 200) for x in range(1000)]
+
+    exact, measured = _replay(monkeypatch, path, move_hz=500)
+    assert math.isclose(measured, exact)
@@ -0,0 +1,77 @@
+import asyncio
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from ai_coach import AICoach
+
+
+def _telemetry(rng, tick, exhausted=False):
+    telemetry = {
+        'last_break_time': (datetime.now() - timedelta(minutes=rng.randint(5, 300))).isoformat(),
+        'keystrokes_per_min': rng.randint(0, 120),
+        'error_rate': rng.random() * 0.2,
+        'app_switches_per_hour': rng.randint(0, 60),
+        'deep_focus_minutes': rng.randint(0, 60),
+        'notifications_last_hour': rng.randint(0, 20),
+        'posture_quality': rng.random()
+    }
+    if exhausted:
+        # Energy and productivity sliding while stress climbs: the burnout trend
+        decline = 0.06 * tick + rng.random() * 0.02
+        telemetry.update(energy_level=0.9 - decline, productivity_score=0.9 - decline, stress_level=0.1 + decline)
+    elif rng.random() < 0.5:
+        telemetry['energy_level'] = rng.random()
+    return telemetry
+
+
+def _comparable(notification):
+    """Drop wall-clock fields and generated ids so notifications from two coaches can be compared"""
+    if not isinstance(notification, dict):
+        return notification
+    return {key: _comparable(value) for key, value in notification.items()
+            if key not in ('timestamp', 'notification_id')}
+
+
+def _trained_coach(path, history):
+    coach = AICoach(model_path=str(path))
+    coach.ai_client = None
+    coach.notification_manager.notification_cooldown = 0  # Let every user through the notify step
+    coach.pattern_learner.learn_from_data(history)
+    assert coach.pattern_learner.is_trained
+    return coach
+
+
+@pytest.fixture
+def history():
+    rng = random.Random(1)
+    return [{'context': {'energy_level': rng.random(), 'stress_level': rng.random(),
+                         'focus_quality': rng.random(), 'cognitive_load': rng.random()},
+             'timestamp': datetime(2024, 5, 1, rng.randint(8, 18)),
+             'outcome': {'effectiveness': rng.random()}}
+            for _ in range(60)]
+
+
+def test_batch_matches_scalar_with_trained_learner(tmp_path, history):
+    rng = random.Random(7)
+    user_ids = [f"user_{i}" for i in range(40)]
+    exhausted = set(user_ids[:6])
+    scalar_coach = _trained_coach(tmp_path / 'scalar.pkl', history)
+    batch_coach = _trained_coach(tmp_path / 'batch.pkl', history)
+
+    delivered = burnout = 0
+    for tick in range(14):
+        telemetry_list = [_telemetry(rng, tick, user_id in exhausted) for user_id in user_ids]
+        scalar = [asyncio.run(scalar_coach.analyze_telemetry(telemetry, user_id))
+                  for telemetry, user_id in zip(telemetry_list, user_ids)]
+        batch = asyncio.run(batch_coach.analyze_telemetry_batch(telemetry_list, user_ids))
+
+        assert [_comparable(n) for n in batch] == [_comparable(n) for n in scalar]
+        delivered += sum(n is not None for n in batch)
+        burnout += sum(n is not None and n['message'] == AICoach.BURNOUT_MESSAGE for n in batch)
+
+    # Both the notify and the burnout branches were exercised
+    assert burnout > 0
+    assert delivered > burnout
+    assert batch_coach.pattern_learner.all_stats.count == scalar_coach.pattern_learner.all_stats.count
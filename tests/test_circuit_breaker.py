@@ -0,0 +1,66 @@
+from ai_coach import CircuitBreaker
+
+
+def _expire_cooldown(breaker):
+    breaker.opened_at -= breaker.cooldown
+
+
+def _tripped_breaker():
+    breaker = CircuitBreaker(window_size=10, min_calls=4, error_rate_threshold=0.5, base_cooldown=30.0)
+    breaker.record_success(0.1)
+    breaker.record_success(0.1)
+    breaker.record_failure()
+    assert breaker.state == 'closed'
+    breaker.record_failure()
+    return breaker
+
+
+def test_opens_once_the_error_rate_reaches_the_threshold():
+    breaker = _tripped_breaker()
+
+    assert breaker.state == 'open'
+    assert not breaker.allow_request()
+    assert breaker.rejected == 1
+
+
+def test_slow_successes_count_as_failures():
+    breaker = CircuitBreaker(min_calls=2, latency_threshold=1.0)
+    breaker.record_success(5.0)
+    breaker.record_success(5.0)
+
+    assert breaker.state == 'open'
+
+
+def test_half_open_allows_a_single_probe_and_success_closes():
+    breaker = _tripped_breaker()
+    _expire_cooldown(breaker)
+
+    assert breaker.state == 'half_open'
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+
+    breaker.record_success(0.1)
+    assert breaker.state == 'closed'
+    assert breaker.cooldown == breaker.base_cooldown
+    assert breaker.allow_request()
+
+
+def test_failed_probe_reopens_with_doubled_cooldown():
+    breaker = _tripped_breaker()
+    _expire_cooldown(breaker)
+    assert breaker.allow_request()
+
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    assert breaker.cooldown == 60.0
+    assert breaker.times_opened == 2
+
+
+def test_cancelled_probe_frees_the_half_open_slot():
+    breaker = _tripped_breaker()
+    _expire_cooldown(breaker)
+    assert breaker.allow_request()
+
+    breaker.record_cancelled(0.5)
+    assert breaker.state == 'half_open'
+    assert breaker.allow_request()
@@ -0,0 +1,104 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from ai_coach import ClaudeClient, MultiProviderLLMClient
+
+ANSWER = {'nudge_text': 'Stretch for a minute.', 'nudge_type': 'break_reminder', 'priority': 2}
+
+
+def _message():
+    return {'content': [{'type': 'text', 'text': json.dumps(ANSWER)}], 'usage': {'input_tokens': 10, 'output_tokens': 5}}
+
+
+@pytest.fixture
+def pooled(monkeypatch):
+    """Route every pooled httpx client through a handler; records the clients created"""
+    state = {'created': [], 'handler': lambda request: httpx.Response(200, json=_message())}
+    real_client = httpx.AsyncClient
+
+    async def dispatch(request):
+        result = state['handler'](request)
+        return await result if asyncio.iscoroutine(result) else result
+
+    def make_client(**kwargs):
+        client = real_client(transport=httpx.MockTransport(dispatch), **kwargs)
+        state['created'].append(client)
+        return client
+
+    monkeypatch.setattr(httpx, 'AsyncClient', make_client)
+    return state
+
+
+def test_requests_and_retries_share_one_pooled_client(pooled):
+    statuses = iter([503, 200, 200, 200, 200, 200, 200])
+    pooled['handler'] = lambda request: httpx.Response(next(statuses), json=_message())
+
+    async def run():
+        client = ClaudeClient('test-key', base_url='http://stub/v1')
+        client.retry_delay = 0.01
+        try:
+            first = await client._make_request('prompt')
+            rest = await asyncio.gather(*(client._make_request('prompt') for _ in range(5)))
+            return client, [first, *rest]
+        finally:
+            await client.aclose()
+
+    client, results = asyncio.run(run())
+
+    assert results == [ANSWER] * 6
+    assert len(pooled['created']) == 1
+    assert pooled['created'][0].is_closed and client._client is None
+    assert client.call_metrics.stats()['analysis']['retries'] == 1
+
+
+def test_closed_client_reopens_lazily(pooled):
+    async def run():
+        client = ClaudeClient('test-key', base_url='http://stub/v1')
+        await client._make_request('prompt')
+        await client.aclose()
+        await client.aclose()  # Closing twice is harmless
+        result = await client._make_request('prompt')
+        await client.aclose()
+        return result
+
+    assert asyncio.run(run()) == ANSWER
+    assert len(pooled['created']) == 2
+    assert all(client.is_closed for client in pooled['created'])
+
+
+def test_concurrency_is_capped_by_the_semaphore(pooled):
+    in_flight = {'now': 0, 'peak': 0}
+
+    async def handler(request):
+        in_flight['now'] += 1
+        in_flight['peak'] = max(in_flight['peak'], in_flight['now'])
+        await asyncio.sleep(0.01)
+        in_flight['now'] -= 1
+        return httpx.Response(200, json=_message())
+
+    pooled['handler'] = handler
+
+    async def run():
+        client = ClaudeClient('test-key', base_url='http://stub/v1', max_concurrency=2)
+        try:
+            return await asyncio.gather(*(client._make_request('prompt') for _ in range(8)))
+        finally:
+            await client.aclose()
+
+    assert asyncio.run(run()) == [ANSWER] * 8
+    assert in_flight['peak'] == 2
+
+
+def test_multi_provider_client_closes_the_pool(pooled):
+    async def run():
+        claude = ClaudeClient('test-key', base_url='http://stub/v1')
+        router = MultiProviderLLMClient({'claude': claude})
+        await claude._make_request('prompt')
+        await router.aclose()
+        return claude
+
+    claude = asyncio.run(run())
+    assert claude._client is None and pooled['created'][0].is_closed
@@ -0,0 +1,68 @@
+import random
+
+import numpy as np
+
+from ai_coach import CoachingStrategy
+
+BOUNDARIES = (0.0, 0.29, 0.3, 0.31, 0.49, 0.5, 0.51, 0.6, 0.61, 0.7, 0.71, 0.8, 0.81, 1.0)
+FIELDS = ('stress_level', 'energy_level', 'productivity_score', 'focus_quality', 'break_needed', 'cognitive_load')
+TIME_PERIODS = ('morning', 'afternoon', 'evening', 'night')
+
+
+def _rule_chain(context):
+    """The rule chain select_strategy evaluated before it was compiled into a table"""
+    if context['stress_level'] > 0.7 and context['energy_level'] < 0.3:
+        return 'high_stress_low_energy'
+    elif context['productivity_score'] > 0.7 and context['focus_quality'] > 0.7:
+        return 'high_productivity_flow'
+    elif context['focus_quality'] < 0.3:
+        return 'low_focus_high_switches'
+    elif context['break_needed'] > 0.7:
+        return 'break_needed'
+    elif context['time_period'] == 'afternoon' and context['energy_level'] < 0.5:
+        return 'afternoon_slump'
+    elif context['time_period'] == 'morning' and context['energy_level'] > 0.6:
+        return 'morning_prime'
+    elif context['cognitive_load'] > 0.8:
+        return 'cognitive_overload'
+    return None
+
+
+def _expected(strategy, context):
+    key = _rule_chain(context)
+    return strategy.strategies[key][0] if key else None
+
+
+def _contexts(count, time_period=None, seed=10):
+    rng = random.Random(seed)
+    return [dict({field: rng.choice(BOUNDARIES) if rng.random() < 0.5 else rng.random() for field in FIELDS},
+                 time_period=time_period or rng.choice(TIME_PERIODS))
+            for _ in range(count)]
+
+
+def test_decision_table_matches_the_rule_chain():
+    strategy = CoachingStrategy()
+    for context in _contexts(5000):
+        assert strategy.select_strategy(context) == _expected(strategy, context), context
+
+
+def test_batch_selection_matches_the_rule_chain():
+    strategy = CoachingStrategy()
+    for seed, time_period in enumerate(TIME_PERIODS):
+        contexts = _contexts(500, time_period, seed)
+        columns = {field: np.array([context[field] for context in contexts]) for field in FIELDS}
+        columns['time_period'] = time_period
+
+        assert strategy.select_strategy_batch(columns) == [_expected(strategy, context) for context in contexts]
+
+
+def test_recorded_effectiveness_reranks_only_that_key():
+    strategy = CoachingStrategy()
+    flow = {'stress_level': 0.1, 'energy_level': 0.9, 'productivity_score': 0.9, 'focus_quality': 0.9,
+            'break_needed': 0.1, 'cognitive_load': 0.1, 'time_period': 'evening'}
+    slower = strategy.strategies['high_productivity_flow'][1]
+
+    strategy.record_effectiveness('high_productivity_flow', slower['message'], 1.0)
+
+    assert strategy.select_strategy(flow) == slower
+    assert strategy.best_strategies[strategy.strategy_keys.index('break_needed')] == strategy.strategies['break_needed'][0]
@@ -0,0 +1,63 @@
+import time
+
+from ai_coach import FeedbackIndex
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def _interaction(name):
+    return {'user_id': name, 'action': 'take_break', 'context': {}}
+
+
+def test_pending_feedback_expires_after_the_ttl(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(time, 'time', clock)
+    index = FeedbackIndex(ttl_seconds=60)
+    index.register('n1', _interaction('a'))
+    clock.now += 30
+    index.register('n2', _interaction('b'))
+
+    clock.now += 29
+    assert index.get('n1') == _interaction('a')
+
+    clock.now += 2  # n1 is 61 s old, n2 only 31 s
+    assert index.get('n1') is None
+    assert index.get('n2') == _interaction('b')
+    assert len(index) == 1
+    # Expiry is not a capacity eviction
+    assert index.evictions == 0
+
+
+def test_max_pending_drops_the_oldest_notifications():
+    index = FeedbackIndex(max_pending=3)
+    for i in range(5):
+        index.register(f"n{i}", _interaction(str(i)))
+
+    assert list(index.pending) == ['n2', 'n3', 'n4']
+    assert index.evictions == 2
+    assert index.get('n0') is None
+
+
+def test_register_batch_respects_order_and_capacity():
+    index = FeedbackIndex(max_pending=4)
+    index.register('single', _interaction('s'))
+    index.register_batch([f"b{i}" for i in range(4)], [_interaction(str(i)) for i in range(4)])
+
+    assert list(index.pending) == ['b0', 'b1', 'b2', 'b3']
+    assert index.evictions == 1
+    assert index.get('b2') == _interaction('2')
+
+
+def test_pop_answers_a_notification_once():
+    index = FeedbackIndex()
+    index.register('n1', _interaction('a'))
+
+    assert index.pop('n1') == _interaction('a')
+    assert index.pop('n1') is None
+    assert len(index) == 0
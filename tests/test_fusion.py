@@ -0,0 +1,92 @@
+import asyncio
+
+from ai_coach import LocalCoachProvider, MultiProviderLLMClient
+
+# The local rule-based analysis answers this with a priority 2 break reminder
+BREAK_DUE = {'energy_level': 0.6, 'stress_level': 0.3, 'focus_quality': 0.6, 'break_needed': 0.9}
+
+
+class FusionProvider:
+    """Analysis provider with a canned answer that can also run LLM fusion"""
+
+    def __init__(self, analysis, fusion=None):
+        self.analysis = analysis
+        self.fusion = fusion
+        self.fusion_prompts = []
+
+    async def analyze_telemetry(self, telemetry_data, context=''):
+        return dict(self.analysis)
+
+    async def _make_request(self, prompt, max_tokens=300, call_type='analysis', stream=None):
+        self.fusion_prompts.append(prompt)
+        return dict(self.fusion) if self.fusion is not None else None
+
+
+def _analysis(nudge_type, priority=2):
+    return {'nudge_text': f"Claude says: {nudge_type}", 'nudge_type': nudge_type, 'priority': priority,
+            'confidence': 0.9, 'reasoning': 'Claude reasoning'}
+
+
+def _analyze(client):
+    return asyncio.run(client.analyze_telemetry(BREAK_DUE))
+
+
+def test_agreeing_analyses_are_fused_locally_without_an_llm_call():
+    provider = FusionProvider(_analysis('stress_reduction'), fusion=_analysis('focus_boost'))
+    client = MultiProviderLLMClient({'claude': provider})
+
+    result = _analyze(client)
+
+    assert result['analysis_path'] == 'local_fusion'
+    assert result['reasoning'].startswith('Claude and local analysis agree')
+    assert provider.fusion_prompts == []
+    assert client.fusion_stats['local'] == 1
+
+
+def test_conflicting_analyses_go_to_llm_fusion():
+    fused = {'nudge_text': 'Fused advice', 'nudge_type': 'break_reminder', 'priority': 2}
+    provider = FusionProvider(_analysis('productivity_tip', priority=1), fusion=fused)
+    client = MultiProviderLLMClient({'claude': provider})
+
+    result = _analyze(client)
+
+    assert result['analysis_path'] == 'llm_fusion' and result['nudge_text'] == 'Fused advice'
+    assert len(provider.fusion_prompts) == 1
+    assert client.fusion_stats['llm'] == 1
+
+
+def test_conflict_without_a_fusion_provider_is_a_marked_local_fallback():
+    # LocalCoachProvider cannot run fusion, so nothing is routable for it
+    client = MultiProviderLLMClient({'local': LocalCoachProvider()})
+    client.fusion_disagreement_threshold = 0.0
+
+    result = asyncio.run(client.analyze_telemetry({**BREAK_DUE, 'stress_level': 0.9, 'energy_level': 0.6}))
+
+    assert result['analysis_path'] == 'local_fusion'
+    assert 'disagree' in result['reasoning'] and 'no LLM fusion provider' in result['reasoning']
+    assert client.fusion_stats['forced_local'] == 1 and client.fusion_stats['local'] == 0
+
+
+def test_empty_fusion_answer_is_not_a_provider_fault():
+    provider = FusionProvider(_analysis('productivity_tip', priority=1), fusion={'nudge_text': None})
+    client = MultiProviderLLMClient({'claude': provider})
+
+    for _ in range(6):
+        result = _analyze(client)
+        assert result['analysis_path'] == 'llm' and result['nudge_type'] == 'productivity_tip'
+
+    assert client.fusion_stats['llm_empty'] == 6 and client.fusion_stats['llm_failed'] == 0
+    assert client.breakers['claude'].state == 'closed'
+    assert not any(client.breakers['claude'].outcomes)
+    assert client.provider_stats['claude'].ewma_error_rate == 0.0
+
+
+def test_failed_fusion_request_counts_against_the_provider():
+    provider = FusionProvider(_analysis('productivity_tip', priority=1), fusion=None)
+    client = MultiProviderLLMClient({'claude': provider})
+
+    result = _analyze(client)
+
+    assert result['analysis_path'] == 'llm'
+    assert client.fusion_stats['llm_failed'] == 1
+    assert list(client.breakers['claude'].outcomes) == [False, True]
@@ -0,0 +1,72 @@
+import json
+import pickle
+
+from ai_coach import InteractionHistory
+
+
+def _interaction(user_id, action, effectiveness=None):
+    interaction = {'user_id': user_id, 'action': action, 'context': {'energy_level': 0.5}}
+    if effectiveness is not None:
+        interaction['outcome'] = {'effectiveness': effectiveness}
+    return interaction
+
+
+def test_hot_window_compacts_the_oldest_into_aggregates():
+    history = InteractionHistory(hot_capacity=3)
+    history.extend([_interaction('a', 'take_break', 0.8), _interaction('a', 'take_break'),
+                    _interaction('b', 'breathe', 0.4), _interaction('a', 'take_break', 0.2),
+                    _interaction('b', 'breathe')])
+
+    assert [interaction['action'] for interaction in history] == ['breathe', 'take_break', 'breathe']
+    assert history.summary() == {'total': 5, 'hot': 3, 'compacted': 2, 'cold': 0}
+    assert history.aggregates['a']['take_break'] == {'count': 2, 'rated': 1, 'effectiveness_sum': 0.8}
+
+
+def test_feedback_on_a_compacted_interaction_reaches_the_aggregates():
+    history = InteractionHistory(hot_capacity=1)
+    late = _interaction('a', 'take_break')
+    history.append(late)
+    history.append(_interaction('a', 'stretch'))
+    assert late['compacted']
+
+    history.record_outcome(late, {'effectiveness': 0.9})
+    assert history.aggregates['a']['take_break'] == {'count': 1, 'rated': 1, 'effectiveness_sum': 0.9}
+
+    # Hot interactions only carry the outcome until they are compacted
+    hot = next(iter(history))
+    history.record_outcome(hot, {'effectiveness': 0.3})
+    assert 'stretch' not in history.aggregates['a']
+
+
+def test_evicted_interactions_spill_to_the_cold_file(tmp_path):
+    cold_path = tmp_path / 'cold.jsonl'
+    history = InteractionHistory(hot_capacity=2, cold_path=str(cold_path), cold_flush_size=3)
+    history.extend([_interaction('a', f"action_{i}") for i in range(6)])
+
+    # Four evicted: three flushed in one write, one still buffered
+    lines = cold_path.read_text().splitlines()
+    assert [json.loads(line)['action'] for line in lines] == ['action_0', 'action_1', 'action_2']
+    assert 'compacted' not in json.loads(lines[0])
+    assert history.summary()['cold'] == 4
+
+    history.flush()
+    assert len(cold_path.read_text().splitlines()) == 4
+
+
+def test_pickling_flushes_pending_cold_writes(tmp_path):
+    cold_path = tmp_path / 'cold.jsonl'
+    history = InteractionHistory(hot_capacity=1, cold_path=str(cold_path), cold_flush_size=100)
+    history.extend([_interaction('a', 'take_break'), _interaction('a', 'stretch')])
+
+    restored = pickle.loads(pickle.dumps(history))
+    assert len(cold_path.read_text().splitlines()) == 1
+    assert restored.summary() == {'total': 2, 'hot': 1, 'compacted': 1, 'cold': 1}
+
+
+def test_shrinking_the_hot_window_compacts_immediately():
+    history = InteractionHistory(hot_capacity=10)
+    history.extend([_interaction('a', 'take_break', 0.5) for _ in range(6)])
+
+    history.configure(hot_capacity=2, cold_path=None)
+    assert history.summary() == {'total': 6, 'hot': 2, 'compacted': 4, 'cold': 0}
+    assert history.aggregates['a']['take_break']['effectiveness_sum'] == 2.0
@@ -0,0 +1,80 @@
+import asyncio
+import time
+
+from ai_coach import AICoach, MultiProviderLLMClient
+
+# Little energy and an overdue break: the rule-based strategy always has a nudge
+TIRED = {'energy_level': 0.2, 'stress_level': 0.3, 'break_needed': 0.9, 'focus_quality': 0.5}
+
+
+class HangingProvider:
+    """LLM provider that never answers within any reasonable budget"""
+
+    def __init__(self):
+        self.started = self.cancelled = False
+
+    async def analyze_telemetry(self, telemetry_data, context=''):
+        self.started = True
+        try:
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+
+
+def _coach(tmp_path, provider, **kwargs):
+    coach = AICoach(model_path=str(tmp_path / 'model.pkl'), **kwargs)
+    coach.ai_client = MultiProviderLLMClient({'claude': provider})
+    return coach
+
+
+def test_budget_falls_back_to_rules_and_cancels_the_llm_call(tmp_path):
+    provider = HangingProvider()
+    coach = _coach(tmp_path, provider, latency_budget=0.2)
+
+    async def run():
+        started = time.monotonic()
+        notification = await coach.analyze_telemetry(TIRED, 'alice')
+        return notification, time.monotonic() - started
+
+    notification, elapsed = asyncio.run(run())
+
+    assert notification['ai_insights']['analysis_path'] in ('local', 'rule_based')
+    assert 0.2 <= elapsed < 0.2 + 0.3
+    assert provider.started and provider.cancelled
+
+
+def test_per_call_budget_overrides_the_default(tmp_path):
+    provider = HangingProvider()
+    coach = _coach(tmp_path, provider, latency_budget=10.0)
+
+    async def run():
+        started = time.monotonic()
+        await coach.analyze_telemetry(TIRED, 'alice', latency_budget=0.05)
+        return time.monotonic() - started
+
+    assert asyncio.run(run()) < 0.05 + 0.3
+    assert provider.cancelled
+
+
+def test_failing_local_analysis_cancels_the_ai_task(tmp_path):
+    provider = HangingProvider()
+    coach = _coach(tmp_path, provider)
+
+    def broken(context):
+        raise RuntimeError('rule table unavailable')
+
+    coach.coaching_strategy.select_strategy = broken
+
+    async def run():
+        started = time.monotonic()
+        notification = await coach.analyze_telemetry(TIRED, 'alice')
+        for _ in range(3):
+            await asyncio.sleep(0)  # Let the cancellation reach the provider
+        return notification, time.monotonic() - started
+
+    notification, elapsed = asyncio.run(run())
+
+    assert notification is None
+    assert elapsed < 1.0
+    assert provider.started and provider.cancelled
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from ai_coach import LLMCallMetrics
+
+
+def _call(call_type='analysis', latency=0.1, success=True, attempts=1, status_codes=(200,),
+          input_tokens=100, output_tokens=20, nudges=1):
+    return {'call_type': call_type, 'latency': latency, 'success': success, 'attempts': attempts,
+            'status_codes': list(status_codes), 'input_tokens': input_tokens, 'output_tokens': output_tokens,
+            'estimated_input_tokens': input_tokens, 'nudges': nudges}
+
+
+def test_percentiles_cover_the_rolling_window():
+    metrics = LLMCallMetrics(window_size=100)
+    for ms in range(1, 201):
+        metrics.record(_call(latency=ms / 1000))
+
+    stats = metrics.stats()['analysis']
+    recent = np.arange(101, 201)  # Only the last 100 calls are in the window
+
+    assert stats['calls'] == 200
+    assert stats['latency_ms']['p50'] == pytest.approx(np.percentile(recent, 50), abs=0.1)
+    assert stats['latency_ms']['p95'] == pytest.approx(np.percentile(recent, 95), abs=0.1)
+    assert stats['latency_ms']['p99'] == pytest.approx(np.percentile(recent, 99), abs=0.1)
+
+
+def test_call_types_are_aggregated_separately():
+    metrics = LLMCallMetrics()
+    metrics.record(_call(latency=0.2))
+    metrics.record(_call(latency=0.4, attempts=3, status_codes=(529, 529, 200)))
+    metrics.record(_call('fusion', latency=1.0, success=False, status_codes=(500,), output_tokens=0, nudges=0))
+
+    stats = metrics.stats()
+    analysis, fusion = stats['analysis'], stats['fusion']
+
+    assert (analysis['calls'], analysis['failures'], fusion['calls'], fusion['failures']) == (2, 0, 1, 1)
+    assert analysis['retries'] == 2 and analysis['retry_rate'] == 0.5 and fusion['retry_rate'] == 0.0
+    assert analysis['status_codes'] == {529: 2, 200: 2} and fusion['status_codes'] == {500: 1}
+    assert analysis['latency_ms']['p50'] == pytest.approx(300.0)
+    assert fusion['latency_ms']['p50'] == pytest.approx(1000.0)
+    assert analysis['tokens_per_nudge'] == 120 and fusion['tokens_per_nudge'] is None
+    # Fusion tokens are charged to the nudges the analyses produced
+    assert stats['overall'] == {'calls': 3, 'tokens': 340, 'tokens_per_nudge': 170}
+
+
+def test_sink_receives_records_and_its_errors_are_contained():
+    received = []
+    metrics = LLMCallMetrics(sink=received.append)
+    metrics.record(_call())
+
+    def broken(call):
+        raise RuntimeError('backend down')
+
+    metrics.sink = broken
+    metrics.record(_call())
+
+    assert len(received) == 1 and metrics.stats()['analysis']['calls'] == 2
@@ -0,0 +1,55 @@
+import asyncio
+
+from ai_coach import ClaudeMicroBatcher, LLMCallMetrics, PromptEncoder
+
+
+class FakeClaudeClient:
+    """Answers batch prompts with a canned array and single calls by echoing the user's energy"""
+
+    def __init__(self, batch_answer):
+        self.batch_answer = batch_answer
+        self.prompt_encoder = PromptEncoder(96)
+        self.call_metrics = LLMCallMetrics()
+        self.batch_prompts = []
+        self.single_calls = []
+
+    async def _make_request(self, prompt, max_tokens=300, call_type='analysis', stream=None):
+        self.batch_prompts.append(prompt)
+        return self.batch_answer
+
+    async def analyze_telemetry(self, telemetry_data, context=''):
+        self.single_calls.append(telemetry_data)
+        return {'nudge_text': f"single {telemetry_data['energy_level']}"}
+
+    async def aclose(self):
+        pass
+
+
+async def _analyze(batcher, count):
+    try:
+        return await asyncio.gather(*(batcher.analyze_telemetry({'energy_level': index / 10}) for index in range(count)))
+    finally:
+        await batcher.aclose()
+
+
+def test_calls_share_one_prompt_and_fan_out_in_order():
+    client = FakeClaudeClient([{'user': 2, 'nudge_text': 'two'}, {'user': 0, 'nudge_text': 'zero'},
+                               {'user': 1, 'nudge_text': None}])
+    batcher = ClaudeMicroBatcher(client, max_batch_size=3, max_wait_ms=1000)
+
+    results = asyncio.run(_analyze(batcher, 3))
+
+    assert [result['nudge_text'] for result in results] == ['zero', None, 'two']
+    assert len(client.batch_prompts) == 1 and 'for 3 users' in client.batch_prompts[0]
+    assert client.single_calls == []
+    assert batcher.batch_stats == {'batches': 1, 'batched_users': 3, 'single_calls': 0, 'fallbacks': 0}
+
+
+def test_users_missing_from_the_answer_fall_back_to_single_calls():
+    client = FakeClaudeClient({'content': 'Here you go: [{"user": 0, "nudge_text": "zero"}, "oops"]'})
+    batcher = ClaudeMicroBatcher(client, max_batch_size=8, max_wait_ms=5)
+
+    results = asyncio.run(_analyze(batcher, 3))
+
+    assert [result['nudge_text'] for result in results] == ['zero', 'single 0.1', 'single 0.2']
+    assert batcher.batch_stats['fallbacks'] == 2
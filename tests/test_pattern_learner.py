@@ -0,0 +1,110 @@
+import random
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from ai_coach import PatternLearner
+
+
+def _context(rng):
+    return {'energy_level': rng.random(), 'stress_level': rng.random(), 'productivity_score': rng.random(),
+            'focus_quality': rng.random(), 'time_since_break': rng.random() * 4,
+            'app_switches_per_hour': rng.randint(0, 60), 'cognitive_load': rng.random()}
+
+
+def _interactions(count, seed=0):
+    rng = random.Random(seed)
+    interactions = []
+    for _ in range(count):
+        interaction = {'context': _context(rng), 'timestamp': datetime(2024, 5, 1, rng.randint(7, 20)),
+                       'action': 'take_break'}
+        if rng.random() < 0.8:  # Some interactions were never rated
+            interaction['outcome'] = {'effectiveness': rng.random()}
+        interactions.append(interaction)
+    return interactions
+
+
+def test_partial_fit_matches_learn_from_data():
+    interactions = _interactions(200)
+    batch, online = PatternLearner(), PatternLearner()
+    batch.learn_from_data(interactions)
+    for interaction in interactions:
+        online.partial_fit(interaction)
+
+    assert online.is_trained and batch.is_trained
+    np.testing.assert_allclose(online.scaler.mean_, batch.scaler.mean_, rtol=1e-9)
+    np.testing.assert_allclose(online.scaler.std_, batch.scaler.std_, rtol=1e-9)
+    assert online.feature_importance == pytest.approx(batch.feature_importance, rel=1e-9)
+    assert [p['feature'] for p in online.discovered_patterns] == [p['feature'] for p in batch.discovered_patterns]
+
+    rng = random.Random(1)
+    for context in (_context(rng) for _ in range(50)):
+        assert online.predict_effectiveness(context) == pytest.approx(batch.predict_effectiveness(context), abs=1e-9)
+
+
+def test_feedback_after_partial_fit_matches_rated_training():
+    interactions = _interactions(60, seed=2)
+    unrated = [{key: value for key, value in interaction.items() if key != 'outcome'} for interaction in interactions]
+    online, batch = PatternLearner(), PatternLearner()
+    for interaction in unrated:
+        online.partial_fit(interaction)
+    for interaction, rated in zip(unrated, interactions):
+        if 'outcome' in rated:
+            interaction['outcome'] = rated['outcome']
+            online.add_outcome(interaction)
+    batch.learn_from_data(interactions)
+
+    np.testing.assert_allclose(online.classifier.mean_effective, batch.classifier.mean_effective, atol=1e-9)
+    np.testing.assert_allclose(online.classifier.std_effective, batch.classifier.std_effective, atol=1e-9)
+
+
+def test_untrained_learner_predicts_neutral():
+    learner = PatternLearner()
+    for interaction in _interactions(9):
+        learner.partial_fit(interaction)
+
+    assert not learner.is_trained
+    assert learner.predict_effectiveness(_context(random.Random(3))) == 0.5
+
+
+def _per_sample_proba(classifier, X):
+    """The previous predict_proba: one Python loop per sample and feature"""
+    probabilities = []
+    for sample in X:
+        score = 0.0
+        for i, value in enumerate(sample):
+            if classifier.std_effective[i] > 0:
+                distance = abs(value - classifier.mean_effective[i]) / classifier.std_effective[i]
+                score += max(0, 1 - distance)
+        score /= len(classifier.mean_effective)
+        probabilities.append([1 - score, score])
+    return np.array(probabilities)
+
+
+def test_vectorized_proba_matches_the_per_sample_loop():
+    learner = PatternLearner()
+    learner.learn_from_data(_interactions(120, seed=4))
+    learner.classifier.std_effective[2] = 0.0  # A feature with no spread is skipped
+    X = np.random.default_rng(5).normal(size=(300, len(PatternLearner.FEATURE_NAMES)))
+
+    np.testing.assert_allclose(learner.classifier.predict_proba(X), _per_sample_proba(learner.classifier, X),
+                               atol=1e-12)
+
+
+def test_batch_effectiveness_matches_scalar_for_dicts_and_columns():
+    learner = PatternLearner()
+    learner.learn_from_data(_interactions(120, seed=6))
+    rng = random.Random(7)
+    contexts = [_context(rng) for _ in range(100)]
+    for context in contexts[::3]:
+        del context['cognitive_load']  # Missing keys take the scalar defaults
+    columns = {key: np.array([context.get(key, 0.5) for context in contexts])
+               for key in ('energy_level', 'stress_level', 'productivity_score', 'focus_quality',
+                           'cognitive_load', 'time_since_break', 'app_switches_per_hour')}
+
+    expected = [learner.predict_effectiveness(context) for context in contexts]
+    np.testing.assert_allclose(learner.predict_effectiveness_batch(contexts), expected, atol=1e-12)
+    np.testing.assert_allclose(learner.predict_effectiveness_batch(columns), expected, atol=1e-12)
+    assert learner.predict_effectiveness_batch([]).shape == (0,)
+    assert PatternLearner().predict_effectiveness_batch(contexts).tolist() == [0.5] * len(contexts)
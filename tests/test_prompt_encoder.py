@@ -0,0 +1,39 @@
+from ai_coach import PromptEncoder
+
+TELEMETRY = {
+    'energy_level': 0.4567, 'stress_level': 0.8, 'focus_quality': 0.25, 'break_needed': 0.9,
+    'cognitive_load': 0.7, 'productivity_score': 0.55, 'minutes_since_break': 95.4,
+    'current_activity_type': 'coding', 'app_switches_per_hour': 42.2, 'keystrokes_per_min': 180,
+    'error_rate': 0.05, 'deep_focus_minutes': 30, 'session_duration_hours': 3.25, 'idle_seconds': 12,
+    'tasks_completed_last_hour': 3, 'notifications_last_hour': 9, 'current_app': 'Visual Studio Code',
+    'window_title': 'secret.py - project', 'url': 'https://example.com/private'
+}
+
+
+def test_encoding_stays_within_every_token_budget():
+    encoder = PromptEncoder()
+    full = encoder.encode_telemetry(TELEMETRY, token_budget=1000)
+    for budget in range(0, 60):
+        encoded = encoder.encode_telemetry(TELEMETRY, token_budget=budget)
+        assert encoder.estimate_tokens(encoded) <= budget
+        # Truncation drops the lowest-priority features from the end
+        assert full.startswith(encoded)
+
+
+def test_default_budget_keeps_priority_features_and_drops_raw_text():
+    encoder = PromptEncoder(token_budget=12)
+    encoded = encoder.encode_telemetry(TELEMETRY)
+
+    assert encoder.estimate_tokens(encoded) <= 12
+    assert encoded.startswith('energy=0.46 stress=0.80 focus=0.25')
+    assert 'app=' not in encoded
+    assert 'secret' not in encoder.encode_telemetry(TELEMETRY, token_budget=1000)
+    assert 'example.com' not in encoder.encode_telemetry(TELEMETRY, token_budget=1000)
+
+
+def test_text_values_are_quoted_and_truncated():
+    encoder = PromptEncoder(max_text_length=16)
+    encoded = encoder.encode_analysis({'nudge_type': 'break_reminder', 'priority': 2,
+                                       'nudge_text': 'Take   a short walk outside', 'reasoning': None})
+
+    assert encoded == 'nudge_type=break_reminder priority=2.00 nudge_text="Take a short wal"'
@@ -0,0 +1,104 @@
+import asyncio
+import math
+import time
+
+from ai_coach import LocalCoachProvider, MultiProviderLLMClient, ProviderStats
+
+TIRED = {'energy_level': 0.2, 'break_needed': 0.9}
+
+
+class TaggedProvider(LocalCoachProvider):
+    """Local provider whose answers say which provider produced them"""
+
+    def __init__(self, tag, latency=0.0):
+        super().__init__(latency)
+        self.tag = tag
+        self.calls = 0
+
+    async def analyze_telemetry(self, telemetry_data, context=''):
+        self.calls += 1
+        result = await super().analyze_telemetry(telemetry_data, context)
+        return {**result, 'tag': self.tag}
+
+
+async def _route_many(client, count, deadline_seconds=None):
+    answers = []
+    for _ in range(count):
+        deadline = time.monotonic() + deadline_seconds if deadline_seconds else None
+        started = time.monotonic()
+        result, name = await client._routed_analysis(TIRED, '', deadline)
+        answers.append((name, time.monotonic() - started))
+    await asyncio.sleep(0)  # Let cancelled attempts record their outcome
+    return answers
+
+
+def test_untried_providers_go_first_and_unmeasured_failures_last():
+    stats = ProviderStats()
+    assert stats.expected_latency == 0.0
+
+    stats.record(None, failed=True)
+    assert stats.expected_latency == math.inf
+
+    stats.record(0.5, failed=False)
+    assert 0.5 < stats.expected_latency < math.inf
+
+
+def test_abandoned_calls_never_lower_the_latency_estimate():
+    stats = ProviderStats()
+    stats.record(2.0, failed=False)
+
+    stats.record(0.3, failed=True, lower_bound=True)
+
+    assert stats.ewma_latency == 2.0
+    assert stats.calls == 2 and stats.ewma_error_rate > 0
+
+
+def test_route_orders_by_expected_latency():
+    client = MultiProviderLLMClient({name: TaggedProvider(name) for name in ('claude', 'slow', 'fast', 'new')},
+                                    explore_interval=0)
+    client.provider_stats['claude'].record(0.2, failed=False)
+    client.provider_stats['slow'].record(0.9, failed=False)
+    client.provider_stats['fast'].record(0.05, failed=False)
+
+    assert client.route() == ['new', 'fast', 'claude', 'slow']
+
+    # A high error rate inflates an otherwise fast provider
+    for _ in range(10):
+        client.provider_stats['fast'].record(None, failed=True)
+    assert client.route() == ['new', 'claude', 'fast', 'slow']
+
+
+def test_overrunning_provider_stops_routing_first_under_a_deadline():
+    slow, local = TaggedProvider('claude', latency=5.0), TaggedProvider('local')
+    client = MultiProviderLLMClient({'claude': slow, 'local': local}, explore_interval=0)
+
+    answers = asyncio.run(_route_many(client, 20, deadline_seconds=0.3))
+
+    assert [name for name, _ in answers] == ['local'] * 20
+    assert max(elapsed for _, elapsed in answers) < 0.3 + 0.1
+    # Only the first call paid for the slow provider; the failover kept part of the budget
+    assert slow.calls == 1 and client.routing_stats['failovers'] == 1
+    assert client.provider_stats['claude'].calls == 1
+    assert client.provider_stats['claude'].ewma_latency >= 0.3 * (1 - client.failover_reserve) - 0.05
+    assert client.route() == ['local', 'claude']
+
+
+def test_hedge_win_is_counted_only_when_the_hedge_answers():
+    async def race(primary_latency, hedge_latency):
+        client = MultiProviderLLMClient({'claude': TaggedProvider('claude', primary_latency),
+                                         'backup': TaggedProvider('backup', hedge_latency)},
+                                        hedge_requests=True, explore_interval=0)
+        for _ in range(10):
+            client.provider_stats['claude'].record(0.01, failed=False)
+            client.provider_stats['backup'].record(0.02, failed=False)
+        result, name = await client._routed_analysis(TIRED, '')
+        return name, client.routing_stats
+
+    name, stats = asyncio.run(race(primary_latency=0.5, hedge_latency=0.0))
+    assert name == 'backup'
+    assert stats['hedged'] == 1 and stats['hedge_wins'] == 1
+
+    # The primary recovers while the hedge is still running: it was hedged but not won
+    name, stats = asyncio.run(race(primary_latency=0.05, hedge_latency=0.5))
+    assert name == 'claude'
+    assert stats['hedged'] == 1 and stats['hedge_wins'] == 0
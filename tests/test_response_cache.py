@@ -0,0 +1,88 @@
+import time
+
+import pytest
+
+from ai_coach import AICoach, ResponseCache
+
+STEADY = {'energy_level': 0.62, 'stress_level': 0.3, 'focus_quality': 0.7, 'break_needed': 0.2,
+          'cognitive_load': 0.5, 'current_activity_type': 'productive', 'time_period': 'morning'}
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(time, 'time', clock)
+    cache = ResponseCache(ttl_seconds=60)
+    key = cache.signature(STEADY, 'alice')
+    cache.put(key, {'nudge_text': 'Stretch'})
+
+    clock.now += 59
+    assert cache.get(key) == (True, {'nudge_text': 'Stretch'})
+
+    clock.now += 2
+    assert cache.get(key) == (False, None)
+    assert len(cache) == 0
+    assert (cache.hits, cache.misses, cache.evictions) == (1, 1, 1)
+
+
+def test_cached_no_nudge_answers_are_hits():
+    cache = ResponseCache()
+    key = cache.signature(STEADY, 'alice')
+    cache.put(key, None)
+
+    assert cache.get(key) == (True, None)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResponseCache(max_entries=2)
+    keys = [cache.signature(STEADY, user_id) for user_id in ('a', 'b', 'c')]
+    cache.put(keys[0], {'nudge_text': 'a'})
+    cache.put(keys[1], {'nudge_text': 'b'})
+    assert cache.get(keys[0])[0]  # 'b' is now the least recently used
+
+    cache.put(keys[2], {'nudge_text': 'c'})
+
+    assert not cache.get(keys[1])[0]
+    assert cache.get(keys[0])[0] and cache.get(keys[2])[0]
+    assert cache.evictions == 1
+
+
+def test_scope_decides_whether_users_share_entries():
+    per_user = ResponseCache(scope='user')
+    shared = ResponseCache(scope='global')
+    jittered = {**STEADY, 'energy_level': 0.65}  # Same bucket as STEADY
+
+    assert per_user.signature(STEADY, 'alice') != per_user.signature(STEADY, 'bob')
+    assert shared.signature(STEADY, 'alice') == shared.signature(jittered, 'bob')
+    assert shared.signature(STEADY) != shared.signature({**STEADY, 'stress_level': 0.9})
+
+    with pytest.raises(ValueError):
+        ResponseCache(scope='team')
+
+
+def test_per_user_cache_grows_with_active_users():
+    per_user = ResponseCache(max_entries=8, entries_per_user=4)
+    shared = ResponseCache(max_entries=8, scope='global')
+
+    for cache in (per_user, shared):
+        cache.reserve_users(1)
+        cache.reserve_users(100)
+        cache.reserve_users(10)
+
+    assert per_user.max_entries == 400
+    assert shared.max_entries == 8
+
+
+def test_coach_sizes_its_cache_from_user_models(tmp_path):
+    coach = AICoach(model_path=str(tmp_path / 'model.pkl'), llm_cache_size=16, llm_cache_entries_per_user=2)
+    for index in range(50):
+        coach._get_user_model(f"user_{index}")
+
+    assert coach.llm_cache.max_entries == 100
@@ -0,0 +1,56 @@
+import random
+
+import numpy as np
+import pytest
+
+from ai_coach import StateTransitionStore, UserModel
+
+
+def _random_context(rng):
+    return {'energy_level': rng.random(), 'stress_level': rng.random(), 'focus_quality': rng.random()}
+
+
+def test_fleet_distributions_match_predict_next_state():
+    rng = random.Random(9)
+    store = StateTransitionStore(initial_users=2)  # Small, so recording grows the tensor
+    models = [UserModel(f"user_{i}", transitions=store) for i in range(12)]
+    for _ in range(300):
+        model = rng.choice(models)
+        model.update_from_interaction(_random_context(rng), 'take_break', {})
+
+    user_ids = [model.user_id for model in models] + ['never_seen']
+    distributions = store.next_state_distributions(user_ids)
+    assert distributions.shape == (len(user_ids), 8, 8)
+    assert not distributions[-1].any()
+
+    for model, distribution in zip(models, distributions):
+        for _ in range(20):
+            context = _random_context(rng)
+            expected = model.predict_next_state(context)
+            row = distribution[StateTransitionStore.state_code(context)]
+            fleet = {StateTransitionStore.STATES[code]: p for code, p in enumerate(row.tolist()) if p}
+            assert fleet == pytest.approx(expected)
+
+
+def test_distributions_without_ids_cover_known_users_in_order():
+    store = StateTransitionStore()
+    for user_id, states in (('a', [0, 1, 1, 0]), ('b', [7, 7])):
+        for state in states:
+            store.record(user_id, state)
+
+    distributions = store.next_state_distributions()
+    assert distributions.shape == (2, 8, 8)
+    np.testing.assert_allclose(distributions[0, 1], [0.5, 0.5, 0, 0, 0, 0, 0, 0])
+    np.testing.assert_allclose(distributions[1, 7], [0, 0, 0, 0, 0, 0, 0, 1.0])
+    # States never left have no outgoing probability mass
+    assert not distributions[0, 7].any()
+
+
+def test_state_codes_batch_matches_state_code():
+    rng = random.Random(3)
+    contexts = [_random_context(rng) for _ in range(200)]
+    columns = {key: np.array([context[key] for context in contexts]) for key in contexts[0]}
+
+    codes = StateTransitionStore.state_codes_batch(columns)
+    assert codes.tolist() == [StateTransitionStore.state_code(context) for context in contexts]
+
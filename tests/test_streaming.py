@@ -0,0 +1,79 @@
+import asyncio
+import json
+
+import httpx
+
+from ai_coach import ClaudeClient, StreamingNudgeParser
+
+
+ANSWER = json.dumps({
+    'nudge_text': 'Take a five minute break.',
+    'nudge_type': 'break_reminder',
+    'priority': 2,
+    'confidence': 0.8,
+    'reasoning': 'Long session without a break.'
+})
+
+
+def _feed_until_nudge(parser, chunks):
+    for index, chunk in enumerate(chunks):
+        nudge = parser.feed(chunk)
+        if nudge is not None:
+            return index, nudge
+    return None, None
+
+
+def test_parser_resolves_once_required_fields_arrive_in_split_chunks():
+    chunks = [ANSWER[i:i + 3] for i in range(0, len(ANSWER), 3)]
+    index, nudge = _feed_until_nudge(StreamingNudgeParser(), chunks)
+
+    assert nudge == {'nudge_text': 'Take a five minute break.', 'nudge_type': 'break_reminder', 'priority': 2}
+    # Resolved before the reasoning was streamed
+    assert sum(len(chunk) for chunk in chunks[:index + 1]) < ANSWER.index('"reasoning"')
+
+
+def test_parser_waits_for_a_number_to_be_delimited():
+    parser = StreamingNudgeParser()
+    assert parser.feed('{"nudge_text": "Stretch", "nudge_type": "break_reminder", "priority": 1') is None
+    assert parser.feed('0, ') == {'nudge_text': 'Stretch', 'nudge_type': 'break_reminder', 'priority': 10}
+
+
+def test_parser_resolves_null_nudge_immediately():
+    parser = StreamingNudgeParser()
+    assert parser.feed('Sure: {"nudge_te') is None
+    assert parser.feed('xt": null, "reasoning": "all good"}') == {'nudge_text': None}
+
+
+def _sse(event: dict) -> bytes:
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode()
+
+
+def test_streaming_client_returns_nudge_and_closes_stream_early():
+    sent = []
+
+    async def body():
+        yield _sse({'type': 'message_start', 'message': {'usage': {'input_tokens': 42}}})
+        for i in range(0, len(ANSWER), 8):
+            sent.append(i)
+            yield _sse({'type': 'content_block_delta', 'delta': {'type': 'text_delta', 'text': ANSWER[i:i + 8]}})
+        yield _sse({'type': 'message_stop'})
+
+    def handler(request):
+        assert json.loads(request.content)['stream'] is True
+        return httpx.Response(200, content=body(), headers={'content-type': 'text/event-stream'})
+
+    async def run():
+        client = ClaudeClient('test-key', base_url='http://stub/v1', stream=True)
+        client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        try:
+            return client, await client._make_request('prompt')
+        finally:
+            await client.aclose()
+
+    client, nudge = asyncio.run(run())
+
+    assert nudge == {'nudge_text': 'Take a five minute break.', 'nudge_type': 'break_reminder', 'priority': 2}
+    assert len(sent) < len(range(0, len(ANSWER), 8))
+    stats = client.call_metrics.stats()['analysis']
+    assert stats['calls'] == 1
+    assert stats['input_tokens'] == 42
@@ -0,0 +1,98 @@
+import numpy as np
+
+from ai_coach import TimeSeriesStore
+
+
+def _sample(step):
+    return [step / 100, 1 - step / 100, step / 200, 0.5]
+
+
+def test_window_wraps_around_the_ring_oldest_first():
+    store = TimeSeriesStore(capacity=5, trend_window=3)
+    for step in range(12):
+        store.append('alice', _sample(step), timestamp_ms=step)
+
+    assert store.length('alice') == 5
+    window = store.window('alice', 5)
+    np.testing.assert_allclose(window, np.array([_sample(step) for step in range(7, 12)], dtype=np.float32))
+    # Fewer samples than asked for: the whole ring, still oldest first
+    np.testing.assert_allclose(store.window('alice', 3)[:, 0], [0.09, 0.10, 0.11], rtol=1e-6)
+
+
+def test_window_before_the_ring_fills():
+    store = TimeSeriesStore(capacity=5, trend_window=3)
+    for step in range(3):
+        store.append('alice', _sample(step))
+
+    assert store.window('alice', 10).shape == (3, len(TimeSeriesStore.METRICS))
+
+
+def test_growing_past_initial_users_keeps_samples():
+    store = TimeSeriesStore(capacity=4, trend_window=2, initial_users=2)
+    for user in range(7):
+        for step in range(user + 1):
+            store.append(f"user_{user}", _sample(step + user))
+
+    assert len(store) == 7 and store.values.shape[1] >= 7
+    for user in range(7):
+        samples = min(user + 1, 4)
+        expected = [_sample(step + user)[0] for step in range(user + 1)][-samples:]
+        np.testing.assert_allclose(store.window(f"user_{user}", 4)[:, 0], expected, rtol=1e-6)
+
+
+def test_append_batch_matches_append_across_wraparound():
+    users = [f"user_{i}" for i in range(6)]
+    rng = np.random.default_rng(0)
+    scalar, batch = TimeSeriesStore(capacity=4, trend_window=3), TimeSeriesStore(capacity=4, trend_window=3)
+    scalar.append('late', _sample(0))  # Puts the batch users on different rows from the batch store
+    for tick in range(9):
+        samples = rng.random((len(users), 4)).astype(np.float32)
+        # Drop one user on some ticks so heads diverge and the scattered path runs too
+        present = [i for i in range(len(users)) if tick % 3 or i != 2]
+        for i in present:
+            scalar.append(users[i], samples[i])
+        batch.append_batch([users[i] for i in present], samples[present])
+
+    for user in users:
+        assert batch.length(user) == scalar.length(user)
+        np.testing.assert_array_equal(batch.window(user, 4), scalar.window(user, 4))
+
+
+def _polyfit_slopes(store, user):
+    window = store.window(user, store.trend_window).astype(np.float64)
+    if len(window) < 2:
+        return [0.0] * len(TimeSeriesStore.METRICS)
+    return np.polyfit(np.arange(len(window)), window, 1)[0].tolist()
+
+
+def test_running_slopes_match_polyfit_through_many_wraps():
+    rng = np.random.default_rng(3)
+    store = TimeSeriesStore(capacity=12, trend_window=10)
+    for step in range(100):
+        store.append('alice', rng.random(4))
+        np.testing.assert_allclose(store.trend('alice'), _polyfit_slopes(store, 'alice'), atol=1e-9)
+
+
+def test_batch_slopes_match_polyfit_for_mixed_lengths():
+    rng = np.random.default_rng(4)
+    store = TimeSeriesStore(capacity=16, trend_window=10)
+    users = [f"user_{i}" for i in range(8)]
+    for tick in range(40):
+        # User i joins at tick 5 * i, so window lengths differ until everyone is full
+        present = [user for i, user in enumerate(users) if tick >= 5 * i]
+        store.append_batch(present, rng.random((len(present), 4)))
+
+        slopes = store.trends_for(present)
+        for user, row in zip(present, slopes):
+            np.testing.assert_allclose(row, _polyfit_slopes(store, user), atol=1e-9)
+            np.testing.assert_allclose(row, store.trend(user), atol=1e-12)
+
+
+def test_linear_series_has_its_exact_slope():
+    store = TimeSeriesStore(capacity=20, trend_window=10)
+    for step in range(35):
+        store.append('alice', [0.5 - 0.01 * step, 0.1 + 0.02 * step, 0.3, 0.25 * (step % 2)])
+
+    energy, stress, productivity, _ = store.trend('alice')
+    assert abs(energy + 0.01) < 1e-6 and abs(stress - 0.02) < 1e-6 and abs(productivity) < 1e-9
+    assert store.trend('nobody') == [0.0] * 4
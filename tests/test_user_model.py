@@ -0,0 +1,56 @@
+import random
+
+import pytest
+
+from ai_coach import DecayedScore, UserModel
+
+
+def _weighted_average(scores, decay):
+    """Decayed average recomputed from the full score history"""
+    weights = [decay ** age for age in range(len(scores) - 1, -1, -1)]
+    return sum(w * s for w, s in zip(weights, scores)) / sum(weights)
+
+
+def test_decayed_score_matches_the_weighted_history():
+    rng = random.Random(8)
+    score = DecayedScore(decay=0.8)
+    history = []
+    for _ in range(40):
+        history.append(rng.random())
+        score.update(history[-1])
+        assert score.value == pytest.approx(_weighted_average(history, 0.8))
+
+
+def test_recent_scores_dominate_after_a_change():
+    score = DecayedScore(decay=0.9)
+    for _ in range(30):
+        score.update(0.9)
+    for _ in range(30):
+        score.update(0.1)
+
+    # After 30 updates the old scores carry 0.9**30 (about 4%) of the weight
+    assert score.value < 0.15
+    assert DecayedScore().value == 0.5
+
+
+def test_reservoir_is_bounded_and_samples_past_scores():
+    random.seed(3)
+    score = DecayedScore(reservoir_size=5)
+    for i in range(200):
+        score.update(i / 200)
+
+    assert len(score.reservoir) == 5
+    assert set(score.reservoir) <= {i / 200 for i in range(200)}
+    assert score.count == 200
+
+
+def test_personalized_recommendation_follows_decayed_feedback():
+    model = UserModel('alice', effectiveness_decay=0.5)
+    context = {'energy_level': 0.5, 'stress_level': 0.5, 'focus_quality': 0.5}
+    assert model.get_personalized_recommendation('take_break') == 0.5
+
+    for effectiveness in (0.2, 0.2, 1.0):
+        model.update_from_interaction(context, 'take_break', {'effectiveness': effectiveness})
+    model.update_from_interaction(context, 'take_break')  # Unrated interactions do not move it
+
+    assert model.get_personalized_recommendation('take_break') == pytest.approx(_weighted_average([0.2, 0.2, 1.0], 0.5))
@@ -0,0 +1,122 @@
+import pickle
+import random
+
+from ai_coach import FakeWindowBackend, RateCounter, TopKCounter, WindowTracker
+
+
+def _tracker():
+    backend = FakeWindowBackend()
+    tracker = WindowTracker(backend=backend)
+    tracker.update()  # Starts the backend
+    return backend, tracker
+
+
+def test_fake_backend_drives_update():
+    backend, tracker = _tracker()
+    backend.push('Code', 'main.py', timestamp=1000.0)
+
+    window_info, tab_info = tracker.update()
+    assert window_info['app_name'] == 'Code'
+    assert window_info['full_context'] == 'Code: main.py'
+    assert tab_info is None
+    assert tracker.current_activity_type == 'productive'
+
+    tab = {'title': 'Funny cats', 'url': 'https://www.youtube.com/watch?v=1', 'browser': 'Chrome'}
+    backend.push('Google Chrome', 'Funny cats', tab, timestamp=1060.0)
+    window_info, tab_info = tracker.update()
+    assert window_info['app_name'] == 'Google Chrome'
+    assert tab_info == tab
+    assert tracker.current_activity_type == 'entertainment'
+    assert tracker.window_switches == 1
+
+
+def test_stopped_script_does_not_push():
+    backend = FakeWindowBackend([(60.0, 'Code', 'main.py', None)])
+    tracker = WindowTracker(backend=backend)
+    tracker.start()
+    tracker.stop()
+
+    assert tracker.current_window is None
+
+
+def test_pushed_changes_are_accounted_in_metrics():
+    backend, tracker = _tracker()
+    start = tracker.last_check
+    backend.push('Code', 'main.py', timestamp=start)
+    backend.push('Slack', 'general', timestamp=start + 120)
+    backend.push('Code', 'main.py', timestamp=start + 150)
+
+    metrics = tracker._enhanced_metrics(start + 180)
+    assert metrics['current_app'] == 'Code'
+    assert metrics['window_switches_per_hour'] == 3
+    assert metrics['top_windows'] == {'Code: main.py': 180 - 30, 'Slack: general': 30}
+    assert metrics['activity_breakdown'] == {'productive': 150, 'communication': 30}
+
+
+def test_long_stay_is_spread_over_the_hour_window():
+    backend, tracker = _tracker()
+    start = 3600.0 * 1000
+    tracker.last_check = start
+    backend.push('Code', 'main.py', timestamp=start)
+
+    # Two hours in one window with no metrics read in between
+    metrics = tracker._enhanced_metrics(start + 2 * 3600 + 30)
+    assert 3570 <= metrics['activity_breakdown']['productive'] <= 3600
+    assert metrics['top_windows'] == {'Code: main.py': 2 * 3600 + 30}
+
+
+def test_add_span_splits_time_at_bucket_edges():
+    counter = RateCounter(window_seconds=60, bucket_seconds=10)
+    counter.add_span(1005.0, 1032.0)
+
+    assert counter.count(1032.0) == 27.0
+    # Buckets expire one at a time: 5 s from [1000, 1010), then 10 s from [1010, 1020)
+    assert counter.count(1065.0) == 22.0
+    assert counter.count(1070.0) == 12.0
+
+
+def test_switches_per_hour_track_a_rescan():
+    backend, tracker = _tracker()
+    rng = random.Random(5)
+    start = 1_700_000_000.0
+    tracker.last_check = start
+    times = sorted(start + rng.uniform(0, 2 * 3600) for _ in range(1200))
+    for index, timestamp in enumerate(times):
+        backend.push('Code', f"file_{index}.py", timestamp=timestamp)
+
+    now = start + 2 * 3600
+    exact = sum(1 for timestamp in times if timestamp > now - 3600)
+    # Off by at most the switches inside one 10 s bucket at the window edge
+    assert abs(tracker._enhanced_metrics(now)['window_switches_per_hour'] - exact) <= 10
+
+
+def test_tracker_aggregates_can_be_pickled():
+    backend, tracker = _tracker()
+    backend.push('Code', 'main.py', timestamp=tracker.last_check)
+    tracker._enhanced_metrics(tracker.last_check + 60)
+
+    restored = pickle.loads(pickle.dumps(tracker.activity_seconds))
+    assert restored['productive'].counts == tracker.activity_seconds['productive'].counts
+    assert restored['new'].slots == 60
+
+
+def test_top_k_eviction_keeps_the_heavy_keys():
+    counter = TopKCounter(capacity=4)
+    for _ in range(20):
+        counter.add('editor', 30.0)
+        counter.add('terminal', 20.0)
+    for index in range(50):
+        counter.add(f"popup-{index}", 1.0)
+
+    assert len(counter.totals) == 4
+    assert list(counter.top(2)) == ['editor', 'terminal']
+    assert counter.top(2)['editor'] == 600.0
+
+
+def test_top_k_replacing_key_starts_from_the_evicted_total():
+    counter = TopKCounter(capacity=2)
+    counter.add('a', 5.0)
+    counter.add('b', 3.0)
+    counter.add('c', 1.0)
+
+    assert counter.totals == {'a': 5.0, 'c': 4.0}